@@ -0,0 +1,71 @@
+"""Compares the per-request CPU time with and without the encoded response cache.
+
+Without it, every request encodes the cached file metadata straight to
+bytes again; with it, the bytes encoded by the first request are reused.
+
+Usage: python benchmarks/encoded_responses.py [n_attrs] [n_requests]
+"""
+
+import sys
+import tempfile
+import time
+import netCDF4
+import xarray as xr
+import xpublish
+from fastapi.testclient import TestClient
+from pathlib import Path
+
+from xpublish_file_metadata import FileMetadataPlugin
+
+PREFIX = "datasets/bench/file-metadata"
+
+
+def write_netcdf(path: Path, n_attrs: int) -> None:
+    """Write a small NetCDF file with many global attributes."""
+    with netCDF4.Dataset(path, mode="w") as nc_dataset:
+        nc_dataset.createDimension("x", 4)
+        nc_dataset.createVariable("v", "f4", ("x",))[:] = 0
+        for i in range(n_attrs):
+            nc_dataset.setncattr(f"attr_{i:05d}", f"value {i} " * 20)
+
+
+def cpu_per_request(client: TestClient, route: str, n_requests: int) -> float:
+    """Return the mean CPU seconds spent per warm request."""
+    assert client.get(f"{PREFIX}{route}").status_code == 200
+    start = time.process_time()
+    for _ in range(n_requests):
+        client.get(f"{PREFIX}{route}")
+    return (time.process_time() - start) / n_requests
+
+
+def main(n_attrs: int = 500, n_requests: int = 200) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir) / "bench.nc"
+        write_netcdf(path, n_attrs)
+        dataset = xr.open_dataset(path)
+
+        clients = {}
+        for cache_encoded_responses in (False, True):
+            server = xpublish.Rest(
+                {"bench": dataset},
+                plugins={
+                    "file_metadata": FileMetadataPlugin(
+                        cache_encoded_responses=cache_encoded_responses,
+                    ),
+                },
+            )
+            clients[cache_encoded_responses] = TestClient(server.app)
+
+        print(f"{n_attrs} attributes, {n_requests} warm requests per route")
+        print(f"{'route':<12}{'encode (us)':>12}{'cached (us)':>12}{'speedup':>10}")
+        for route in ["/", "/attrs", "/attr-names"]:
+            uncached = cpu_per_request(clients[False], route, n_requests)
+            cached = cpu_per_request(clients[True], route, n_requests)
+            print(
+                f"{route:<12}{uncached * 1e6:>12.0f}{cached * 1e6:>12.0f}"
+                f"{uncached / cached:>9.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,493 @@
+"""Benchmarks the file-metadata endpoints across formats and file sizes.
+
+Synthetic NetCDF, GeoTIFF, HDF5 and GRIB files are generated locally (formats
+whose libraries aren't installed are skipped) and served through xpublish's
+TestClient. For each file the suite measures:
+
+* cold - the first full metadata request of a fresh server (open + read)
+* warm - a full metadata request answered from the cache
+* cold_attr / warm_attr - a single attribute lookup on a fresh / warm server
+* throughput - full metadata requests per second from concurrent clients
+
+Results are written as JSON, and two result files can be compared to catch
+regressions between commits.
+
+Usage:
+    python benchmarks/suite.py run [--quick] [--output results.json]
+    python benchmarks/suite.py compare base.json new.json [--threshold 1.25]
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+import xarray as xr
+import xpublish
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from fastapi.testclient import TestClient
+from importlib import metadata
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    NamedTuple,
+    Optional,
+)
+
+from xpublish_file_metadata import FileMetadataPlugin
+
+PREFIX = "datasets/bench/file-metadata"
+HUGE_ATTR_BYTES = 8 * 1024**2
+
+
+class Case(NamedTuple):
+    """A synthetic file to benchmark."""
+
+    format: str
+    name: str
+    suffix: str
+    write: Callable[[Path], None]
+    attr_name: str
+
+
+def attr_values(n_attrs: int, attr_bytes: int = 32) -> dict[str, str]:
+    """Return n_attrs attributes whose values are attr_bytes long."""
+    return {
+        f"attr_{i:06d}": (f"value {i} " * attr_bytes)[:attr_bytes]
+        for i in range(n_attrs)
+    }
+
+
+def netcdf_writer(
+    n_attrs: int,
+    attr_bytes: int = 32,
+    n_vars: int = 1,
+) -> Callable[[Path], None]:
+    def write(path: Path) -> None:
+        import netCDF4
+
+        # netCDF-4 (HDF5) files can't hold ~100k attributes on one object
+        file_format = "NETCDF4" if n_attrs <= 10_000 else "NETCDF3_64BIT_OFFSET"
+        with netCDF4.Dataset(path, mode="w", format=file_format) as nc_dataset:
+            nc_dataset.createDimension("x", 4)
+            for i in range(n_vars):
+                variable = nc_dataset.createVariable(f"var_{i:05d}", "f4", ("x",))
+                variable.units = "K"
+            nc_dataset.setncatts(attr_values(n_attrs, attr_bytes))
+
+    return write
+
+
+def hdf5_writer(
+    n_attrs: int,
+    attr_bytes: int = 32,
+    n_vars: int = 1,
+) -> Callable[[Path], None]:
+    def write(path: Path) -> None:
+        import h5py
+
+        # the latest file format stores large attribute sets densely
+        with h5py.File(path, mode="w", libver="latest") as h5_file:
+            for i in range(n_vars):
+                h5_file.create_dataset(f"var_{i:05d}", data=np.zeros(4, dtype="f4"))
+            for name, value in attr_values(n_attrs, attr_bytes).items():
+                h5_file.attrs[name] = value
+
+    return write
+
+
+def geotiff_writer(
+    n_attrs: int,
+    attr_bytes: int = 32,
+) -> Callable[[Path], None]:
+    def write(path: Path) -> None:
+        import rasterio
+        from rasterio.transform import from_origin
+
+        with rasterio.open(
+            path,
+            mode="w",
+            driver="GTiff",
+            width=64,
+            height=64,
+            count=1,
+            dtype="float32",
+            crs="EPSG:4326",
+            transform=from_origin(0, 64, 1, 1),
+        ) as tiff:
+            tiff.write(np.zeros((1, 64, 64), dtype="float32"))
+            # stored as one GDAL_METADATA XML tag
+            tiff.update_tags(**attr_values(n_attrs, attr_bytes))
+
+    return write
+
+
+def grib_writer(n_messages: int) -> Callable[[Path], None]:
+    def write(path: Path) -> None:
+        import eccodes
+
+        sample = eccodes.codes_grib_new_from_samples("GRIB2")
+        try:
+            with open(path, "wb") as f:
+                for i in range(n_messages):
+                    eccodes.codes_set(sample, "level", i)
+                    eccodes.codes_set(sample, "step", i % 24)
+                    eccodes.codes_write(sample, f)
+        finally:
+            eccodes.codes_release(sample)
+
+    return write
+
+
+def format_available(format: str) -> bool:
+    """Return True if the libraries needed to write and read a format import."""
+    modules = {
+        "netcdf": ["netCDF4"],
+        "hdf5": ["h5py"],
+        "geotiff": ["rasterio"],
+        "grib": ["eccodes"],
+    }[format]
+    try:
+        for module in modules:
+            __import__(module)
+    except (ImportError, RuntimeError):
+        return False
+    return True
+
+
+def build_cases(attr_counts: list[int]) -> list[Case]:
+    """Return the benchmark cases of every available format."""
+    cases = []
+    for n in attr_counts:
+        cases += [
+            Case("netcdf", f"attrs_{n}", ".nc", netcdf_writer(n), "attr_000000"),
+            Case("hdf5", f"attrs_{n}", ".h5", hdf5_writer(n), "attr_000000"),
+            Case("geotiff", f"attrs_{n}", ".tif", geotiff_writer(n), "crs"),
+        ]
+    cases += [
+        Case(
+            "netcdf",
+            "huge_string",
+            ".nc",
+            netcdf_writer(1, attr_bytes=HUGE_ATTR_BYTES),
+            "attr_000000",
+        ),
+        Case(
+            "hdf5",
+            "huge_string",
+            ".h5",
+            hdf5_writer(1, attr_bytes=HUGE_ATTR_BYTES),
+            "attr_000000",
+        ),
+        Case(
+            "geotiff",
+            "huge_string",
+            ".tif",
+            geotiff_writer(1, attr_bytes=HUGE_ATTR_BYTES),
+            # GDAL metadata is served grouped under its namespace
+            "crs",
+        ),
+        Case(
+            "netcdf", "vars_1000", ".nc", netcdf_writer(10, n_vars=1000), "attr_000000"
+        ),
+        Case("hdf5", "vars_1000", ".h5", hdf5_writer(10, n_vars=1000), "attr_000000"),
+    ]
+    for n in (10, 1000):
+        cases.append(
+            Case("grib", f"messages_{n}", ".grib2", grib_writer(n), "message_count")
+        )
+    return [case for case in cases if format_available(case.format)]
+
+
+def serve(path: Path, **plugin_kwargs: Any) -> TestClient:
+    """Return a TestClient of a fresh server (and cache) serving one file."""
+    dataset = xr.Dataset()
+    dataset.encoding["source"] = str(path)
+    server = xpublish.Rest(
+        {"bench": dataset},
+        plugins={"file_metadata": FileMetadataPlugin(**plugin_kwargs)},
+    )
+    return TestClient(server.app)
+
+
+def timed_get(client: TestClient, route: str) -> float:
+    """Return the seconds a successful GET took."""
+    start = time.perf_counter()
+    response = client.get(f"{PREFIX}{route}")
+    elapsed = time.perf_counter() - start
+    if response.status_code != 200:
+        raise RuntimeError(
+            f"GET {route} returned {response.status_code}: {response.text[:200]}"
+        )
+    return elapsed
+
+
+def summarize(samples: list[float]) -> dict[str, float]:
+    """Return summary statistics of timing samples, in seconds."""
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "min": ordered[0],
+        "median": statistics.median(ordered),
+        "mean": statistics.fmean(ordered),
+        "p95": ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))],
+    }
+
+
+def sample(
+    measure: Callable[[], float],
+    repeats: int,
+    budget: float,
+) -> list[float]:
+    """Return up to repeats measurements, stopping early once budget seconds passed.
+
+    At least one measurement is always taken, so huge files stay practical.
+    """
+    samples: list[float] = []
+    deadline = time.perf_counter() + budget
+    while len(samples) < repeats and (not samples or time.perf_counter() < deadline):
+        samples.append(measure())
+    return samples
+
+
+def throughput(
+    client: TestClient,
+    clients: int,
+    duration: float,
+) -> dict[str, float]:
+    """Return warm full metadata requests per second from concurrent clients."""
+    deadline = time.perf_counter() + duration
+    counts = [0] * clients
+    lock = threading.Lock()
+
+    def worker(i: int) -> None:
+        while time.perf_counter() < deadline:
+            timed_get(client, "/")
+            with lock:
+                counts[i] += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        list(executor.map(worker, range(clients)))
+    elapsed = time.perf_counter() - start
+    return {"clients": clients, "requests": sum(counts), "rps": sum(counts) / elapsed}
+
+
+def run_case(
+    case: Case,
+    directory: Path,
+    repeats: int,
+    clients: int,
+    duration: float,
+    budget: float,
+) -> list[dict[str, Any]]:
+    """Generate a case's file and run every measurement on it."""
+    path = directory / f"{case.format}_{case.name}{case.suffix}"
+    case.write(path)
+    attr_route = f"/attrs/{case.attr_name}"
+
+    # import the format once, so cold timings don't include it
+    timed_get(serve(path), "/format")
+
+    servers: list[TestClient] = []
+
+    def cold_get(route: str) -> float:
+        servers.append(serve(path))
+        return timed_get(servers[-1], route)
+
+    cold = sample(lambda: cold_get("/"), repeats, budget)
+    # the last cold server has the full metadata cached from here on
+    client = servers[-1]
+    cold_attr = sample(lambda: cold_get(attr_route), repeats, budget)
+
+    timed_get(client, attr_route)
+    warm = sample(lambda: timed_get(client, "/"), repeats * 5, budget)
+    warm_attr = sample(lambda: timed_get(client, attr_route), repeats * 5, budget)
+
+    base = {
+        "format": case.format,
+        "case": case.name,
+        "file_bytes": path.stat().st_size,
+    }
+    results = [
+        {**base, "metric": metric, "seconds": summarize(samples)}
+        for metric, samples in [
+            ("cold", cold),
+            ("cold_attr", cold_attr),
+            ("warm", warm),
+            ("warm_attr", warm_attr),
+        ]
+    ]
+    results.append(
+        {**base, "metric": "throughput", **throughput(client, clients, duration)},
+    )
+    return results
+
+
+def git_commit() -> Optional[str]:
+    """Return the current commit hash, if run inside a git checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment() -> dict[str, Any]:
+    """Describe where the benchmarks ran, for comparing results."""
+    versions = {}
+    for package in ["xpublish", "xarray", "netCDF4", "h5py", "rasterio", "eccodes"]:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            pass
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "packages": versions,
+    }
+
+
+def run(args: argparse.Namespace) -> None:
+    attr_counts = (
+        [10, 1000] if args.quick else [int(n) for n in args.attr_counts.split(",")]
+    )
+    repeats = 3 if args.quick else args.repeats
+    cases = build_cases(attr_counts)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for case in cases:
+            print(f"{case.format:<8} {case.name:<12}", end=" ", flush=True)
+            start = time.perf_counter()
+            results += run_case(
+                case,
+                Path(tmp_dir),
+                repeats=repeats,
+                clients=args.clients,
+                duration=0.5 if args.quick else args.duration,
+                budget=args.budget,
+            )
+            print(f"{time.perf_counter() - start:.1f}s")
+
+    output = {
+        "environment": environment(),
+        "config": {
+            "attr_counts": attr_counts,
+            "repeats": repeats,
+            "clients": args.clients,
+            "budget": args.budget,
+        },
+        "results": results,
+    }
+    Path(args.output).write_text(json.dumps(output, indent=2))
+    print(f"Wrote {len(results)} results to {args.output}")
+
+
+def result_value(result: dict[str, Any]) -> tuple[float, bool]:
+    """Return a result's headline number and whether higher is better."""
+    if result["metric"] == "throughput":
+        return result["rps"], True
+    return result["seconds"]["median"], False
+
+
+def compare(args: argparse.Namespace) -> int:
+    """Print the change of every result between two runs, flagging regressions."""
+    base, new = (json.loads(Path(p).read_text()) for p in (args.base, args.new))
+    base_results = {(r["format"], r["case"], r["metric"]): r for r in base["results"]}
+
+    print(
+        f"base {base['environment'].get('commit')} vs new {new['environment'].get('commit')}"
+    )
+    print(
+        f"{'format':<8} {'case':<12} {'metric':<11} {'base':>11} {'new':>11} {'change':>8}"
+    )
+    regressions = 0
+    for result in new["results"]:
+        key = (result["format"], result["case"], result["metric"])
+        if key not in base_results:
+            continue
+        base_value, higher_is_better = result_value(base_results[key])
+        new_value, _ = result_value(result)
+        slowdown = (
+            base_value / new_value if higher_is_better else new_value / base_value
+        )
+        flag = ""
+        if slowdown > args.threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        unit = "rps" if higher_is_better else "ms"
+        scale = 1 if higher_is_better else 1e3
+        print(
+            f"{key[0]:<8} {key[1]:<12} {key[2]:<11} "
+            f"{base_value * scale:>8.2f}{unit:>3} {new_value * scale:>8.2f}{unit:>3} "
+            f"{slowdown:>7.2f}x{flag}"
+        )
+    print(f"{regressions} regression(s) beyond {args.threshold:.2f}x")
+    return 1 if regressions else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("--output", default="benchmark-results.json")
+    run_parser.add_argument(
+        "--attr-counts",
+        default="10,1000,10000,100000",
+        help="comma separated attribute counts of the generated files",
+    )
+    run_parser.add_argument("--repeats", type=int, default=5)
+    run_parser.add_argument("--clients", type=int, default=8)
+    run_parser.add_argument(
+        "--duration",
+        type=float,
+        default=2.0,
+        help="seconds each throughput measurement runs for",
+    )
+    run_parser.add_argument(
+        "--budget",
+        type=float,
+        default=30.0,
+        help="seconds after which a measurement stops repeating, e.g. for 100k attrs",
+    )
+    run_parser.add_argument(
+        "--quick",
+        action="store_true",
+        help="small files and few repeats, e.g. for a smoke test",
+    )
+
+    compare_parser = subparsers.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.25,
+        help="slowdown factor reported as a regression",
+    )
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+        return 0
+    return compare(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+import cachey
+import numpy as np
+import pytest
+import xarray as xr
+from pathlib import Path
+
+eccodes = pytest.importorskip("eccodes")
+
+from xpublish_file_metadata.formats.grib import GribFileMetadata  # noqa: E402
+
+LEVELS = [1000, 850, 500]
+
+
+@pytest.fixture(scope="module")
+def grib_path(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    """Return the path of a GRIB2 file with one message per pressure level."""
+    path = tmp_path_factory.mktemp("grib") / "levels.grib2"
+    with open(path, mode="wb") as grib_file:
+        for level in LEVELS:
+            gid = eccodes.codes_grib_new_from_samples("GRIB2")
+            eccodes.codes_set(gid, "typeOfLevel", "isobaricInhPa")
+            eccodes.codes_set(gid, "level", level)
+            eccodes.codes_write(gid, grib_file)
+            eccodes.codes_release(gid)
+    return path
+
+
+@pytest.fixture
+def dataset(grib_path: Path) -> xr.Dataset:
+    """Return a dataset whose source is the GRIB file."""
+    dataset = xr.Dataset({"value": ("x", np.arange(3))})
+    dataset.encoding["source"] = str(grib_path)
+    return dataset
+
+
+def test_summary(dataset: xr.Dataset) -> None:
+    """Test that message headers are aggregated into one attribute per key."""
+    grabber = GribFileMetadata()
+    metadata = grabber.get_file_metadata(dataset, cachey.Cache(1e6), hide_attrs=[])
+    assert metadata.format == "grib"
+    assert metadata.attrs["message_count"] == "3"
+    assert metadata.attrs["level"] == "1000, 850, 500"
+    assert metadata.attrs["typeOfLevel"] == "isobaricInhPa"
+
+    metadata = grabber.get_file_metadata(
+        dataset,
+        cachey.Cache(1e6),
+        hide_attrs=["message_count", "level"],
+    )
+    assert "message_count" not in metadata.attrs
+    assert "level" not in metadata.attrs
+
+
+def test_typed_summary(dataset: xr.Dataset) -> None:
+    """Test that numeric header keys are typed as JSON numbers."""
+    grabber = GribFileMetadata()
+    metadata = grabber.get_typed_metadata(dataset, cachey.Cache(1e6), hide_attrs=[])
+    assert metadata.attrs["message_count"] == 3
+    assert metadata.attrs["level"] == LEVELS
+    assert metadata.attrs["typeOfLevel"] == "isobaricInhPa"
+    assert metadata.attrs["latitudeOfFirstGridPointInDegrees"] == 60.0
+    assert isinstance(metadata.attrs["latitudeOfFirstGridPointInDegrees"], float)
+
+
+def test_message(dataset: xr.Dataset) -> None:
+    """Test that a single message is read from its indexed offset."""
+    grabber = GribFileMetadata()
+    cache = cachey.Cache(1e6)
+    message = grabber.get_message(dataset, cache, 1, hide_attrs=["centre"])
+    assert message["level"] == "850"
+    assert "centre" not in message
+    assert grabber.get_message(dataset, cache, 3, hide_attrs=[]) is None
+
+
+def test_persisted_index(
+    dataset: xr.Dataset,
+    tmp_path: Path,
+) -> None:
+    """Test that the message index is persisted and reused across instances."""
+    index = GribFileMetadata(index_dir=tmp_path).get_index(dataset, cachey.Cache(1e6))
+    assert len(index.offsets) == len(LEVELS)
+    assert len(list(tmp_path.glob("*.json"))) == 1
+
+    reloaded = GribFileMetadata(index_dir=tmp_path).get_index(
+        dataset, cachey.Cache(1e6)
+    )
+    assert reloaded == index
+
+    # indexes persisted without native numbers are re-scanned
+    index_path = next(tmp_path.glob("*.json"))
+    index_path.write_text(index.model_copy(update={"numbers": None}).model_dump_json())
+    rescanned = GribFileMetadata(index_dir=tmp_path).get_index(
+        dataset, cachey.Cache(1e6)
+    )
+    assert rescanned == index
@@ -0,0 +1,116 @@
+import shutil
+import sqlite3
+import time
+import xpublish
+import xarray as xr
+from fastapi.testclient import TestClient
+from pathlib import Path
+
+from xpublish_file_metadata import FileMetadataPlugin
+from xpublish_file_metadata.shared import FileMetadata
+from xpublish_file_metadata.store import MetadataStore
+
+PREFIX = "datasets/netcdf/file-metadata"
+
+
+def metadata(title: str) -> FileMetadata:
+    """Return file metadata with a single title attribute."""
+    return FileMetadata(format="netcdf", attrs={"title": title})
+
+
+def test_get_put(tmp_path: Path) -> None:
+    """Test that entries are only returned while the fingerprint matches."""
+    store = MetadataStore(tmp_path / "store.sqlite")
+    store.put("a.nc", "key", ("stat", 1, 2), metadata("first"))
+
+    assert store.get("a.nc", "key", ("stat", 1, 2)) == metadata("first")
+    assert store.get("a.nc", "key", ("stat", 3, 2)) is None
+    assert store.get("b.nc", "key", ("stat", 1, 2)) is None
+    assert (store.hits, store.misses) == (1, 2)
+
+    store.put("a.nc", "key", ("stat", 3, 2), metadata("second"))
+    assert store.get("a.nc", "key", ("stat", 3, 2)) == metadata("second")
+    assert len(store) == 1
+    store.close()
+
+
+def test_shared_across_instances(tmp_path: Path) -> None:
+    """Test that a second store (e.g. another worker) sees written entries."""
+    path = tmp_path / "store.sqlite"
+    MetadataStore(path).put("a.nc", "key", "fp", metadata("shared"))
+    assert MetadataStore(path).get("a.nc", "key", "fp") == metadata("shared")
+
+
+def test_eviction(tmp_path: Path) -> None:
+    """Test that the least recently read entries are evicted past the cap."""
+    size = len(metadata("0").model_dump_json())
+    store = MetadataStore(
+        tmp_path / "store.sqlite",
+        max_bytes=2 * size,
+        access_interval=0,
+    )
+    store.put("0.nc", "key", "fp", metadata("0"))
+    store.put("1.nc", "key", "fp", metadata("1"))
+    store.get("0.nc", "key", "fp")
+    store.put("2.nc", "key", "fp", metadata("2"))
+
+    assert len(store) == 2
+    assert store.evictions == 1
+    assert store.get("1.nc", "key", "fp") is None
+    assert store.get("0.nc", "key", "fp") == metadata("0")
+
+
+def test_access_time_best_effort(tmp_path: Path) -> None:
+    """Test that hits record their access rarely, and never wait on a writer."""
+    path = tmp_path / "store.sqlite"
+    store = MetadataStore(path, access_interval=3600)
+    store.put("a.nc", "key", "fp", metadata("first"))
+
+    def accessed() -> float:
+        with sqlite3.connect(path) as connection:
+            return connection.execute("SELECT accessed FROM file_metadata").fetchone()[
+                0
+            ]
+
+    written = accessed()
+    assert store.get("a.nc", "key", "fp") == metadata("first")
+    assert accessed() == written
+
+    # another process holding the write lock doesn't block or fail the read
+    store = MetadataStore(path, access_interval=0)
+    writer = sqlite3.connect(path)
+    writer.execute("BEGIN IMMEDIATE")
+    start = time.perf_counter()
+    assert store.get("a.nc", "key", "fp") == metadata("first")
+    assert time.perf_counter() - start < 1
+    writer.rollback()
+    writer.close()
+
+    assert store.get("a.nc", "key", "fp") == metadata("first")
+    assert accessed() > written
+
+
+def test_plugin_read_through(tmp_path: Path) -> None:
+    """Test that a restarted server reads file metadata from the store."""
+    air_ds = xr.tutorial.open_dataset("air_temperature")
+    netcdf_path = tmp_path / "air_temperature.nc"
+    shutil.copy(air_ds.encoding["source"], netcdf_path)
+    store_path = tmp_path / "store.sqlite"
+
+    def serve() -> tuple[TestClient, FileMetadataPlugin]:
+        plugin = FileMetadataPlugin(metadata_store=store_path)
+        server_obj = xpublish.Rest(
+            {"netcdf": xr.open_dataset(netcdf_path)},
+            plugins={"file_metadata": plugin},
+        )
+        return TestClient(server_obj.app), plugin
+
+    client, plugin = serve()
+    expected = client.get(f"{PREFIX}/attrs").json()
+    assert plugin.metadata_store.misses == 1
+    assert len(plugin.metadata_store) == 1
+
+    client, plugin = serve()
+    assert client.get(f"{PREFIX}/attrs").json() == expected
+    assert plugin.metadata_store.hits == 1
+    plugin.close()
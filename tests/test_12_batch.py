@@ -0,0 +1,76 @@
+import json
+import pytest
+import xpublish
+import xarray as xr
+from fastapi.testclient import TestClient
+
+from xpublish_file_metadata import FileMetadataPlugin
+
+
+@pytest.fixture(scope="module")
+def client() -> TestClient:
+    """Return a TestClient serving two NetCDF datasets and one without a file."""
+    air_ds = xr.tutorial.open_dataset("air_temperature")
+    server_obj = xpublish.Rest(
+        {
+            "air": air_ds,
+            "air_copy": air_ds.copy(),
+            "in_memory": xr.Dataset(),
+        },
+        plugins={"file_metadata": FileMetadataPlugin(hide_attrs=["platform"])},
+    )
+    return TestClient(server_obj.app)
+
+
+def read_rows(client: TestClient, **params: str) -> dict[str, dict]:
+    """Return the NDJSON rows of a batch request keyed by dataset."""
+    response = client.get("file-metadata/batch", params=params)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    return {row["dataset"]: row for row in rows}
+
+
+def test_batch_selected_attrs(client: TestClient) -> None:
+    """Test that only the requested attributes are returned per dataset."""
+    rows = read_rows(client, datasets="air,air_copy", attrs="title,missing")
+    assert set(rows) == {"air", "air_copy"}
+    for row in rows.values():
+        assert row["format"] == "netcdf"
+        assert row["attrs"] == {"title": "4x daily NMC reanalysis (1948)"}
+        assert row["error"] is None
+
+
+def test_batch_all(client: TestClient) -> None:
+    """Test that all datasets and attributes are returned by default."""
+    rows = read_rows(client)
+    assert set(rows) == {"air", "air_copy", "in_memory"}
+    assert "Conventions" in rows["air"]["attrs"]
+    assert "platform" not in rows["air"]["attrs"]
+    assert rows["in_memory"]["attrs"] == {}
+    assert rows["in_memory"]["error"]
+
+
+def test_batch_unknown_dataset(client: TestClient) -> None:
+    """Test that unknown datasets are reported as row errors."""
+    rows = read_rows(client, datasets="air,nope", attrs="title")
+    assert rows["air"]["error"] is None
+    assert "not found" in rows["nope"]["error"]
+
+
+def test_batch_dataset_limit() -> None:
+    """Test that batch requests over too many datasets are rejected."""
+    air_ds = xr.tutorial.open_dataset("air_temperature")
+    server_obj = xpublish.Rest(
+        {f"air_{i}": air_ds for i in range(3)},
+        plugins={"file_metadata": FileMetadataPlugin(max_batch_datasets=2)},
+    )
+    client = TestClient(server_obj.app)
+
+    response = client.get("file-metadata/batch")
+    assert response.status_code == 400
+    assert "limited to 2 datasets" in response.json()["detail"]
+
+    # duplicates are only read once, so don't count against the limit
+    rows = read_rows(client, datasets="air_0,air_1,air_0", attrs="title")
+    assert set(rows) == {"air_0", "air_1"}
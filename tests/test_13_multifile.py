@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+import xpublish
+import xarray as xr
+from fastapi.testclient import TestClient
+from pathlib import Path
+
+from xpublish_file_metadata import (
+    FileMetadataPlugin,
+    open_mfdataset,
+)
+from xpublish_file_metadata.multifile import find_sources
+
+
+def write_day(
+    directory: Path,
+    day: int,
+) -> Path:
+    """Write one day of a time series with shared and per-file attributes."""
+    path = directory / f"day_{day}.nc"
+    xr.Dataset(
+        {"temp": ("time", np.zeros(4))},
+        coords={"time": np.arange(4) + 4 * day},
+        attrs={"title": "time series", "date": f"2000-01-0{day + 1}"},
+    ).to_netcdf(path, format="NETCDF4")
+    return path
+
+
+@pytest.fixture(scope="module")
+def paths(tmp_path_factory: pytest.TempPathFactory) -> list[Path]:
+    """Return the paths of three daily files."""
+    directory = tmp_path_factory.mktemp("multifile")
+    return [write_day(directory, day) for day in range(3)]
+
+
+def serve(dataset: xr.Dataset) -> TestClient:
+    """Return a TestClient serving a dataset under the id "multi"."""
+    server_obj = xpublish.Rest(
+        {"multi": dataset},
+        plugins={"file_metadata": FileMetadataPlugin()},
+    )
+    return TestClient(server_obj.app)
+
+
+def test_find_sources_from_variables(paths: list[Path]) -> None:
+    """Test that sources are collected from variable encodings."""
+    merged = xr.merge(
+        [
+            xr.open_dataset(paths[0]).rename({"temp": "a"}),
+            xr.open_dataset(paths[1]).drop_vars("time").rename({"temp": "b"}),
+        ],
+        compat="override",
+    )
+    assert find_sources(merged) == [str(paths[0]), str(paths[1])]
+
+
+def test_open_mfdataset_sources(paths: list[Path]) -> None:
+    """Test that open_mfdataset records the files xarray's only keeps one of."""
+    assert find_sources(xr.open_mfdataset(paths, combine="by_coords")) == [
+        str(paths[0])
+    ]
+
+    # a user supplied preprocess hook still runs
+    def preprocess(dataset: xr.Dataset) -> xr.Dataset:
+        return dataset.assign_attrs(preprocessed="yes")
+
+    dataset = open_mfdataset(paths, combine="by_coords", preprocess=preprocess)
+    assert find_sources(dataset) == [str(path) for path in paths]
+    assert dataset.attrs["preprocessed"] == "yes"
+
+
+def test_merged_files(paths: list[Path]) -> None:
+    """Test that common attributes are returned once, and the rest per file."""
+    dataset = open_mfdataset(paths, combine="by_coords")
+    client = serve(dataset)
+
+    response = client.get("datasets/multi/file-metadata/files")
+    assert response.status_code == 200
+    merged = response.json()
+    assert merged["attrs"]["title"] == "time series"
+    assert "date" not in merged["attrs"]
+    assert list(merged["files"]) == [str(path) for path in paths]
+    for day, path in enumerate(paths):
+        assert merged["files"][str(path)] == {
+            "format": "netcdf",
+            "attrs": {"date": f"2000-01-0{day + 1}"},
+        }
+
+
+def test_new_file_only_reads_new_file(paths: list[Path]) -> None:
+    """Test that per-file results are cached across a growing file list."""
+    plugin = FileMetadataPlugin()
+    dataset = xr.open_dataset(paths[0])
+    dataset.encoding["sources"] = [str(path) for path in paths[:2]]
+    server_obj = xpublish.Rest(
+        {"multi": dataset},
+        plugins={"file_metadata": plugin},
+    )
+    client = TestClient(server_obj.app)
+    assert len(client.get("datasets/multi/file-metadata/files").json()["files"]) == 2
+    misses = plugin.handle_pool.misses
+
+    dataset.encoding["sources"].append(str(paths[2]))
+    assert len(client.get("datasets/multi/file-metadata/files").json()["files"]) == 3
+    assert plugin.handle_pool.misses == misses + 1
@@ -0,0 +1,115 @@
+import fsspec
+import netCDF4
+import numpy as np
+import pytest
+import rioxarray  # noqa: F401 (registers the .rio accessor)
+import xpublish
+import xarray as xr
+from fastapi.testclient import TestClient
+from pathlib import Path
+
+from xpublish_file_metadata import FileMetadataPlugin
+from xpublish_file_metadata.remote import RemoteOpener
+
+
+@pytest.fixture(scope="module")
+def local_paths(tmp_path_factory: pytest.TempPathFactory) -> dict[str, Path]:
+    """Return local netCDF classic, netCDF4 and GeoTIFF files."""
+    directory = tmp_path_factory.mktemp("remote")
+    air_ds = xr.tutorial.open_dataset("air_temperature")
+    paths = {
+        "classic": Path(air_ds.encoding["source"]),
+        "netcdf4": directory / "air4.nc",
+        "geotiff": directory / "air.tif",
+    }
+    with netCDF4.Dataset(paths["netcdf4"], mode="w") as nc_dataset:
+        nc_dataset.title = "netCDF4 file"
+        nc_dataset.version = np.int32(2)
+        nc_dataset.createDimension("x", 4)
+        x = nc_dataset.createVariable("x", "f8", ("x",))
+        x.units = "m"
+        x[:] = np.arange(4)
+    air_ds.air.isel(time=slice(0, 4)).rio.to_raster(paths["geotiff"])
+    return paths
+
+
+@pytest.fixture(scope="module")
+def client(local_paths: dict[str, Path]) -> TestClient:
+    """Return a TestClient serving copies of the files in fsspec's memory filesystem."""
+    fs = fsspec.filesystem("memory")
+    datasets = {}
+    for name, path in local_paths.items():
+        source = f"memory://remote-test/{name}{path.suffix}"
+        fs.pipe(source, path.read_bytes())
+        datasets[name] = xr.Dataset()
+        datasets[name].encoding["source"] = source
+        datasets[f"local_{name}"] = xr.Dataset()
+        datasets[f"local_{name}"].encoding["source"] = str(path)
+
+    server_obj = xpublish.Rest(
+        datasets,
+        plugins={"file_metadata": FileMetadataPlugin(remote_block_size=4096)},
+    )
+    return TestClient(server_obj.app)
+
+
+@pytest.mark.parametrize("name", ["classic", "netcdf4", "geotiff"])
+def test_remote_matches_local(
+    client: TestClient,
+    name: str,
+) -> None:
+    """Test that remote files give the same metadata as their local copies."""
+    remote = client.get(f"datasets/{name}/file-metadata")
+    local = client.get(f"datasets/local_{name}/file-metadata")
+    assert remote.status_code == 200
+    assert remote.json() == local.json()
+
+
+def test_remote_single_attr(client: TestClient) -> None:
+    """Test single attribute lookups on remote files."""
+    response = client.get("datasets/netcdf4/file-metadata/attrs/title")
+    assert response.json() == "netCDF4 file"
+    response = client.get("datasets/netcdf4/file-metadata/attrs/_NCProperties")
+    assert response.status_code == 404
+    response = client.get("datasets/classic/file-metadata/attrs/title")
+    assert response.json() == "4x daily NMC reanalysis (1948)"
+
+
+def test_remote_tree(client: TestClient) -> None:
+    """Test the variable route on remote netCDF classic and netCDF4 files."""
+    classic = client.get("datasets/classic/file-metadata/variables/air").json()
+    assert classic["shape"] == [2920, 25, 53]
+    netcdf4 = client.get("datasets/netcdf4/file-metadata/variables/x").json()
+    assert netcdf4["dimensions"] == ["x"]
+    assert netcdf4["attrs"] == {"units": "m"}
+
+
+def test_classic_header_range(local_paths: dict[str, Path]) -> None:
+    """Test that only the header of a netCDF classic file is fetched."""
+    source = "memory://remote-test/header.nc"
+    data = local_paths["classic"].read_bytes()
+    fsspec.filesystem("memory").pipe(source, data)
+
+    remote = RemoteOpener(block_size=1024)
+    header = remote.read_netcdf_classic_header(
+        source,
+        parse=lambda header: (netCDF4.Dataset("header.nc", memory=header), header)[1],
+    )
+    assert len(header) < 64 * 1024 < len(data)
+
+
+def test_remote_grib_unsupported() -> None:
+    """Test that remote GRIB files are rejected with 501 instead of failing."""
+    source = "memory://remote-test/levels.grib2"
+    fsspec.filesystem("memory").pipe(source, b"GRIB\x00\x00\x00\x02" + bytes(64))
+    dataset = xr.Dataset()
+    dataset.encoding["source"] = source
+    server_obj = xpublish.Rest(
+        {"grib": dataset},
+        plugins={"file_metadata": FileMetadataPlugin()},
+    )
+    client = TestClient(server_obj.app)
+    for route in ("", "/attrs/level", "/messages/0"):
+        response = client.get(f"datasets/grib/file-metadata{route}")
+        assert response.status_code == 501
+        assert response.json()["detail"] == "Remote grib files are not supported."
@@ -0,0 +1,164 @@
+import fsspec
+import netCDF4
+import numpy as np
+import pytest
+import rasterio
+import xpublish
+import xarray as xr
+from fastapi.testclient import TestClient
+from pathlib import Path
+from typing import Iterator
+from rasterio.transform import from_origin
+
+from xpublish_file_metadata import FileMetadataPlugin
+from xpublish_file_metadata.netcdf_header import parse_netcdf_classic_header
+from xpublish_file_metadata.sniff import (
+    HeaderParseError,
+    TruncatedHeaderError,
+)
+from xpublish_file_metadata.tiff_header import geotiff_attrs
+
+
+@pytest.fixture(scope="module")
+def paths(tmp_path_factory: pytest.TempPathFactory) -> dict[str, Path]:
+    """Return netCDF and GeoTIFF files the python engine does and doesn't support."""
+    directory = tmp_path_factory.mktemp("headers")
+    air_ds = xr.tutorial.open_dataset("air_temperature")
+    paths = {"cdf1": Path(air_ds.encoding["source"])}
+
+    for name, file_format in [
+        ("cdf2", "NETCDF3_64BIT_OFFSET"),
+        ("cdf5", "NETCDF3_64BIT_DATA"),
+        ("netcdf4", "NETCDF4"),
+    ]:
+        paths[name] = directory / f"{name}.nc"
+        with netCDF4.Dataset(paths[name], mode="w", format=file_format) as nc_dataset:
+            nc_dataset.title = f"{file_format} file"
+            nc_dataset.levels = np.array([1, 2, 3], dtype="i2")
+            nc_dataset.factor = np.float32(0.5)
+            nc_dataset.createDimension("time", None)
+            nc_dataset.createDimension("x", 4)
+            x = nc_dataset.createVariable("x", "f8", ("time", "x"))
+            x.units = "m"
+            x[:] = np.zeros((2, 4))
+            nc_dataset.createVariable("label", "S1", ("x",))
+
+    profile = {
+        "driver": "GTiff",
+        "width": 50,
+        "height": 40,
+        "count": 2,
+        "dtype": "float32",
+        "transform": from_origin(500000, 4000000, 30, 30),
+        "nodata": -9999.0,
+    }
+    for name, options in [
+        ("tiff", {"crs": "EPSG:32633", "compress": "deflate", "tiled": True}),
+        ("tiff_custom_crs", {"crs": "+proj=lcc +lat_1=30 +lat_2=60 +lon_0=-100"}),
+        ("tiff_no_crs", {}),
+    ]:
+        paths[name] = directory / f"{name}.tif"
+        with rasterio.open(paths[name], mode="w", **profile, **options) as tiff:
+            tiff.write(np.zeros((2, 40, 50), dtype="float32"))
+            tiff.update_tags(title="synthetic")
+            tiff.update_tags(1, units="K")
+    return paths
+
+
+@pytest.fixture(scope="module")
+def clients(paths: dict[str, Path]) -> Iterator[dict[str, TestClient]]:
+    """Return TestClients reading the files with each engine."""
+    fs = fsspec.filesystem("memory")
+    datasets = {}
+    for name, path in paths.items():
+        datasets[name] = xr.Dataset()
+        datasets[name].encoding["source"] = str(path)
+        source = f"memory://headers-test/{name}{path.suffix}"
+        fs.pipe(source, path.read_bytes())
+        datasets[f"remote_{name}"] = xr.Dataset()
+        datasets[f"remote_{name}"].encoding["source"] = source
+
+    clients = {}
+    plugins = []
+    for engine in ["library", "python"]:
+        plugin = FileMetadataPlugin(
+            format_options={
+                "netcdf": {"engine": engine},
+                "geotiff": {"engine": engine},
+            },
+            remote_block_size=256,
+        )
+        server_obj = xpublish.Rest(datasets, plugins={"file_metadata": plugin})
+        clients[engine] = TestClient(server_obj.app)
+        plugins.append(plugin)
+    yield clients
+
+    # close pooled handles while the in-memory files still exist
+    for plugin in plugins:
+        plugin.close()
+
+
+@pytest.mark.parametrize(
+    "name",
+    ["cdf1", "cdf2", "cdf5", "netcdf4", "tiff", "tiff_custom_crs", "tiff_no_crs"],
+)
+@pytest.mark.parametrize("remote", [False, True])
+@pytest.mark.parametrize("typed", [False, True])
+def test_python_engine_matches_library(
+    clients: dict[str, TestClient],
+    name: str,
+    remote: bool,
+    typed: bool,
+) -> None:
+    """Test that both engines give the same metadata, falling back when needed."""
+    dataset_id = f"remote_{name}" if remote else name
+    params = {"typed": "true"} if typed else {}
+    library = clients["library"].get(
+        f"datasets/{dataset_id}/file-metadata", params=params
+    )
+    python = clients["python"].get(
+        f"datasets/{dataset_id}/file-metadata", params=params
+    )
+    assert library.status_code == 200
+    assert python.json() == library.json()
+    assert list(python.json()["attrs"]) == list(library.json()["attrs"])
+
+
+@pytest.mark.parametrize("name", ["cdf2", "cdf5"])
+@pytest.mark.parametrize(
+    "route",
+    [
+        "attrs/title",
+        "attrs/levels",
+        "attrs/missing",
+        "variables/x",
+        "variables/label",
+        "variables/missing",
+        "groups/",
+        "groups/missing",
+    ],
+)
+def test_python_engine_tree(
+    clients: dict[str, TestClient],
+    name: str,
+    route: str,
+) -> None:
+    """Test single attribute, variable and group lookups of netCDF classic files."""
+    library = clients["library"].get(f"datasets/{name}/file-metadata/{route}")
+    python = clients["python"].get(f"datasets/{name}/file-metadata/{route}")
+    assert python.status_code == library.status_code
+    assert python.json() == library.json()
+
+
+def test_truncated_headers(paths: dict[str, Path]) -> None:
+    """Test that the parsers report headers extending past the bytes read."""
+    data = paths["cdf1"].read_bytes()
+    with pytest.raises(TruncatedHeaderError):
+        parse_netcdf_classic_header(data[:100])
+    assert parse_netcdf_classic_header(data).dimensions["time"] == 2920
+
+    data = paths["tiff"].read_bytes()
+    with pytest.raises(TruncatedHeaderError):
+        geotiff_attrs(lambda offset, size: data[:64][offset : offset + size])
+    with pytest.raises(HeaderParseError):
+        geotiff_attrs(lambda offset, size: b"\0" * size)
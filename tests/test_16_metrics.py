@@ -0,0 +1,103 @@
+import pytest
+import xpublish
+import xarray as xr
+from fastapi.testclient import TestClient
+
+from xpublish_file_metadata import FileMetadataPlugin
+from xpublish_file_metadata.metrics import (
+    Counter,
+    Histogram,
+)
+
+
+def parse_samples(text: str) -> dict[str, float]:
+    """Return the samples of a Prometheus text exposition by name and labels."""
+    return {
+        line.rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1])
+        for line in text.splitlines()
+        if line and not line.startswith("#")
+    }
+
+
+@pytest.fixture(scope="module")
+def plugin() -> FileMetadataPlugin:
+    """Return a FileMetadataPlugin collecting metrics."""
+    return FileMetadataPlugin(metrics=True)
+
+
+@pytest.fixture(scope="module")
+def client(plugin: FileMetadataPlugin) -> TestClient:
+    """Return a TestClient with metrics enabled."""
+    missing = xr.Dataset()
+    missing.encoding["source"] = "/does/not/exist.nc"
+    server_obj = xpublish.Rest(
+        {
+            "air": xr.tutorial.open_dataset("air_temperature"),
+            "missing": missing,
+        },
+        plugins={"file_metadata": plugin},
+    )
+    return TestClient(server_obj.app)
+
+
+def test_metrics(client: TestClient) -> None:
+    """Test that cache lookups, reads and opens are counted per format."""
+    assert client.get("datasets/air/file-metadata").status_code == 200
+    assert client.get("datasets/air/file-metadata/attrs/title").status_code == 200
+    assert client.get("datasets/air/file-metadata/attr-names").status_code == 200
+
+    response = client.get("file-metadata/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    samples = parse_samples(response.text)
+
+    lookups = 'file_metadata_cache_lookups_total{format="netcdf",result="miss"}'
+    assert samples[lookups] == 2
+    assert samples['file_metadata_extract_seconds_count{format="netcdf"}'] == 2
+    assert samples['file_metadata_open_seconds_count{format="netcdf"}'] == 1
+    assert samples['file_metadata_attributes_bucket{format="netcdf",le="5"}'] == 1
+    assert samples['file_metadata_serialize_seconds_count{kind="metadata"}'] == 1
+    assert samples['file_metadata_open_handles{state="idle"}'] == 1
+    assert samples['file_metadata_format_import_seconds{format="netcdf"}'] > 0
+    assert samples['file_metadata_cache_bytes{kind="limit"}'] == 64 * 1024**2
+    assert 0 < samples['file_metadata_cache_bytes{kind="used"}'] < 10**6
+
+
+def test_metrics_errors(client: TestClient) -> None:
+    """Test that failed reads are counted by format."""
+    with pytest.raises(Exception):
+        client.get("datasets/missing/file-metadata")
+    samples = parse_samples(client.get("file-metadata/metrics").text)
+    assert samples['file_metadata_read_errors_total{format="netcdf"}'] == 1
+
+
+def test_metrics_disabled() -> None:
+    """Test that the metrics endpoint only exists when enabled."""
+    server_obj = xpublish.Rest(
+        {"air": xr.tutorial.open_dataset("air_temperature")},
+        plugins={"file_metadata": FileMetadataPlugin()},
+    )
+    client = TestClient(server_obj.app)
+    assert client.get("file-metadata/metrics").status_code == 404
+
+
+def test_exposition_format() -> None:
+    """Test the rendering of counters and cumulative histogram buckets."""
+    counter = Counter("requests_total", "Requests.", labels=("path",))
+    counter.inc('a"b')
+    counter.inc('a"b', amount=2)
+    assert counter.render() == (
+        "# HELP requests_total Requests.\n"
+        "# TYPE requests_total counter\n"
+        'requests_total{path="a\\"b"} 3\n'
+    )
+
+    histogram = Histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+    samples = parse_samples(histogram.render())
+    assert samples['latency_seconds_bucket{le="0.1"}'] == 2
+    assert samples['latency_seconds_bucket{le="1"}'] == 3
+    assert samples['latency_seconds_bucket{le="+Inf"}'] == 4
+    assert samples["latency_seconds_count"] == 4
+    assert samples["latency_seconds_sum"] == pytest.approx(2.65)
@@ -0,0 +1,137 @@
+import json
+import netCDF4
+import pytest
+import xpublish
+import xarray as xr
+from fastapi.testclient import TestClient
+from pathlib import Path
+
+from xpublish_file_metadata import FileMetadataPlugin
+from xpublish_file_metadata.responses import (
+    encode_json,
+    iter_json,
+    truncate_value,
+)
+from xpublish_file_metadata.shared import FileMetadata
+
+PREFIX = "datasets/big/file-metadata"
+
+HISTORY = "Ölçüm: läuft ✓\n" * 150_000
+
+
+@pytest.fixture(scope="module")
+def attrs() -> dict[str, str]:
+    """Return the attributes of the file, with a multi-megabyte history."""
+    attrs = {f"attr_{i:04d}": f"value {i}" for i in range(2000)}
+    attrs["history"] = HISTORY
+    return attrs
+
+
+@pytest.fixture(scope="module")
+def big_path(
+    tmp_path_factory: pytest.TempPathFactory,
+    attrs: dict[str, str],
+) -> Path:
+    """Return a netCDF file with thousands of attributes."""
+    path = tmp_path_factory.mktemp("streaming") / "big.nc"
+    with netCDF4.Dataset(path, mode="w") as nc_dataset:
+        nc_dataset.setncatts(attrs)
+    return path
+
+
+@pytest.fixture(
+    scope="module",
+    params=[
+        {},
+        {"stream_threshold_bytes": 0},
+        {"cache_encoded_responses": False},
+    ],
+    ids=["default", "always-stream", "uncached"],
+)
+def client(
+    request: pytest.FixtureRequest,
+    big_path: Path,
+) -> TestClient:
+    """Return a TestClient serving the big file."""
+    server_obj = xpublish.Rest(
+        {"big": xr.open_dataset(big_path)},
+        plugins={"file_metadata": FileMetadataPlugin(**request.param)},
+    )
+    return TestClient(server_obj.app)
+
+
+def test_streamed_bodies(
+    client: TestClient,
+    attrs: dict[str, str],
+) -> None:
+    """Test that streamed bodies match the encoded JSON."""
+    response = client.get(PREFIX)
+    assert response.status_code == 200
+    assert response.content == encode_json({"format": "netcdf", "attrs": attrs})
+    assert "content-length" not in response.headers
+
+    response = client.get(f"{PREFIX}/attrs")
+    assert response.content == encode_json(attrs)
+
+    etag = response.headers["etag"]
+    response = client.get(f"{PREFIX}/attrs", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+
+def test_max_value_bytes(
+    client: TestClient,
+    attrs: dict[str, str],
+) -> None:
+    """Test that values are truncated without splitting characters."""
+    response = client.get(f"{PREFIX}/attrs", params={"max_value_bytes": 4})
+    assert response.status_code == 200
+    truncated = response.json()
+    assert truncated["history"] == "Öl"
+    assert truncated["attr_0001"] == "valu"
+    assert list(truncated) == list(attrs)
+
+    metadata = client.get(PREFIX, params={"max_value_bytes": 0}).json()
+    assert metadata["format"] == "netcdf"
+    assert set(metadata["attrs"].values()) == {""}
+
+    assert client.get(PREFIX, params={"max_value_bytes": -1}).status_code == 422
+
+
+def test_attr_names_pages(
+    client: TestClient,
+    attrs: dict[str, str],
+) -> None:
+    """Test paging through the attribute names."""
+    names = list(attrs)
+    assert client.get(f"{PREFIX}/attr-names").json() == names
+
+    response = client.get(f"{PREFIX}/attr-names", params={"offset": 10, "limit": 5})
+    assert response.json() == names[10:15]
+    assert response.headers["x-total-count"] == str(len(names))
+
+    response = client.get(f"{PREFIX}/attr-names", params={"offset": 1998})
+    assert response.json() == names[1998:]
+    response = client.get(f"{PREFIX}/attr-names", params={"limit": 0})
+    assert response.json() == []
+
+
+def test_iter_json() -> None:
+    """Test that the chunks join up to the encoded body of every kind."""
+    metadata = FileMetadata(
+        format="hdf5",
+        attrs={f'name "{i}"': "välue\n" * i for i in range(100)},
+    )
+    for kind, content in [
+        ("metadata", metadata.model_dump()),
+        ("attrs", dict(metadata.attrs)),
+        ("attr-names", list(metadata.attrs)),
+    ]:
+        chunks = list(iter_json(kind, metadata, chunk_bytes=256))
+        assert len(chunks) > 1
+        assert b"".join(chunks) == encode_json(content)
+        assert json.loads(b"".join(chunks)) == content
+
+    empty = FileMetadata(format="hdf5", attrs={})
+    assert b"".join(iter_json("metadata", empty)) == b'{"format":"hdf5","attrs":{}}'
+    assert truncate_value("✓✓", 5) == "✓"
+    assert truncate_value("short", 100) == "short"
@@ -0,0 +1,201 @@
+import base64
+import h5py
+import netCDF4
+import numpy as np
+import pytest
+import rasterio
+import xpublish
+import xarray as xr
+from fastapi.testclient import TestClient
+from pathlib import Path
+from typing import Iterator
+from rasterio.transform import from_origin
+
+from xpublish_file_metadata import FileMetadataPlugin
+from xpublish_file_metadata.typed import (
+    BASE64_MIN_SIZE,
+    to_json_value,
+)
+
+LARGE = np.arange(BASE64_MIN_SIZE, dtype="i4")
+
+
+@pytest.fixture(scope="module")
+def paths(tmp_path_factory: pytest.TempPathFactory) -> dict[str, Path]:
+    """Return netCDF, HDF5 and GeoTIFF files with numeric and array attributes."""
+    directory = tmp_path_factory.mktemp("typed")
+    attrs = {
+        "title": "typed",
+        "count": np.int32(3),
+        "factor": np.float64(0.5),
+        "missing": np.float64("nan"),
+        "levels": np.array([1.5, 2.5, np.inf]),
+        "single": np.array([7], dtype="i2"),
+        "large": LARGE,
+    }
+
+    paths = {}
+    for name, file_format in [("cdf2", "NETCDF3_64BIT_OFFSET"), ("nc4", "NETCDF4")]:
+        paths[name] = directory / f"{name}.nc"
+        with netCDF4.Dataset(paths[name], mode="w", format=file_format) as nc_dataset:
+            nc_dataset.setncatts(attrs)
+
+    paths["hdf5"] = directory / "typed.h5"
+    with h5py.File(paths["hdf5"], mode="w") as h5_file:
+        h5_file.attrs.update(attrs)
+        h5_file.attrs["names"] = np.array([b"a", b"b"])
+
+    paths["tiff"] = directory / "typed.tif"
+    with rasterio.open(
+        paths["tiff"],
+        mode="w",
+        driver="GTiff",
+        width=50,
+        height=40,
+        count=1,
+        dtype="float32",
+        crs="EPSG:32633",
+        transform=from_origin(500000, 4000000, 30, 30),
+        nodata=np.nan,
+    ) as tiff:
+        tiff.write(np.zeros((1, 40, 50), dtype="float32"))
+        tiff.update_tags(title="synthetic")
+    return paths
+
+
+@pytest.fixture(scope="module")
+def clients(paths: dict[str, Path]) -> Iterator[dict[str, TestClient]]:
+    """Return TestClients reading the files with each engine."""
+    datasets = {}
+    for name, path in paths.items():
+        datasets[name] = xr.Dataset()
+        datasets[name].encoding["source"] = str(path)
+
+    clients = {}
+    plugins = []
+    for engine in ("library", "python"):
+        plugin = FileMetadataPlugin(
+            format_options={
+                "netcdf": {"engine": engine},
+                "geotiff": {"engine": engine},
+            },
+        )
+        plugins.append(plugin)
+        server_obj = xpublish.Rest(datasets, plugins={"file_metadata": plugin})
+        clients[engine] = TestClient(server_obj.app)
+    yield clients
+    for plugin in plugins:
+        plugin.close()
+
+
+@pytest.mark.parametrize("engine", ["library", "python"])
+@pytest.mark.parametrize("name", ["cdf2", "nc4", "hdf5"])
+def test_typed_attrs(
+    clients: dict[str, TestClient],
+    engine: str,
+    name: str,
+) -> None:
+    """Test that every format returns the same native JSON values."""
+    client = clients[engine]
+    attrs = client.get(f"datasets/{name}/file-metadata/attrs?typed=true").json()
+
+    large = attrs.pop("large")
+    assert large["dtype"] == "<i4"
+    assert large["shape"] == [BASE64_MIN_SIZE]
+    values = np.frombuffer(base64.b64decode(large["base64"]), dtype=large["dtype"])
+    assert (values == LARGE).all()
+
+    attrs.pop("names", None)
+    assert attrs == {
+        "title": "typed",
+        "count": 3,
+        "factor": 0.5,
+        "missing": "NaN",
+        "levels": [1.5, 2.5, "Infinity"],
+        "single": 7,
+    }
+
+    # string values are untouched without typed
+    string_attrs = client.get(f"datasets/{name}/file-metadata/attrs").json()
+    assert string_attrs["count"] == "3"
+
+
+def test_typed_routes(clients: dict[str, TestClient]) -> None:
+    """Test typed metadata, single attributes and their ETags."""
+    client = clients["library"]
+    prefix = "datasets/hdf5/file-metadata"
+
+    metadata = client.get(f"{prefix}?typed=true").json()
+    assert metadata["format"] == "hdf5"
+    assert metadata["attrs"]["names"] == ["a", "b"]
+
+    response = client.get(f"{prefix}/attrs/levels?typed=true")
+    assert response.json() == [1.5, 2.5, "Infinity"]
+    etag = response.headers["etag"]
+    assert etag != client.get(f"{prefix}/attrs/levels").headers["etag"]
+    response = client.get(
+        f"{prefix}/attrs/levels?typed=true",
+        headers={"If-None-Match": etag},
+    )
+    assert response.status_code == 304
+
+    assert client.get(f"{prefix}/attrs/nope?typed=true").status_code == 404
+    assert client.get(f"{prefix}/attrs/title").json() == "typed"
+
+
+def test_typed_geotiff(clients: dict[str, TestClient]) -> None:
+    """Test that both GeoTIFF engines return the same typed attributes."""
+    library, python = [
+        clients[engine].get("datasets/tiff/file-metadata/attrs?typed=true").json()
+        for engine in ("library", "python")
+    ]
+    assert library == python
+    assert library["nodata"] == "NaN"
+    assert library["width"] == 50
+    assert library["tiled"] is False
+    assert library["crs"] == "EPSG:32633"
+    assert library["transform"] == [30.0, 0.0, 500000.0, 0.0, -30.0, 4000000.0]
+    assert library["bounding_box"] == {
+        "left": 500000.0,
+        "bottom": 3998800.0,
+        "right": 501500.0,
+        "top": 4000000.0,
+    }
+    assert library["IMAGE_STRUCTURE"]["title"] == "synthetic"
+
+
+def test_to_json_value() -> None:
+    """Test the conversion of values without a file format."""
+    assert to_json_value(np.bytes_(b"caf\xc3\xa9")) == "café"
+    assert to_json_value(np.bool_(True)) is True
+    assert to_json_value(np.array([[1, 2], [3, 4]], dtype="u1")) == [[1, 2], [3, 4]]
+    assert to_json_value((1, np.float32(-np.inf))) == [1, "-Infinity"]
+    assert to_json_value({"a": np.arange(2)}) == {"a": [0, 1]}
+    assert to_json_value(np.array(["x", "y"])) == ["x", "y"]
+    assert to_json_value(object) == str(object)
+
+    encoded = to_json_value(np.arange(BASE64_MIN_SIZE, dtype=">f8"))
+    assert encoded["dtype"] == "<f8"
+    decoded = np.frombuffer(base64.b64decode(encoded["base64"]), dtype="<f8")
+    assert (decoded == np.arange(BASE64_MIN_SIZE)).all()
+
+
+def test_typed_store(
+    paths: dict[str, Path],
+    tmp_path: Path,
+) -> None:
+    """Test that typed metadata is persisted and loaded back typed."""
+    dataset = xr.Dataset()
+    dataset.encoding["source"] = str(paths["nc4"])
+    responses = []
+    for _ in range(2):
+        plugin = FileMetadataPlugin(metadata_store=tmp_path / "store.db")
+        server_obj = xpublish.Rest({"nc4": dataset}, plugins={"file_metadata": plugin})
+        client = TestClient(server_obj.app)
+        responses.append(client.get("datasets/nc4/file-metadata/attrs?typed=true"))
+        responses.append(client.get("datasets/nc4/file-metadata/attrs"))
+        plugin.close()
+    assert plugin.metadata_store.hits == 2
+    assert responses[2].json() == responses[0].json()
+    assert responses[2].json()["count"] == 3
+    assert responses[3].json()["count"] == "3"
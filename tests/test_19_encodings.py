@@ -0,0 +1,131 @@
+import pytest
+import xpublish
+import xarray as xr
+from fastapi.testclient import TestClient
+
+from xpublish_file_metadata import FileMetadataPlugin
+from xpublish_file_metadata.responses import (
+    container_head,
+    encode,
+    iter_body,
+    negotiate_encoding,
+)
+from xpublish_file_metadata.shared import FileMetadata
+
+msgpack = pytest.importorskip("msgpack")
+cbor2 = pytest.importorskip("cbor2")
+
+PREFIX = "datasets/air/file-metadata"
+
+DECODERS = {
+    "application/msgpack": msgpack.unpackb,
+    "application/cbor": cbor2.loads,
+}
+
+
+@pytest.fixture(
+    scope="module",
+    params=[{}, {"stream_threshold_bytes": 0}],
+    ids=["cached", "streamed"],
+)
+def client(request: pytest.FixtureRequest) -> TestClient:
+    """Return a TestClient serving a netCDF dataset."""
+    server_obj = xpublish.Rest(
+        {"air": xr.tutorial.open_dataset("air_temperature")},
+        plugins={"file_metadata": FileMetadataPlugin(**request.param)},
+    )
+    return TestClient(server_obj.app)
+
+
+@pytest.mark.parametrize("media_type", ["application/msgpack", "application/cbor"])
+@pytest.mark.parametrize("route", ["", "/attrs", "/attr-names", "/attrs/title"])
+def test_binary_responses(
+    client: TestClient,
+    media_type: str,
+    route: str,
+) -> None:
+    """Test that binary responses decode to the JSON content."""
+    expected = client.get(f"{PREFIX}{route}")
+    response = client.get(f"{PREFIX}{route}", headers={"Accept": media_type})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == media_type
+    assert response.headers["vary"] == "Accept"
+    assert DECODERS[media_type](response.content) == expected.json()
+
+    # each representation has its own ETag
+    etag = response.headers["etag"]
+    assert etag != expected.headers["etag"]
+    assert (
+        client.get(
+            f"{PREFIX}{route}",
+            headers={"Accept": media_type, "If-None-Match": etag},
+        ).status_code
+        == 304
+    )
+    assert (
+        client.get(f"{PREFIX}{route}", headers={"If-None-Match": etag}).status_code
+        == 200
+    )
+
+
+def test_binary_options(client: TestClient) -> None:
+    """Test binary responses with typed values, truncation and paging."""
+    headers = {"Accept": "application/msgpack"}
+    response = client.get(
+        f"{PREFIX}/attrs?typed=true&max_value_bytes=3", headers=headers
+    )
+    assert msgpack.unpackb(response.content)["title"] == "4x "
+
+    response = client.get(f"{PREFIX}/attr-names?limit=2", headers=headers)
+    assert msgpack.unpackb(response.content) == ["Conventions", "title"]
+    assert response.headers["x-total-count"] == "5"
+
+
+def test_cached_bodies() -> None:
+    """Test that binary bodies are cached next to the JSON body."""
+    plugin = FileMetadataPlugin(metrics=True)
+    server_obj = xpublish.Rest(
+        {"air": xr.tutorial.open_dataset("air_temperature")},
+        plugins={"file_metadata": plugin},
+    )
+    client = TestClient(server_obj.app)
+    for accept in ["application/json", "application/cbor"] * 3:
+        response = client.get(f"{PREFIX}/attrs", headers={"Accept": accept})
+        assert response.headers["content-type"] == accept
+
+    # each encoding is encoded once, then served from the cache
+    assert plugin.metrics.serialize_seconds.count("attrs") == 2
+
+
+def test_negotiate_encoding() -> None:
+    """Test picking the encoding from Accept headers."""
+    assert negotiate_encoding(None) == "json"
+    assert negotiate_encoding("*/*") == "json"
+    assert negotiate_encoding("text/html") == "json"
+    assert negotiate_encoding("application/x-msgpack") == "msgpack"
+    assert negotiate_encoding("application/json;q=0.5, application/cbor") == "cbor"
+    assert negotiate_encoding("application/cbor;q=0.9, application/json") == "json"
+    assert negotiate_encoding("application/msgpack, application/json") == "json"
+    assert negotiate_encoding("application/msgpack;q=0") == "json"
+
+
+def test_iter_binary() -> None:
+    """Test that streamed chunks join up to the encoded body."""
+    metadata = FileMetadata(
+        format="grib",
+        attrs={f"key_{i}": "välue" * i for i in range(300)},
+    )
+    for encoding in ("msgpack", "cbor"):
+        for kind, content in [
+            ("metadata", metadata.model_dump()),
+            ("attrs", dict(metadata.attrs)),
+            ("attr-names", list(metadata.attrs)),
+        ]:
+            chunks = list(iter_body(kind, metadata, encoding, chunk_bytes=256))
+            assert len(chunks) > 1
+            assert b"".join(chunks) == encode(content, encoding)
+
+    for size in (0, 23, 24, 255, 256, 65535, 65536):
+        items = b"".join(encode(i % 8, "cbor") for i in range(size))
+        body = container_head("cbor", mapping=False, size=size) + items
+        assert cbor2.loads(body) == [i % 8 for i in range(size)]
@@ -1,6 +1,11 @@
+import json
+import subprocess
+import sys
+import time
 import pytest
 import xpublish
 import xarray as xr
+from fastapi.testclient import TestClient
 
 import xpublish_file_metadata
 
@@ -10,13 +15,13 @@ def test_formats() -> list[str]:
     """Return a list of optional dependencies that are installed."""
     test_formats = []
     try:
-        import netCDF4
+        import netCDF4  # noqa: F401
 
         test_formats.append("netcdf")
     except ImportError:
         pass
     try:
-        import cfgrib
+        import eccodes  # noqa: F401
 
         test_formats.append("grib")
     except ImportError:
@@ -24,13 +29,13 @@ def test_formats() -> list[str]:
     except RuntimeError:
         pass
     try:
-        import rasterio
+        import rasterio  # noqa: F401
 
         test_formats.append("geotiff")
     except ImportError:
         pass
     try:
-        import h5py
+        import h5py  # noqa: F401
 
         test_formats.append("hdf5")
     except ImportError:
@@ -72,6 +77,32 @@ def test_load_in(test_formats: list[str]) -> None:
         )
 
 
+def test_lazy_load(test_formats: list[str]) -> None:
+    """Tests that format sub-plugins are only imported once a dataset needs them."""
+    code = (
+        "import json, sys, xarray as xr, xpublish_file_metadata as m\n"
+        "plugin = m.FileMetadataPlugin()\n"
+        "print(json.dumps(plugin.supported_formats()))\n"
+        "print(json.dumps([k for k in sys.modules if k.startswith(m.__name__ + '.formats.')]))\n"
+        "plugin.resolve(xr.tutorial.open_dataset('air_temperature'))\n"
+        "print(json.dumps(list(plugin.loaded_formats)))\n"
+        "print(json.dumps([k for k in sys.modules if k.startswith(m.__name__ + '.formats.')]))\n"
+        "print(json.dumps('h5py' in sys.modules))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout.splitlines()
+    assert set(test_formats) <= set(json.loads(output[0]))
+    assert json.loads(output[1]) == []
+    assert json.loads(output[2]) == ["netcdf"]
+    # nor the hdf5 format, which only remote netCDF4 files are read with
+    assert json.loads(output[3]) == ["xpublish_file_metadata.formats.netcdf"]
+    assert not json.loads(output[4])
+
+
 def test_xpublish_compatibility(test_server: xpublish.Rest) -> None:
     """Tests that the plugin can be loaded into xpublish."""
     assert "file-metadata" in test_server.plugins.keys()
@@ -89,3 +120,94 @@ def test_plugin_routes(test_server: xpublish.Rest) -> None:
     assert "attrs" in route_names
     assert "attr_names" in route_names
     assert "single_attr" in route_names
+
+
+def test_prefetch() -> None:
+    """Tests that metadata of all datasets is prefetched at app startup."""
+    plugin = xpublish_file_metadata.FileMetadataPlugin(
+        prefetch=True,
+        prefetch_workers=2,
+    )
+    server_obj = xpublish.Rest(
+        {
+            "air": xr.tutorial.open_dataset("air_temperature"),
+            "memory": xr.Dataset({"a": ("x", [1, 2, 3])}),
+        },
+        plugins={"file-metadata": plugin},
+    )
+    with TestClient(server_obj.app) as client:
+        for _ in range(100):
+            response = client.get("/file-metadata/ready")
+            if response.json()["ready"]:
+                break
+            assert response.status_code == 503
+            time.sleep(0.05)
+
+        assert response.status_code == 200
+        status = response.json()
+        assert status["enabled"]
+        assert status["total"] == 2
+        assert status["completed"] == 2
+        assert list(status["failed"].keys()) == ["memory"]
+        metadata_cache = plugin.metadata_cache(server_obj.cache)
+        assert "netcdf/metadata" in "".join(map(str, metadata_cache.data.keys()))
+
+
+def test_prefetch_disabled(test_server: xpublish.Rest) -> None:
+    """Tests that the readiness endpoint reports ready without prefetching."""
+    client = TestClient(test_server.app)
+    response = client.get("/file-metadata/ready")
+    assert response.status_code == 200
+    assert response.json()["ready"]
+    assert not response.json()["enabled"]
+
+
+def test_attr_filter() -> None:
+    """Tests that hide_attrs are compiled into exact names and patterns."""
+    attr_filter = xpublish_file_metadata.shared.AttrFilter(
+        ["title", "history*", "re:.*_secret$"],
+    )
+    assert attr_filter.names == frozenset(["title"])
+    assert "title" in attr_filter
+    assert "history" in attr_filter
+    assert "history_2023" in attr_filter
+    assert "api_secret" in attr_filter
+    assert "secret_api" not in attr_filter
+    assert "Conventions" not in attr_filter
+    assert attr_filter.visible(["title", "units", "history"]) == ["units"]
+    assert attr_filter == ["title", "history*", "re:.*_secret$"]
+    assert attr_filter.digest != xpublish_file_metadata.shared.AttrFilter().digest
+
+    plugin = xpublish_file_metadata.FileMetadataPlugin(hide_attrs=["history*"])
+    for format_filter in plugin.attr_filters.values():
+        assert "history_2023" in format_filter
+
+
+def test_frozen_attrs() -> None:
+    """Tests that cached metadata attributes can't be mutated."""
+    metadata = xpublish_file_metadata.shared.FileMetadata(
+        format="netcdf",
+        attrs={"title": "a"},
+    )
+    with pytest.raises(TypeError):
+        metadata.attrs["title"] = "b"
+    assert metadata.model_dump() == {"format": "netcdf", "attrs": {"title": "a"}}
+
+
+def test_accepted_kwargs() -> None:
+    """Tests that sub-plugins only get the shared arguments they accept."""
+    accepted_kwargs = xpublish_file_metadata.loader.accepted_kwargs
+    shared = {"handle_pool": 1, "validator": 2, "remote": 3}
+
+    class NoArguments:
+        def __init__(self) -> None: ...
+
+    class HandlePoolOnly:
+        def __init__(self, handle_pool=None, *, engine: str = "library") -> None: ...
+
+    class AnyArguments:
+        def __init__(self, **kwargs) -> None: ...
+
+    assert accepted_kwargs(NoArguments, shared) == {}
+    assert accepted_kwargs(HandlePoolOnly, shared) == {"handle_pool": 1}
+    assert accepted_kwargs(AnyArguments, shared) == shared
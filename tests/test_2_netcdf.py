@@ -1,10 +1,22 @@
+import cachey
+import json
+import netCDF4
+import numpy as np
 import pytest
 import xpublish
 import xarray as xr
+from concurrent.futures import ThreadPoolExecutor
 from fastapi.testclient import TestClient
 from pathlib import Path
+from typing import Optional
 
 from xpublish_file_metadata import FileMetadataPlugin
+from xpublish_file_metadata.formats.netcdf import NetcdfFileMetadata
+from xpublish_file_metadata.responses import EncodedResponseCache
+from xpublish_file_metadata.shared import (
+    FileMetadata,
+    GroupMetadata,
+)
 
 PREFIX = "datasets/netcdf/file-metadata"
 
@@ -116,3 +128,206 @@ def test_single_attr(
     assert response.status_code == 200
     assert isinstance(response.json(), str)
     assert response.json() == answers[attr_name]
+
+
+def test_dispatch_cache(
+    client: TestClient,
+    xpublish_server: xpublish.Rest,
+    hide_attrs: dict[str, list[str]],
+) -> None:
+    """Test that the per-dataset format resolution is cached and invalidated."""
+    plugin = xpublish_server.plugins["file_metadata"]
+    dataset = xpublish_server._datasets["netcdf"]
+
+    assert client.get(f"{PREFIX}/attrs").status_code == 200
+    dispatch = plugin.resolve(dataset)
+    assert dispatch.format_key == "netcdf"
+    assert dispatch.grabber is plugin.grabbers["netcdf"]
+    assert dispatch.hide_attrs == hide_attrs["netcdf"]
+    assert plugin.resolve(dataset) is dispatch
+
+    plugin.invalidate("netcdf")
+    assert plugin.resolve(dataset) is not dispatch
+    assert plugin.resolve(dataset) == dispatch
+
+
+def test_conditional_requests(client: TestClient) -> None:
+    """Test ETag / If-None-Match handling on the metadata routes."""
+    for route in ["", "/attrs", "/attr-names", "/attrs/title"]:
+        response = client.get(f"{PREFIX}{route}")
+        assert response.status_code == 200
+        assert response.headers["Cache-Control"] == "no-cache"
+        etag = response.headers["ETag"]
+        assert etag.startswith('"') and etag.endswith('"')
+
+        response = client.get(f"{PREFIX}{route}", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["ETag"] == etag
+
+        response = client.get(
+            f"{PREFIX}{route}",
+            headers={"If-None-Match": '"stale", W/' + etag},
+        )
+        assert response.status_code == 304
+
+        response = client.get(f"{PREFIX}{route}", headers={"If-None-Match": '"stale"'})
+        assert response.status_code == 200
+
+
+def test_cache_max_age(netcdf_dataset: xr.Dataset) -> None:
+    """Test that the Cache-Control max-age is configurable."""
+    server_obj = xpublish.Rest(
+        {"netcdf": netcdf_dataset},
+        plugins={"file_metadata": FileMetadataPlugin(cache_max_age=60)},
+    )
+    response = TestClient(server_obj.app).get(f"{PREFIX}/attrs")
+    assert response.headers["Cache-Control"] == "public, max-age=60"
+
+
+def test_encoded_responses(
+    client: TestClient,
+    xpublish_server: xpublish.Rest,
+    netcdf_dataset: xr.Dataset,
+    hide_attrs: dict[str, list[str]],
+) -> None:
+    """Test that cached response bytes match the uncached bodies."""
+    uncached_server = xpublish.Rest(
+        {"netcdf": netcdf_dataset},
+        plugins={
+            "file_metadata": FileMetadataPlugin(
+                hide_attrs=hide_attrs,
+                cache_encoded_responses=False,
+            ),
+        },
+    )
+    uncached_client = TestClient(uncached_server.app)
+
+    encoded_responses = xpublish_server.plugins["file_metadata"].encoded_responses
+    for route in ["", "/attrs", "/attr-names"]:
+        client.get(f"{PREFIX}{route}")
+        hits = encoded_responses.hits
+        cached = client.get(f"{PREFIX}{route}")
+        assert encoded_responses.hits == hits + 1
+        uncached = uncached_client.get(f"{PREFIX}{route}")
+        assert cached.status_code == uncached.status_code == 200
+        assert cached.content == uncached.content
+        assert cached.headers["content-type"] == uncached.headers["content-type"]
+        assert cached.headers["ETag"] == uncached.headers["ETag"]
+
+
+def test_encoded_response_budget() -> None:
+    """Test that encoded bodies are evicted once they exceed max_bytes."""
+    responses = EncodedResponseCache(max_bytes=10_000)
+    metadata = FileMetadata(format="netcdf", attrs={"a": "x" * 3_000})
+    for key in ("first", "second"):
+        entry = responses.put(key, metadata, etag=key)
+        entry.body("attrs")
+        entry.body("metadata")
+    assert responses.get("first") is None
+    assert responses.get("second") is not None
+    assert 6_000 < responses.nbytes <= 10_000
+
+    responses.get("second").body("attrs", "json")
+    responses.put("second", FileMetadata(format="netcdf", attrs={}), etag="new")
+    assert responses.nbytes == 0
+    responses.clear()
+    assert responses.get("second") is None
+
+
+def test_hide_attr_patterns(
+    netcdf_dataset: xr.Dataset,
+    answers: dict[str, str],
+) -> None:
+    """Test that glob and regex hide_attrs patterns hide attributes."""
+    server_obj = xpublish.Rest(
+        {"netcdf": netcdf_dataset},
+        plugins={
+            "file_metadata": FileMetadataPlugin(
+                hide_attrs={"netcdf": ["desc*", "re:plat.+"]},
+            ),
+        },
+    )
+    response = TestClient(server_obj.app).get(f"{PREFIX}/attrs")
+    assert response.json() == answers
+
+
+def test_single_attr_fast_path(
+    netcdf_dataset: xr.Dataset,
+    hide_attrs: dict[str, list[str]],
+    answers: dict[str, str],
+) -> None:
+    """Test that single attributes are served without reading all metadata."""
+    plugin = FileMetadataPlugin(hide_attrs=hide_attrs)
+    server_obj = xpublish.Rest(
+        {"netcdf": netcdf_dataset},
+        plugins={"file_metadata": plugin},
+    )
+    client = TestClient(server_obj.app)
+
+    for attr_name, value in answers.items():
+        response = client.get(f"{PREFIX}/attrs/{attr_name}")
+        assert response.status_code == 200
+        assert response.json() == value
+
+    metadata_cache = plugin.metadata_cache(server_obj.cache)
+    cache_keys = [str(key) for key in metadata_cache.data.keys()]
+    assert not any("netcdf/metadata/" in key for key in cache_keys)
+    assert any(key.endswith("netcdf/attrs/title") for key in cache_keys)
+
+    for attr_name in hide_attrs["netcdf"] + ["not_an_attr"]:
+        response = client.get(f"{PREFIX}/attrs/{attr_name}")
+        assert response.status_code == 404
+
+
+@pytest.fixture(scope="module")
+def netcdf4_paths(tmp_path_factory: pytest.TempPathFactory) -> list[Path]:
+    """Return the paths of many small netCDF4 files."""
+    paths = []
+    for i in range(60):
+        path = tmp_path_factory.mktemp("netcdf4") / f"file_{i}.nc"
+        with netCDF4.Dataset(path, mode="w", format="NETCDF4") as nc_dataset:
+            nc_dataset.setncattr("title", f"file {i}")
+            for j in range(30):
+                nc_dataset.setncattr(f"attr_{j}", j)
+            nc_dataset.createDimension("x", 4)
+            for j in range(10):
+                variable = nc_dataset.createVariable(
+                    f"var_{j}", "f4", ("x",), zlib=True
+                )
+                variable[:] = np.arange(4)
+            group = nc_dataset.createGroup("child")
+            group.setncattr("index", i)
+        paths.append(path)
+    return paths
+
+
+def test_concurrent_cold_reads(netcdf4_paths: list[Path]) -> None:
+    """Test that many netCDF4 files can be opened and read concurrently."""
+    reader = NetcdfFileMetadata()
+
+    def read_group(path: Path) -> Optional[GroupMetadata]:
+        dataset = xr.Dataset()
+        dataset.encoding["source"] = str(path)
+        return reader.get_group(dataset, cachey.Cache(1e6), "/child", [])
+
+    with ThreadPoolExecutor(max_workers=32) as executor:
+        groups = list(executor.map(read_group, netcdf4_paths * 3))
+    assert [group.attrs["index"] for group in groups] == [str(i) for i in range(60)] * 3
+
+
+def test_concurrent_batch(netcdf4_paths: list[Path]) -> None:
+    """Test a batch request over many netCDF4 datasets."""
+    datasets = {path.stem: xr.open_dataset(path) for path in netcdf4_paths}
+    server_obj = xpublish.Rest(
+        datasets,
+        plugins={"file_metadata": FileMetadataPlugin()},
+    )
+    response = TestClient(server_obj.app).get(
+        "file-metadata/batch", params={"attrs": "title"}
+    )
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert {row["dataset"]: row["attrs"]["title"] for row in rows} == {
+        path.stem: f"file {i}" for i, path in enumerate(netcdf4_paths)
+    }
@@ -1,4 +1,7 @@
+import json
 import pytest
+import subprocess
+import sys
 import xpublish
 import rioxarray
 import xarray as xr
@@ -152,3 +155,52 @@ def test_single_attr(
     assert response.status_code == 200
     assert isinstance(response.json(), str)
     assert response.json() == answers[attr_name]
+
+
+def test_single_attrs_match_full_attrs(
+    client: TestClient,
+    answers: dict[str, str],
+    hide_attrs: dict[str, list[str]],
+) -> None:
+    """Test that targeted tag lookups match the full attribute listing."""
+    for attr_name, value in answers.items():
+        response = client.get(f"{PREFIX}/attrs/{attr_name}")
+        assert response.status_code == 200
+        assert response.json() == value
+
+    for attr_name in hide_attrs["geotiff"]:
+        response = client.get(f"{PREFIX}/attrs/{attr_name}")
+        assert response.status_code == 404
+
+
+def test_missing_rasterio(tmp_path: Path) -> None:
+    """Test that headers only rasterio can read answer 501 without rasterio."""
+    path = tmp_path / "unparsed.tif"
+    # a TIFF signature whose first IFD lies past the end of the file
+    path.write_bytes(b"II*\x00\x08\x00\x00\x00" + b"\xff" * 8)
+    code = (
+        "import json, sys\n"
+        "sys.modules['rasterio'] = None\n"
+        "import xarray as xr, xpublish\n"
+        "from fastapi.testclient import TestClient\n"
+        "from xpublish_file_metadata import FileMetadataPlugin\n"
+        "dataset = xr.Dataset()\n"
+        f"dataset.encoding['source'] = {str(path)!r}\n"
+        "server_obj = xpublish.Rest({'geotiff': dataset}, "
+        "plugins={'file_metadata': FileMetadataPlugin()})\n"
+        "client = TestClient(server_obj.app, raise_server_exceptions=False)\n"
+        "responses = [client.get(f'datasets/geotiff/file-metadata/{route}') "
+        "for route in ('', 'attrs', 'attrs/driver')]\n"
+        "print(json.dumps([[r.status_code, r.json()] for r in responses]))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+    for status_code, body in json.loads(output):
+        assert status_code == 501
+        assert (
+            body["detail"] == "Install rasterio to get file metadata for geotiff files."
+        )
@@ -0,0 +1,137 @@
+import threading
+import pytest
+
+from xpublish_file_metadata.handles import FileHandlePool
+
+
+class MockHandle:
+    """A stand-in for an open file handle."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.closed = False
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def test_reuse() -> None:
+    """Tests that a returned handle is reused for the same key."""
+    pool = FileHandlePool(max_size=2)
+    opened = []
+
+    def opener() -> MockHandle:
+        opened.append(MockHandle("a"))
+        return opened[-1]
+
+    with pool.checkout("a", opener) as first:
+        pass
+    with pool.checkout("a", opener) as second:
+        pass
+
+    assert first is second
+    assert len(opened) == 1
+    assert not first.closed
+    assert pool.stats["hits"] == 1
+    assert pool.stats["misses"] == 1
+    assert pool.stats["open"] == 1
+
+
+def test_lru_eviction() -> None:
+    """Tests that the least recently used idle handle is evicted and closed."""
+    pool = FileHandlePool(max_size=2)
+    handles = {}
+    for name in ["a", "b", "a", "c"]:
+        with pool.checkout(name, lambda: MockHandle(name)) as handle:
+            handles[name] = handle
+
+    assert handles["b"].closed
+    assert not handles["a"].closed
+    assert not handles["c"].closed
+    assert pool.stats["evictions"] == 1
+    assert pool.stats["idle"] == 2
+
+
+def test_exclusive_checkout() -> None:
+    """Tests that a checked out handle is not handed to another caller."""
+    pool = FileHandlePool(max_size=4)
+    with pool.checkout("a", lambda: MockHandle("a")) as first:
+        with pool.checkout("a", lambda: MockHandle("a")) as second:
+            assert first is not second
+            assert pool.stats["checked_out"] == 2
+    assert pool.stats["idle"] == 2
+
+
+def test_error_closes_handle() -> None:
+    """Tests that a handle is closed rather than pooled if its use raises."""
+    pool = FileHandlePool(max_size=2)
+    with pytest.raises(KeyError):
+        with pool.checkout("a", lambda: MockHandle("a")) as handle:
+            raise KeyError("a")
+    assert handle.closed
+    assert pool.stats["open"] == 0
+
+
+def test_invalidate_and_close() -> None:
+    """Tests that invalidated and closed pools close their handles."""
+    pool = FileHandlePool(max_size=2)
+    with pool.checkout("a", lambda: MockHandle("a")) as a:
+        pool.invalidate("a")
+    assert a.closed
+
+    with pool.checkout("b", lambda: MockHandle("b")) as b:
+        pass
+    pool.close()
+    assert b.closed
+    assert pool.stats["open"] == 0
+
+
+def test_thread_safety() -> None:
+    """Tests that concurrent checkouts keep the pool bounded and consistent."""
+    pool = FileHandlePool(max_size=3)
+
+    def worker(i: int) -> None:
+        for j in range(200):
+            key = (i + j) % 5
+            with pool.checkout(key, lambda: MockHandle(str(key))) as handle:
+                assert not handle.closed
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = pool.stats
+    assert stats["checked_out"] == 0
+    assert stats["idle"] <= 3
+    assert stats["hits"] + stats["misses"] == 8 * 200
+
+
+def test_checkout_lock() -> None:
+    """Tests that the lock is held while a handle is opened, used and closed."""
+    pool = FileHandlePool(max_size=1)
+    lock = threading.Lock()
+
+    class LockedHandle(MockHandle):
+        def close(self) -> None:
+            assert lock.locked()
+            super().close()
+
+    def opener() -> LockedHandle:
+        assert lock.locked()
+        return LockedHandle("a")
+
+    with pool.checkout("a", opener, lock=lock) as a:
+        assert lock.locked()
+    assert not lock.locked()
+
+    # evicting the idle handle closes it under its lock
+    with pool.checkout("b", lambda: MockHandle("b")):
+        assert not lock.locked()
+    assert a.closed
+
+    with pytest.raises(RuntimeError):
+        with pool.checkout("a", opener, lock=lock):
+            raise RuntimeError("boom")
+    assert not lock.locked()
@@ -0,0 +1,82 @@
+import pytest
+import xarray as xr
+from pathlib import Path
+
+from xpublish_file_metadata.sniff import (
+    detect_file_format,
+    extension_format,
+    sniff_format,
+    UnsupportedFormatError,
+    HDF5_SIGNATURE,
+)
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (b"CDF\x01" + bytes(60), "netcdf"),
+        (b"CDF\x02" + bytes(60), "netcdf"),
+        (b"CDF\x05" + bytes(60), "netcdf"),
+        (HDF5_SIGNATURE + bytes(100) + b"_NCProperties", "netcdf"),
+        (HDF5_SIGNATURE + bytes(100), "hdf5"),
+        (bytes(512) + HDF5_SIGNATURE + bytes(100), "hdf5"),
+        (b"II*\x00" + bytes(60), "geotiff"),
+        (b"MM\x00*" + bytes(60), "geotiff"),
+        (b"II+\x00" + bytes(60), "geotiff"),
+        (b"GRIB\x00\x00\x00\x02" + bytes(60), "grib"),
+        (b"TTAA00 KWBC\r\r\nGRIB\x00\x00\x00\x01" + bytes(60), "grib"),
+        (b"GRIB\x00\x00\x00\x09" + bytes(60), None),
+        (b"PK\x03\x04" + bytes(60), None),
+    ],
+)
+def test_sniff_format(header: bytes, expected: str) -> None:
+    """Tests that magic bytes map to the right format keys."""
+    assert sniff_format(header) == expected
+
+
+def test_sniff_hdf5_extension_hint() -> None:
+    """Tests that a netcdf extension disambiguates a bare HDF5 superblock."""
+    assert sniff_format(HDF5_SIGNATURE + bytes(100), "netcdf") == "netcdf"
+
+
+@pytest.mark.parametrize(
+    "source, expected",
+    [
+        ("/data/file.nc", "netcdf"),
+        ("/data/file.H5", "hdf5"),
+        ("/data/file.grb2", "grib"),
+        ("s3://bucket/file.tif?versionId=abc", "geotiff"),
+        ("https://host/file.cdf?token=x&a=b", "netcdf"),
+        ("/data/file", None),
+    ],
+)
+def test_extension_format(source: str, expected: str) -> None:
+    """Tests that extensions are parsed from paths and URLs."""
+    assert extension_format(source) == expected
+
+
+def test_detect_file_format(tmp_path: Path) -> None:
+    """Tests that content wins over a missing or wrong extension."""
+    air_ds = xr.tutorial.open_dataset("air_temperature")
+    no_extension = tmp_path / "air_temperature"
+    no_extension.write_bytes(Path(air_ds.encoding["source"]).read_bytes())
+    assert detect_file_format(str(no_extension)) == "netcdf"
+
+    wrong_extension = tmp_path / "image.h5"
+    wrong_extension.write_bytes(b"II*\x00" + bytes(60))
+    assert detect_file_format(str(wrong_extension)) == "geotiff"
+
+    unknown = tmp_path / "unknown"
+    unknown.write_bytes(b"not a known format")
+    with pytest.raises(UnsupportedFormatError):
+        detect_file_format(str(unknown))
+
+
+def test_extension_fallback_not_memoized(tmp_path: Path) -> None:
+    """Tests that a format guessed from the extension is sniffed again later."""
+    path = tmp_path / "late.nc"
+    assert detect_file_format(str(path)) == "netcdf"
+
+    # the file turns up, and its content disagrees with the extension
+    path.write_bytes(b"II*\x00" + bytes(60))
+    assert detect_file_format(str(path)) == "geotiff"
@@ -0,0 +1,69 @@
+import asyncio
+import threading
+import time
+import pytest
+
+from xpublish_file_metadata.inflight import CoalescingExecutor
+
+
+def test_coalescing() -> None:
+    """Tests that concurrent calls for one key share a single execution."""
+    executor = CoalescingExecutor(max_workers=4)
+    calls = []
+
+    def slow_read(name: str) -> str:
+        calls.append(name)
+        time.sleep(0.1)
+        return name.upper()
+
+    async def many_clients() -> list[str]:
+        return await asyncio.gather(
+            *[executor.run("a", slow_read, "a") for _ in range(50)],
+            executor.run("b", slow_read, "b"),
+        )
+
+    results = asyncio.run(many_clients())
+    assert results == ["A"] * 50 + ["B"]
+    assert sorted(calls) == ["a", "b"]
+    assert executor.coalesced == 49
+    assert executor.inflight == 0
+
+
+def test_shared_exception() -> None:
+    """Tests that all waiters see the exception of a failed call."""
+    executor = CoalescingExecutor(max_workers=2)
+    event = threading.Event()
+
+    def failing_read() -> None:
+        event.wait(1)
+        raise FileNotFoundError("missing")
+
+    async def two_clients() -> list:
+        waiters = [executor.run("a", failing_read) for _ in range(2)]
+        gathered = asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0.05)
+        event.set()
+        return await gathered
+
+    results = asyncio.run(two_clients())
+    assert all(isinstance(r, FileNotFoundError) for r in results)
+    assert executor.inflight == 0
+
+    # a failed call is not cached
+    assert asyncio.run(executor.run("a", lambda: "ok")) == "ok"
+
+
+def test_cancelled_waiter() -> None:
+    """Tests that cancelling one waiter does not cancel the shared call."""
+    executor = CoalescingExecutor(max_workers=1)
+
+    async def clients() -> str:
+        first = asyncio.ensure_future(executor.run("a", time.sleep, 0.1))
+        second = asyncio.ensure_future(executor.run("a", time.sleep, 0.1))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(clients()) is None
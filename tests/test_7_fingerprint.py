@@ -0,0 +1,201 @@
+import os
+import shutil
+import cachey
+import netCDF4
+import pytest
+import xpublish
+import xarray as xr
+from fastapi.testclient import TestClient
+from pathlib import Path
+from types import SimpleNamespace
+from xpublish.utils.api import DATASET_ID_ATTR_KEY
+
+from xpublish_file_metadata import FileMetadataPlugin
+from xpublish_file_metadata.handles import FileHandlePool
+from xpublish_file_metadata.fingerprint import (
+    cached_read,
+    dataset_cache_key,
+    FingerprintValidator,
+    estimate_nbytes,
+    file_fingerprint,
+    is_remote,
+)
+
+PREFIX = "datasets/netcdf/file-metadata"
+
+
+@pytest.fixture
+def netcdf_path(tmp_path: Path) -> Path:
+    """Return the path of a writable copy of a NetCDF file."""
+    air_ds = xr.tutorial.open_dataset("air_temperature")
+    path = tmp_path / "air_temperature.nc"
+    shutil.copy(air_ds.encoding["source"], path)
+    return path
+
+
+def rewrite_title(path: Path, title: str) -> None:
+    """Rewrite the title attribute in place and bump the file's mtime."""
+    with netCDF4.Dataset(path, mode="a") as nc_dataset:
+        nc_dataset.title = title
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+def test_is_remote() -> None:
+    """Tests that URLs and local paths are told apart."""
+    assert is_remote("s3://bucket/file.nc")
+    assert is_remote("https://host/file.nc")
+    assert not is_remote("/data/file.nc")
+    assert not is_remote("C:\\data\\file.nc")
+    assert not is_remote("file:///data/file.nc")
+
+
+def test_file_fingerprint(netcdf_path: Path) -> None:
+    """Tests that the fingerprint changes when a file is rewritten."""
+    before = file_fingerprint(str(netcdf_path))
+    assert before == file_fingerprint(str(netcdf_path))
+    rewrite_title(netcdf_path, "changed")
+    assert before != file_fingerprint(str(netcdf_path))
+    assert file_fingerprint(str(netcdf_path.parent / "missing.nc")) is None
+
+
+def test_rate_limited_revalidation(netcdf_path: Path) -> None:
+    """Tests that a changed file is only re-read once the interval passed."""
+    cache = cachey.Cache(available_bytes=1e6)
+    reads = []
+
+    def read() -> int:
+        reads.append(1)
+        return len(reads)
+
+    validator = FingerprintValidator(revalidate_interval=3600)
+    assert validator.get(cache, "key", str(netcdf_path), read) == 1
+    rewrite_title(netcdf_path, "changed")
+    assert validator.get(cache, "key", str(netcdf_path), read) == 1
+
+    validator.revalidate_interval = 0
+    assert validator.get(cache, "key", str(netcdf_path), read) == 2
+    assert validator.get(cache, "key", str(netcdf_path), read) == 2
+
+
+def test_rewritten_file_served_fresh(netcdf_path: Path) -> None:
+    """Tests that the routes serve the attributes of a rewritten file."""
+    server_obj = xpublish.Rest(
+        {"netcdf": xr.open_dataset(netcdf_path)},
+        plugins={"file_metadata": FileMetadataPlugin(revalidate_interval=0)},
+    )
+    client = TestClient(server_obj.app)
+
+    response = client.get(f"{PREFIX}/attrs/title")
+    assert response.json() == "4x daily NMC reanalysis (1948)"
+
+    rewrite_title(netcdf_path, "rewritten upstream")
+    response = client.get(f"{PREFIX}/attrs/title")
+    assert response.json() == "rewritten upstream"
+
+
+def test_cache_cost(netcdf_path: Path) -> None:
+    """Tests that entries are cached with their read time and estimated size."""
+    cache = cachey.Cache(available_bytes=1e6)
+    validator = FingerprintValidator()
+    small = validator.get(cache, "small", str(netcdf_path), lambda: {"a": "b"})
+    large = validator.get(cache, "large", str(netcdf_path), lambda: {"a": "b" * 10**5})
+    assert small == {"a": "b"} and len(large["a"]) == 10**5
+    assert cache.nbytes["small"] < 1000 < 10**5 < cache.nbytes["large"]
+    assert estimate_nbytes({"a": "b" * 10**5}) > 10**5
+
+    # values bigger than the whole cache aren't kept
+    validator.get(cache, "huge", str(netcdf_path), lambda: "x" * 10**6)
+    assert "huge" not in cache.data
+
+
+def test_large_metadata_cached(netcdf_path: Path) -> None:
+    """Tests that metadata larger than xpublish's 1 MB cache is cached."""
+    with netCDF4.Dataset(netcdf_path, mode="a") as nc_dataset:
+        nc_dataset.history = "x" * 2 * 10**6
+    plugin = FileMetadataPlugin(metrics=True)
+    dataset = xr.open_dataset(netcdf_path)
+    # the size of xpublish's default dataset cache
+    dataset_cache = cachey.Cache(available_bytes=1e6)
+    for _ in range(3):
+        metadata = plugin.get_metadata(dataset, dataset_cache)
+        assert len(metadata.attrs["history"]) == 2 * 10**6
+
+    lookups = plugin.metrics.cache_lookups
+    assert lookups.value("netcdf", "miss") == 1
+    assert lookups.value("netcdf", "hit") == 2
+
+
+def test_metadata_cache_budget(netcdf_path: Path) -> None:
+    """Tests that file metadata can be kept apart from the dataset cache."""
+    plugin = FileMetadataPlugin(metadata_cache_bytes=10**6)
+    server_obj = xpublish.Rest(
+        {"netcdf": xr.open_dataset(netcdf_path)},
+        plugins={"file_metadata": plugin},
+    )
+    client = TestClient(server_obj.app)
+    assert client.get(PREFIX).status_code == 200
+    assert client.get(f"{PREFIX}/attrs/title").status_code == 200
+
+    own_cache = plugin.metadata_cache(server_obj.cache)
+    assert own_cache is not server_obj.cache
+    assert not any("netcdf/" in str(key) for key in server_obj.cache.data)
+    assert any("netcdf/metadata" in str(key) for key in own_cache.data)
+
+
+def test_cached_read(netcdf_path: Path) -> None:
+    """Tests that sub-plugin entries are keyed by dataset id and format."""
+    dataset = xr.Dataset(attrs={DATASET_ID_ATTR_KEY: "air"})
+    dataset.encoding["source"] = str(netcdf_path)
+    pool = FileHandlePool()
+    grabber = SimpleNamespace(
+        format="netcdf",
+        handle_pool=pool,
+        validator=FingerprintValidator(revalidate_interval=0),
+    )
+    cache = cachey.Cache(available_bytes=1e6)
+    reads = []
+
+    def read() -> str:
+        reads.append(1)
+        return "title"
+
+    with pool.checkout(("netcdf", str(netcdf_path)), lambda: open(netcdf_path)):
+        pass
+    for _ in range(2):
+        assert cached_read(grabber, dataset, cache, "attrs/title", read) == "title"
+    assert len(reads) == 1
+    assert dataset_cache_key(dataset, "netcdf", "attrs/title") in cache.data
+
+    # pooled handles of a changed file are dropped before it's re-read
+    rewrite_title(netcdf_path, "changed")
+    cached_read(grabber, dataset, cache, "attrs/title", read)
+    assert len(reads) == 2
+    assert pool.stats["idle"] == 0
+
+
+def test_replaced_file_not_read_through_old_handle(
+    netcdf_path: Path,
+    tmp_path: Path,
+) -> None:
+    """Tests that a miss after a file was replaced doesn't reuse its old handle."""
+    server_obj = xpublish.Rest(
+        {"netcdf": xr.open_dataset(netcdf_path)},
+        plugins={"file_metadata": FileMetadataPlugin(revalidate_interval=0)},
+    )
+    client = TestClient(server_obj.app)
+    assert client.get(f"{PREFIX}/attrs/title").status_code == 200
+    assert client.get(f"{PREFIX}/attrs/added").status_code == 404
+
+    replacement = tmp_path / "replacement.nc"
+    shutil.copy(netcdf_path, replacement)
+    with netCDF4.Dataset(replacement, mode="a") as nc_dataset:
+        nc_dataset.added = "after the rewrite"
+    os.replace(replacement, netcdf_path)
+
+    # neither entry was cached before, so both are cache misses
+    response = client.get(f"{PREFIX}/groups")
+    assert response.json()["attrs"]["added"] == "after the rewrite"
+    response = client.get(f"{PREFIX}/attrs/added")
+    assert response.status_code == 200
+    assert response.json() == "after the rewrite"
@@ -0,0 +1,141 @@
+import netCDF4
+import numpy as np
+import pytest
+import xpublish
+import xarray as xr
+from fastapi.testclient import TestClient
+from pathlib import Path
+
+from xpublish_file_metadata import FileMetadataPlugin
+
+PREFIX = "datasets/tree/file-metadata"
+
+
+@pytest.fixture(scope="module")
+def tree_path(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    """Return the path of a NetCDF4 file with nested groups."""
+    path = tmp_path_factory.mktemp("tree") / "tree.nc"
+    with netCDF4.Dataset(path, mode="w") as nc_dataset:
+        nc_dataset.title = "root"
+        nc_dataset.createDimension("time", 4)
+        time = nc_dataset.createVariable("time", "f8", ("time",))
+        time.units = "days since 2000-01-01"
+        time[:] = np.arange(4)
+
+        forecast = nc_dataset.createGroup("forecast")
+        forecast.source = "model"
+        forecast.createDimension("x", 10)
+        temp = forecast.createVariable(
+            "temp",
+            "f4",
+            ("time", "x"),
+            zlib=True,
+            complevel=4,
+            chunksizes=(2, 5),
+        )
+        temp.units = "K"
+        temp.secret_token = "hidden"
+        temp[:] = 0
+
+        forecast.createGroup("members")
+    return path
+
+
+@pytest.fixture(scope="module")
+def client(tree_path: Path) -> TestClient:
+    """Return a TestClient serving the nested NetCDF4 file."""
+    server_obj = xpublish.Rest(
+        {"tree": xr.open_dataset(tree_path)},
+        plugins={"file_metadata": FileMetadataPlugin(hide_attrs=["*_token"])},
+    )
+    return TestClient(server_obj.app)
+
+
+def test_variables(client: TestClient) -> None:
+    """Test that the root variables are listed by name."""
+    response = client.get(f"{PREFIX}/variables")
+    assert response.status_code == 200
+    assert response.json() == ["time"]
+
+
+def test_root_variable(client: TestClient) -> None:
+    """Test the metadata of a root variable."""
+    response = client.get(f"{PREFIX}/variables/time")
+    assert response.status_code == 200
+    variable = response.json()
+    assert variable["path"] == "/time"
+    assert variable["dimensions"] == ["time"]
+    assert variable["shape"] == [4]
+    assert variable["dtype"] == "float64"
+    assert variable["attrs"] == {"units": "days since 2000-01-01"}
+
+
+def test_nested_variable(client: TestClient) -> None:
+    """Test the metadata, chunking and filters of a nested variable."""
+    response = client.get(f"{PREFIX}/variables/forecast/temp")
+    assert response.status_code == 200
+    variable = response.json()
+    assert variable["path"] == "/forecast/temp"
+    assert variable["dimensions"] == ["time", "x"]
+    assert variable["shape"] == [4, 10]
+    assert variable["chunking"] == [2, 5]
+    assert variable["filters"]["zlib"] == "True"
+    assert variable["filters"]["complevel"] == "4"
+    assert variable["attrs"] == {"units": "K"}
+
+
+def test_groups(client: TestClient) -> None:
+    """Test the metadata of the root and nested groups."""
+    response = client.get(f"{PREFIX}/groups")
+    assert response.status_code == 200
+    assert response.json() == {
+        "path": "/",
+        "attrs": {"title": "root"},
+        "dimensions": {"time": 4},
+        "variables": ["time"],
+        "groups": ["forecast"],
+    }
+
+    response = client.get(f"{PREFIX}/groups/forecast")
+    assert response.status_code == 200
+    assert response.json() == {
+        "path": "/forecast",
+        "attrs": {"source": "model"},
+        "dimensions": {"x": 10},
+        "variables": ["temp"],
+        "groups": ["members"],
+    }
+
+    response = client.get(f"{PREFIX}/groups/forecast/members")
+    assert response.status_code == 200
+    assert response.json()["path"] == "/forecast/members"
+
+
+def test_missing_nodes(client: TestClient) -> None:
+    """Test that missing variables and groups return 404s."""
+    assert client.get(f"{PREFIX}/variables/missing").status_code == 404
+    assert client.get(f"{PREFIX}/variables/forecast").status_code == 404
+    assert client.get(f"{PREFIX}/groups/missing").status_code == 404
+    assert client.get(f"{PREFIX}/groups/forecast/temp").status_code == 404
+
+
+def test_lazy_nodes(tree_path: Path) -> None:
+    """Test that reading one variable only caches that variable."""
+    plugin = FileMetadataPlugin()
+    server_obj = xpublish.Rest(
+        {"tree": xr.open_dataset(tree_path)},
+        plugins={"file_metadata": plugin},
+    )
+    client = TestClient(server_obj.app)
+    assert client.get(f"{PREFIX}/variables/forecast/temp").status_code == 200
+
+    metadata_cache = plugin.metadata_cache(server_obj.cache)
+    cache_keys = [str(key) for key in metadata_cache.data.keys()]
+    assert any("netcdf/variables/forecast/temp/" in key for key in cache_keys)
+    assert not any("/groups/" in key or "/metadata/" in key for key in cache_keys)
+
+
+def test_messages_unsupported(client: TestClient) -> None:
+    """Test that the GRIB message route is rejected for netcdf files."""
+    response = client.get(f"{PREFIX}/messages/0")
+    assert response.status_code == 501
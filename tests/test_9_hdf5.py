@@ -0,0 +1,177 @@
+import cachey
+import h5py
+import numpy as np
+import pytest
+import xpublish
+import xarray as xr
+from fastapi.testclient import TestClient
+from pathlib import Path
+
+from xpublish_file_metadata import FileMetadataPlugin
+from xpublish_file_metadata.formats.hdf5 import Hdf5FileMetadata
+
+PREFIX = "datasets/hdf5/file-metadata"
+
+
+@pytest.fixture(scope="module")
+def hdf5_path(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    """Return the path of a plain HDF5 file with nested groups."""
+    path = tmp_path_factory.mktemp("hdf5") / "data.h5"
+    with h5py.File(path, mode="w") as h5_file:
+        h5_file.attrs["title"] = "root"
+        h5_file.attrs["version"] = np.int32(3)
+        h5_file.attrs["bytes_attr"] = np.bytes_(b"encoded")
+        h5_file.attrs["secret_token"] = "hidden"
+
+        x = h5_file.create_dataset("x", data=np.arange(10, dtype="f8"))
+        x.make_scale("x")
+        x.attrs["units"] = "m"
+
+        sensors = h5_file.create_group("sensors")
+        sensors.attrs["site"] = "north"
+        temp = sensors.create_dataset(
+            "temp",
+            data=np.zeros((4, 10), dtype="f4"),
+            chunks=(2, 5),
+            compression="gzip",
+            compression_opts=4,
+            shuffle=True,
+        )
+        temp.dims[1].attach_scale(x)
+        temp.attrs["units"] = "K"
+
+        deep = sensors.create_group("a").create_group("b").create_group("c")
+        deep.attrs["level"] = "deep"
+    return path
+
+
+def serve(
+    hdf5_path: Path,
+    plugin: FileMetadataPlugin,
+) -> TestClient:
+    """Return a TestClient serving a dataset backed by the HDF5 file."""
+    dataset = xr.Dataset({"value": ("x", np.arange(10))})
+    dataset.encoding["source"] = str(hdf5_path)
+    server_obj = xpublish.Rest(
+        {"hdf5": dataset},
+        plugins={"file_metadata": plugin},
+    )
+    return TestClient(server_obj.app)
+
+
+@pytest.fixture(scope="module")
+def client(hdf5_path: Path) -> TestClient:
+    """Return a TestClient serving the HDF5 file's root attributes."""
+    return serve(hdf5_path, FileMetadataPlugin(hide_attrs=["*_token"]))
+
+
+def test_format(client: TestClient) -> None:
+    """Test that a plain HDF5 file is detected as hdf5."""
+    response = client.get(f"{PREFIX}/format")
+    assert response.status_code == 200
+    assert response.json() == "hdf5"
+
+
+def test_root_attrs(client: TestClient) -> None:
+    """Test that only root attributes are returned by default, decoded."""
+    response = client.get(f"{PREFIX}/attrs")
+    assert response.status_code == 200
+    assert response.json() == {
+        "title": "root",
+        "version": "3",
+        "bytes_attr": "encoded",
+    }
+
+
+def test_single_attr(client: TestClient) -> None:
+    """Test the single attribute route."""
+    assert client.get(f"{PREFIX}/attrs/title").json() == "root"
+    assert client.get(f"{PREFIX}/attrs/secret_token").status_code == 404
+    assert client.get(f"{PREFIX}/attrs/missing").status_code == 404
+
+
+def test_variable(client: TestClient) -> None:
+    """Test the metadata, dimension labels and filters of a dataset."""
+    response = client.get(f"{PREFIX}/variables/sensors/temp")
+    assert response.status_code == 200
+    variable = response.json()
+    assert variable["dimensions"] == ["", "x"]
+    assert variable["shape"] == [4, 10]
+    assert variable["dtype"] == "float32"
+    assert variable["chunking"] == [2, 5]
+    assert variable["filters"] == {
+        "compression": "gzip",
+        "compression_opts": "4",
+        "shuffle": "True",
+    }
+
+
+def test_group(client: TestClient) -> None:
+    """Test that groups list their members and dimension scales."""
+    root = client.get(f"{PREFIX}/groups").json()
+    assert root["dimensions"] == {"x": 10}
+    assert root["variables"] == ["x"]
+    assert root["groups"] == ["sensors"]
+
+    sensors = client.get(f"{PREFIX}/groups/sensors").json()
+    assert sensors["attrs"] == {"site": "north"}
+    assert sensors["variables"] == ["temp"]
+    assert client.get(f"{PREFIX}/groups/missing").status_code == 404
+
+
+def test_include_objects(hdf5_path: Path) -> None:
+    """Test that object attributes are walked within the depth budget."""
+    client = serve(
+        hdf5_path,
+        FileMetadataPlugin(
+            hide_attrs=["*_token"],
+            format_options={"hdf5": {"include_objects": True, "max_depth": 3}},
+        ),
+    )
+    attrs = client.get(f"{PREFIX}/attrs").json()
+    assert attrs["x@units"] == "m"
+    assert attrs["sensors@site"] == "north"
+    assert attrs["sensors/temp@units"] == "K"
+    assert "sensors/a/b/c@level" not in attrs
+    assert client.get(f"{PREFIX}/attrs/sensors@site").json() == "north"
+
+
+def test_node_budget(hdf5_path: Path) -> None:
+    """Test that the walk stops once the node budget is spent."""
+    grabber = Hdf5FileMetadata(include_objects=True, max_nodes=1)
+    dataset = xr.Dataset()
+    dataset.encoding["source"] = str(hdf5_path)
+    metadata = grabber.get_file_metadata(
+        dataset, cache=cachey.Cache(1e6), hide_attrs=[]
+    )
+    object_attrs = [name for name in metadata.attrs if "@" in name]
+    assert len(object_attrs) <= 1
+    grabber.handle_pool.close()
+
+
+def test_walk_stops_at_max_depth(tmp_path: Path) -> None:
+    """Test that objects past max_depth don't count against the node budget."""
+    path = tmp_path / "deep.h5"
+    with h5py.File(path, mode="w") as h5_file:
+        for i in range(20):
+            h5_file.create_group(f"a/{i}").attrs["index"] = i
+        h5_file.create_group("z").attrs["last"] = "yes"
+        # neither a hard link to a walked group nor a soft link is walked again
+        h5_file["z/up"] = h5_file["a"]
+        h5_file["z/soft"] = h5py.SoftLink("/a")
+
+    grabber = Hdf5FileMetadata(include_objects=True, max_depth=1, max_nodes=3)
+    dataset = xr.Dataset()
+    dataset.encoding["source"] = str(path)
+    metadata = grabber.get_file_metadata(
+        dataset, cache=cachey.Cache(1e6), hide_attrs=[]
+    )
+    assert metadata.attrs == {"z@last": "yes"}
+    grabber.handle_pool.close()
+
+    grabber = Hdf5FileMetadata(include_objects=True, max_depth=2)
+    metadata = grabber.get_file_metadata(
+        dataset, cache=cachey.Cache(1e6), hide_attrs=[]
+    )
+    assert set(metadata.attrs) == {f"a/{i}@index" for i in range(20)} | {"z@last"}
+    grabber.handle_pool.close()
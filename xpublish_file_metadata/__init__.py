@@ -1,4 +1,8 @@
 __version__ = "0.1.0"
+from .multifile import open_mfdataset
 from .plugin import FileMetadataPlugin
 
-__all__ = ["FileMetadataPlugin"]
+__all__ = [
+    "FileMetadataPlugin",
+    "open_mfdataset",
+]
@@ -0,0 +1,319 @@
+import logging
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+from typing import (
+    Any,
+    Callable,
+    Hashable,
+    Mapping,
+    Optional,
+    Protocol,
+)
+import cachey
+import xarray as xr
+from pydantic import BaseModel
+from xpublish.utils.api import DATASET_ID_ATTR_KEY
+from .handles import FileHandlePool
+from .metrics import PluginMetrics
+from .shared import FileMetadata
+from .store import MetadataStore
+
+logger: logging.Logger = logging.getLogger("uvicorn")
+
+
+def is_remote(source: str) -> bool:
+    """Return True if the source is a URL rather than a local path."""
+    scheme = urlsplit(source).scheme
+    # single letter schemes are windows drive letters
+    return len(scheme) > 1 and scheme != "file"
+
+
+def local_fingerprint(source: str) -> Optional[Hashable]:
+    """Return the (mtime, size) of a local file, or None if missing."""
+    if source.startswith("file:"):
+        source = urlsplit(source).path
+    try:
+        stat = os.stat(Path(source))
+    except OSError:
+        return None
+    return ("stat", stat.st_mtime_ns, stat.st_size)
+
+
+def remote_fingerprint(source: str) -> Optional[Hashable]:
+    """Return the ETag / Last-Modified / size of a URL via fsspec, if available."""
+    try:
+        import fsspec
+    except ImportError:
+        return None
+
+    try:
+        fs, path = fsspec.core.url_to_fs(source)
+        info = fs.info(path)
+    except Exception as e:
+        logger.warning(f"Could not fingerprint {source}: {e}")
+        return None
+
+    info = {str(k).lower(): v for k, v in info.items()}
+    return (
+        "remote",
+        str(info.get("etag", "")),
+        str(info.get("last-modified", info.get("lastmodified", info.get("mtime", "")))),
+        info.get("size"),
+    )
+
+
+def file_fingerprint(source: str) -> Optional[Hashable]:
+    """Return a cheap fingerprint that changes when the file is rewritten."""
+    if is_remote(source):
+        return remote_fingerprint(source)
+    return local_fingerprint(source)
+
+
+def estimate_nbytes(value: Any) -> int:
+    """Estimate the memory held by a cached value.
+
+    Follows containers and pydantic models down to their strings and
+    numbers, which is what cachey's default (sys.getsizeof of the outer
+    object only) misses.
+    """
+    if isinstance(value, BaseModel):
+        return sys.getsizeof(value) + estimate_nbytes(value.__dict__)
+    if isinstance(value, Mapping):
+        return sys.getsizeof(value) + sum(
+            estimate_nbytes(k) + estimate_nbytes(v) for k, v in value.items()
+        )
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(estimate_nbytes(i) for i in value)
+    return sys.getsizeof(value)
+
+
+class FingerprintedEntry:
+    """A cached value alongside the fingerprint of the file it was read from."""
+
+    __slots__ = ("value", "fingerprint", "checked_at")
+
+    def __init__(
+        self,
+        value: Any,
+        fingerprint: Optional[Hashable],
+    ) -> None:
+        self.value: Any = value
+        self.fingerprint: Optional[Hashable] = fingerprint
+        self.checked_at: float = time.monotonic()
+
+
+class FingerprintValidator:
+    """Reads through a cachey cache, re-reading values whose file changed.
+
+    Each cache key is revalidated at most once per ``revalidate_interval``
+    seconds, and only a cheap stat/HEAD is made to do so. A negative
+    interval disables revalidation.
+
+    If a persistent ``store`` is given, file metadata missing from the cache
+    is looked up there before the file is read, and written back after.
+    Lookups and reads are recorded in ``metrics`` under the ``format`` label.
+    """
+
+    def __init__(
+        self,
+        revalidate_interval: float = 5.0,
+        store: Optional[MetadataStore] = None,
+        metrics: Optional[PluginMetrics] = None,
+        format: str = "",
+    ) -> None:
+        self.revalidate_interval: float = revalidate_interval
+        self.store: Optional[MetadataStore] = store
+        self.metrics: Optional[PluginMetrics] = metrics
+        self.format: str = format
+        self.__lock: threading.Lock = threading.Lock()
+        # the fingerprint each source was last read at
+        self.__fingerprints: dict[str, Optional[Hashable]] = {}
+
+    def __is_due(
+        self,
+        entry: FingerprintedEntry,
+    ) -> bool:
+        """Claim the revalidation of an entry if its interval has passed."""
+        if self.revalidate_interval < 0:
+            return False
+        now = time.monotonic()
+        with self.__lock:
+            if now - entry.checked_at < self.revalidate_interval:
+                return False
+            entry.checked_at = now
+            return True
+
+    def __changed(
+        self,
+        source: str,
+        fingerprint: Optional[Hashable],
+    ) -> bool:
+        """Record the fingerprint a source is read at, True if it changed."""
+        with self.__lock:
+            previous = self.__fingerprints.get(source, fingerprint)
+            self.__fingerprints[source] = fingerprint
+        return previous != fingerprint
+
+    def __measured(
+        self,
+        read: Callable[[], Any],
+    ) -> Callable[[], Any]:
+        """Wrap read() to record its duration, failures and attribute count."""
+
+        def measured_read() -> Any:
+            start = time.perf_counter()
+            try:
+                value = read()
+            except Exception:
+                self.metrics.read_errors.inc(self.format)
+                raise
+            self.metrics.extract_seconds.observe(
+                time.perf_counter() - start,
+                self.format,
+            )
+            if isinstance(value, FileMetadata):
+                self.metrics.attr_count.observe(len(value.attrs), self.format)
+            return value
+
+        return measured_read
+
+    def __lookup(
+        self,
+        result: str,
+    ) -> None:
+        """Count a cache lookup by result, if metrics are enabled."""
+        if self.metrics is not None:
+            self.metrics.cache_lookups.inc(self.format, result)
+
+    def __read_through(
+        self,
+        key: str,
+        source: str,
+        fingerprint: Optional[Hashable],
+        read: Callable[[], Any],
+        model: type[FileMetadata],
+    ) -> Any:
+        """Read a value via the persistent store, if any.
+
+        Only FileMetadata of files with a fingerprint is persisted, and is
+        loaded back as the given model.
+        """
+        if self.metrics is not None:
+            read = self.__measured(read)
+        if self.store is None or fingerprint is None:
+            return read()
+
+        value = self.store.get(source, key, fingerprint, model=model)
+        if value is not None:
+            return value
+
+        value = read()
+        if isinstance(value, FileMetadata):
+            self.store.put(source, key, fingerprint, value)
+        return value
+
+    def get(
+        self,
+        cache: cachey.Cache,
+        key: str,
+        source: str,
+        read: Callable[[], Any],
+        on_change: Optional[Callable[[], None]] = None,
+        cost: Optional[float] = None,
+        model: type[FileMetadata] = FileMetadata,
+    ) -> Any:
+        """Return the cached value for key, reading it if missing or stale.
+
+        ``on_change`` is called before a file is read at a different
+        fingerprint than the one it was last read at, e.g. to drop pooled
+        handles pointing at the old file. That includes a cache miss, such
+        as another key of the same file or an evicted entry.
+
+        Values are cached with their estimated size in bytes and, unless a
+        ``cost`` is given, the seconds spent reading them. That's how
+        xpublish caches chunks, so cachey weighs both fairly when evicting.
+        Persisted file metadata is loaded as ``model``.
+        """
+        entry: Optional[FingerprintedEntry] = cache.get(key)
+
+        if entry is not None:
+            if not self.__is_due(entry):
+                self.__lookup("hit")
+                return entry.value
+            fingerprint = file_fingerprint(source)
+            if fingerprint == entry.fingerprint:
+                self.__lookup("hit")
+                return entry.value
+            logger.info(f"{source} changed on disk, re-reading file metadata.")
+            self.__lookup("stale")
+        else:
+            self.__lookup("miss")
+            fingerprint = file_fingerprint(source)
+        if self.__changed(source, fingerprint) and on_change is not None:
+            on_change()
+
+        start = time.perf_counter()
+        entry = FingerprintedEntry(
+            self.__read_through(key, source, fingerprint, read, model),
+            fingerprint,
+        )
+        if cost is None:
+            cost = time.perf_counter() - start
+        nbytes = sys.getsizeof(entry) + estimate_nbytes(entry.value)
+        if nbytes >= cache.available_bytes:
+            # cachey silently refuses these, so every request would re-read
+            logger.warning(
+                f"{key} of {source} takes ~{nbytes} bytes, more than the whole "
+                f"cache ({cache.available_bytes:.0f} bytes), and isn't cached."
+            )
+        cache.put(
+            key=key,
+            value=entry,
+            cost=cost,
+            nbytes=nbytes,
+        )
+        return entry.value
+
+
+class CachingFormat(Protocol):
+    """The parts of a file format sub-plugin cached_read() uses."""
+
+    format: str
+    handle_pool: FileHandlePool
+    validator: FingerprintValidator
+
+
+def dataset_cache_key(
+    dataset: xr.Dataset,
+    format: str,
+    key: str,
+) -> str:
+    """Return the cache key of a file format's entry for a dataset."""
+    return dataset.attrs.get(DATASET_ID_ATTR_KEY, "") + f"{format}/{key}"
+
+
+def cached_read(
+    grabber: CachingFormat,
+    dataset: xr.Dataset,
+    cache: cachey.Cache,
+    key: str,
+    read: Callable[[], Any],
+    model: type[FileMetadata] = FileMetadata,
+) -> Any:
+    """Read a sub-plugin's entry for a dataset through its validator.
+
+    Pooled handles of the dataset's file are dropped when it changed.
+    """
+    source = dataset.encoding["source"]
+    return grabber.validator.get(
+        cache=cache,
+        key=dataset_cache_key(dataset, grabber.format, key),
+        source=source,
+        read=read,
+        on_change=lambda: grabber.handle_pool.invalidate((grabber.format, source)),
+        model=model,
+    )
@@ -1,11 +1,100 @@
-import rasterio
+import mmap
 import cachey
 import xarray as xr
-from xpublish.utils.api import DATASET_ID_ATTR_KEY
+from fastapi import HTTPException
+from typing import (
+    Any,
+    Callable,
+    Literal,
+    Optional,
+    Union,
+)
+from ..handles import FileHandlePool
+from ..fingerprint import (
+    cached_read,
+    FingerprintValidator,
+    is_remote,
+)
+from ..remote import RemoteOpener
 from ..shared import (
+    AttrFilter,
     FileMetadata,
     FileFormats,
+    TypedFileMetadata,
+    FORMAT_WARNINGS,
 )
+from ..tiff_header import (
+    geotiff_attrs,
+    geotiff_values,
+)
+from ..typed import to_json_value
+
+# the python engine reads plain GeoTIFF headers without rasterio
+try:
+    import rasterio
+except ImportError:
+    rasterio = None
+
+# rasterio < 1.4 can't open files through Python file objects
+try:
+    from rasterio.abc import FileContainer
+except ImportError:
+    FileContainer = None
+
+
+def typed_attr(
+    name: str,
+    value: Any,
+) -> Any:
+    """Convert a rasterio attribute to its typed value.
+
+    Transforms become (a, b, c, d, e, f) lists, whichever affine version
+    is installed, and CRSs their string.
+    """
+    if name == "transform" and hasattr(value, "a"):
+        value = (value.a, value.b, value.c, value.d, value.e, value.f)
+    elif name == "crs" and value is not None:
+        value = str(value)
+    return to_json_value(value)
+
+
+class RemoteFileContainer(FileContainer or object):
+    """Serves remote files to GDAL through block cached fsspec file objects."""
+
+    def __init__(
+        self,
+        remote: RemoteOpener,
+    ) -> None:
+        self.remote: RemoteOpener = remote
+
+    def open(self, path: str, mode: str = "r", **kwds: Any) -> Any:
+        return self.remote.open(path)
+
+    def isfile(self, path: str) -> bool:
+        fs, fs_path = self.remote.filesystem(path)
+        return fs.isfile(fs_path)
+
+    def isdir(self, path: str) -> bool:
+        fs, fs_path = self.remote.filesystem(path)
+        return fs.isdir(fs_path)
+
+    def ls(self, path: str) -> list[str]:
+        fs, fs_path = self.remote.filesystem(path)
+        return fs.ls(fs_path, detail=False)
+
+    def mtime(self, path: str) -> int:
+        fs, fs_path = self.remote.filesystem(path)
+        try:
+            return int(fs.modified(fs_path).timestamp())
+        except (NotImplementedError, OSError):
+            return 0
+
+    def size(self, path: str) -> int:
+        fs, fs_path = self.remote.filesystem(path)
+        return fs.size(fs_path)
+
+    def rm(self, path: str) -> None:
+        raise PermissionError(f"Remote files are read-only: {path}")
 
 
 class GeoTiffFileMetadata:
@@ -13,56 +102,210 @@ class GeoTiffFileMetadata:
 
     format: FileFormats = "geotiff"
 
+    def __init__(
+        self,
+        handle_pool: Optional[FileHandlePool] = None,
+        validator: Optional[FingerprintValidator] = None,
+        remote: Optional[RemoteOpener] = None,
+        engine: Literal["library", "python"] = "library",
+    ) -> None:
+        if engine not in ("library", "python"):
+            raise ValueError(f"engine must be 'library' or 'python', not {engine!r}")
+
+        self.handle_pool: FileHandlePool = handle_pool or FileHandlePool()
+        self.validator: FingerprintValidator = validator or FingerprintValidator()
+        self.remote: RemoteOpener = remote or RemoteOpener()
+        # without rasterio, only the headers the python engine supports are read
+        self.engine: Literal["library", "python"] = (
+            engine if rasterio is not None else "python"
+        )
+        self.__container: Optional[RemoteFileContainer] = (
+            RemoteFileContainer(self.remote) if FileContainer is not None else None
+        )
+
+    def __open(
+        self,
+        source: str,
+    ) -> "rasterio.DatasetReader":
+        """Opens a file read-only.
+
+        Remote files are read by GDAL through a block cached file-like object,
+        so only the IFDs and tags are fetched. Before rasterio 1.4, GDAL reads
+        them through its own virtual file systems instead.
+        """
+        if rasterio is None:
+            # only reached for headers the python engine can't read
+            raise HTTPException(
+                status_code=501,
+                detail=FORMAT_WARNINGS[self.format],
+            )
+        if is_remote(source) and self.__container is not None:
+            return rasterio.open(source, mode="r", opener=self.__container)
+        return rasterio.open(source, mode="r")
+
+    def __read_header(
+        self,
+        source: str,
+        parse: Callable[[Callable[[int, int], bytes]], dict] = geotiff_attrs,
+    ) -> Optional[dict]:
+        """Parse the TIFF header in Python, or None to use rasterio.
+
+        Local files are memory-mapped and remote files read through a block
+        cached file object, so only the first IFD and its tag values are read.
+        Files the parser can't reproduce rasterio's attributes for exactly
+        (e.g. custom CRSs or rotated transforms) are left to rasterio.
+        """
+        if self.engine != "python":
+            return None
+        try:
+            if is_remote(source):
+                with self.remote.open(source) as f:
+
+                    def read(offset: int, size: int) -> bytes:
+                        f.seek(offset)
+                        return f.read(size)
+
+                    return parse(read)
+            with open(source, "rb") as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                    return parse(lambda offset, size: buffer[offset : offset + size])
+        except ValueError:
+            # HeaderParseError, or mmap refusing an empty file
+            return None
+
     def __read_attrs(
         self,
         dataset: xr.Dataset,
-        hide_attrs: list[str],
+        hide_attrs: AttrFilter,
+        typed: bool = False,
     ) -> dict:
-        """Reads and combines the different rasterio attribute types."""
-        with rasterio.open(dataset.encoding["source"], mode="r") as tiff:
-            attrs = tiff.profile
+        """Reads and combines the different rasterio attribute types.
+
+        Values are stringified, or converted with typed_attr if typed.
+        """
+        source = dataset.encoding["source"]
+
+        header = self.__read_header(
+            source,
+            parse=geotiff_values if typed else geotiff_attrs,
+        )
+        if header is not None:
+            return {
+                name: typed_attr(name, value) if typed else value
+                for name, value in header.items()
+                if name not in hide_attrs
+            }
+
+        with self.handle_pool.checkout(
+            key=(self.format, source),
+            opener=lambda: self.__open(source),
+        ) as tiff:
+            attrs = dict(tiff.profile)
             for i, tag in enumerate(tiff.tag_namespaces()):
                 attrs[tag] = tiff.tags(i)
-            attrs["bounding_box"] = str(tiff.bounds)
+            attrs["bounding_box"] = tiff.bounds if typed else str(tiff.bounds)
 
         for attr_name in list(attrs.keys()):
             if attr_name in hide_attrs:
                 del attrs[attr_name]
+            elif typed:
+                attrs[attr_name] = typed_attr(attr_name, attrs[attr_name])
             elif not isinstance(attrs[attr_name], str):
                 attrs[attr_name] = str(attrs[attr_name])
         return attrs
 
-    def get_file_metadata(
+    def __read_attr(
+        self,
+        source: str,
+        attr_name: str,
+    ) -> Optional[str]:
+        """Looks up a single attribute, or None if it doesn't exist.
+
+        Mirrors the precedence of __read_attrs without reading every tag.
+        """
+        header = self.__read_header(source)
+        if header is not None:
+            return header.get(attr_name)
+
+        with self.handle_pool.checkout(
+            key=(self.format, source),
+            opener=lambda: self.__open(source),
+        ) as tiff:
+            if attr_name == "bounding_box":
+                return str(tiff.bounds)
+
+            tag_namespaces = list(tiff.tag_namespaces())
+            if attr_name in tag_namespaces:
+                i = len(tag_namespaces) - 1 - tag_namespaces[::-1].index(attr_name)
+                return str(tiff.tags(i))
+
+            profile = tiff.profile
+            if attr_name in profile:
+                return str(profile[attr_name])
+        return None
+
+    def __get_metadata(
         self,
         dataset: xr.Dataset,
         cache: cachey.Cache,
-        hide_attrs: list[str],
+        hide_attrs: Union[AttrFilter, list[str]],
+        typed: bool,
     ) -> FileMetadata:
-        """Return the file metadata of the dataset."""
-        cache_key = (
-            dataset.attrs.get(
-                DATASET_ID_ATTR_KEY,
-                "",
-            )
-            + f"{self.format}/metadata"
+        """Return the string or typed file metadata of the dataset."""
+        hide_attrs = AttrFilter.coerce(hide_attrs)
+        model = TypedFileMetadata if typed else FileMetadata
+        metadata = cached_read(
+            self,
+            dataset,
+            cache,
+            key=f"metadata/{'typed/' if typed else ''}{hide_attrs.digest}",
+            read=lambda: model(
+                format=self.format,
+                attrs=self.__read_attrs(dataset, hide_attrs, typed=typed),
+            ),
+            model=model,
         )
+        return metadata
 
-        attrs_dict = cache.get(cache_key)
+    def get_file_metadata(
+        self,
+        dataset: xr.Dataset,
+        cache: cachey.Cache,
+        hide_attrs: Union[AttrFilter, list[str]],
+    ) -> FileMetadata:
+        """Return the file metadata of the dataset.
 
-        if not attrs_dict:
-            attrs_dict = self.__read_attrs(dataset, hide_attrs)
+        Hidden attributes are filtered out once, before the metadata is cached.
+        """
+        return self.__get_metadata(dataset, cache, hide_attrs, typed=False)
 
-            cache.put(
-                key=cache_key,
-                value=attrs_dict,
-                cost=99999,
-            )
-        # remove hidden attrs that may sneak in via cache
-        else:
-            for attr_name in hide_attrs:
-                if attr_name in attrs_dict.keys():
-                    del attrs_dict[attr_name]
-        return FileMetadata(
-            format=self.format,
-            attrs=attrs_dict,
+    def get_typed_metadata(
+        self,
+        dataset: xr.Dataset,
+        cache: cachey.Cache,
+        hide_attrs: Union[AttrFilter, list[str]],
+    ) -> TypedFileMetadata:
+        """Return the file metadata of the dataset with native JSON values."""
+        return self.__get_metadata(dataset, cache, hide_attrs, typed=True)
+
+    def get_attr(
+        self,
+        dataset: xr.Dataset,
+        cache: cachey.Cache,
+        attr_name: str,
+        hide_attrs: Union[AttrFilter, list[str]],
+    ) -> Optional[str]:
+        """Return a single file attribute of the dataset, or None if missing.
+
+        Only the requested attribute is read and cached.
+        """
+        if attr_name in AttrFilter.coerce(hide_attrs):
+            return None
+        source = dataset.encoding["source"]
+        return cached_read(
+            self,
+            dataset,
+            cache,
+            key=f"attrs/{attr_name}",
+            read=lambda: self.__read_attr(source, attr_name),
         )
@@ -1,24 +1,339 @@
+import hashlib
+import logging
+import os
 import warnings
+from pathlib import Path
 
 with warnings.catch_warnings():
     warnings.simplefilter("ignore", RuntimeWarning)
     try:
-        import cfgrib
+        import eccodes
     except RuntimeError:
         raise ImportError
 import xarray as xr
 import cachey
-from ..shared import FileMetadata
+from pydantic import BaseModel
+from typing import (
+    Any,
+    Optional,
+    Union,
+)
+from ..handles import FileHandlePool
+from ..fingerprint import (
+    cached_read,
+    FingerprintValidator,
+    file_fingerprint,
+    is_remote,
+)
+from ..remote import RemoteOpener
+from ..shared import (
+    AttrFilter,
+    FileMetadata,
+    FileFormats,
+    TypedFileMetadata,
+)
+from ..typed import to_json_value
+
+logger: logging.Logger = logging.getLogger("uvicorn")
+
+# "ls" holds the parameter, level, step and grid type keys grib_ls prints
+DEFAULT_NAMESPACES: tuple[str, ...] = ("ls", "geography")
+
+
+class GribIndex(BaseModel):
+    """The byte offsets and header keys of every message in a GRIB file.
+
+    ``numbers`` holds the native values of the numeric keys, which ecCodes
+    formats with limited precision as strings. Indexes persisted without
+    them are re-scanned.
+    """
+
+    fingerprint: str
+    offsets: list[int]
+    headers: list[dict[str, str]]
+    numbers: Optional[list[dict[str, Union[int, float]]]] = None
+
+    def typed_headers(self) -> list[dict[str, Any]]:
+        """Return the header keys with numeric keys as native numbers."""
+        return [
+            {**header, **numbers}
+            for header, numbers in zip(self.headers, self.numbers or [])
+        ]
+
+
+def read_message_keys(
+    gid: int,
+    namespaces: Optional[tuple[str, ...]],
+    numbers: Optional[dict[str, Union[int, float]]] = None,
+) -> dict[str, str]:
+    """Read the header keys of a message, without decoding its data section.
+
+    If a ``numbers`` dict is given, the native values of the integer and
+    float keys are added to it.
+    """
+    keys: dict[str, str] = {}
+    for namespace in namespaces or (None,):
+        iterator = eccodes.codes_keys_iterator_new(gid, namespace)
+        try:
+            eccodes.codes_skip_duplicates(iterator)
+            while eccodes.codes_keys_iterator_next(iterator):
+                name = eccodes.codes_keys_iterator_get_name(iterator)
+                if name in keys:
+                    continue
+                try:
+                    keys[name] = eccodes.codes_get_string(gid, name)
+                except eccodes.CodesInternalError:
+                    # array keys (e.g. pl / pv) can't be read as strings
+                    continue
+                native_type = (
+                    eccodes.codes_get_native_type(gid, name)
+                    if numbers is not None
+                    else None
+                )
+                if native_type in (int, float):
+                    numbers[name] = eccodes.codes_get(gid, name)
+        finally:
+            eccodes.codes_keys_iterator_delete(iterator)
+    return keys
+
+
+def summarize_headers(
+    headers: list[dict[str, str]],
+    hide_attrs: AttrFilter,
+    typed: bool = False,
+) -> dict[str, Any]:
+    """Aggregate per-message header keys into one attribute per key.
+
+    Keys with a single value across messages map to it, others to a
+    comma separated list of their distinct values, in order of appearance.
+    If typed, the headers hold native values (see GribIndex.typed_headers),
+    the message count is a number and the lists are JSON lists.
+    """
+    values: dict[str, dict[str, None]] = {}
+    for header in headers:
+        for name, value in header.items():
+            values.setdefault(name, {})[value] = None
+
+    attrs: dict[str, Any] = {}
+    if "message_count" not in hide_attrs:
+        attrs["message_count"] = len(headers) if typed else str(len(headers))
+    for name in hide_attrs.visible(values.keys()):
+        if not typed:
+            attrs[name] = ", ".join(values[name])
+        elif len(values[name]) == 1:
+            attrs[name] = to_json_value(next(iter(values[name])))
+        else:
+            attrs[name] = to_json_value(list(values[name]))
+    return attrs
 
 
 class GribFileMetadata:
     """Get's file metadata for grib."""
 
+    format: FileFormats = "grib"
+
+    def __init__(
+        self,
+        handle_pool: Optional[FileHandlePool] = None,
+        validator: Optional[FingerprintValidator] = None,
+        namespaces: Optional[tuple[str, ...]] = DEFAULT_NAMESPACES,
+        index_dir: Optional[Union[str, Path]] = None,
+        remote: Optional[RemoteOpener] = None,
+    ) -> None:
+        self.handle_pool: FileHandlePool = handle_pool or FileHandlePool()
+        self.validator: FingerprintValidator = validator or FingerprintValidator()
+        self.namespaces: Optional[tuple[str, ...]] = (
+            tuple(namespaces) if namespaces else None
+        )
+        self.index_dir: Optional[Path] = Path(index_dir) if index_dir else None
+        self.remote: RemoteOpener = remote or RemoteOpener()
+
+    def __index_path(
+        self,
+        source: str,
+    ) -> Optional[Path]:
+        """Return where the message index of a source is persisted, if anywhere."""
+        if self.index_dir is None:
+            return None
+        name = hashlib.blake2b(source.encode("utf-8"), digest_size=16).hexdigest()
+        return self.index_dir / f"{name}.json"
+
+    def __load_index(
+        self,
+        source: str,
+        fingerprint: str,
+    ) -> Optional[GribIndex]:
+        """Load a persisted index, if it exists and matches the file."""
+        index_path = self.__index_path(source)
+        if index_path is None or not index_path.is_file():
+            return None
+        try:
+            index = GribIndex.model_validate_json(index_path.read_bytes())
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load GRIB index {index_path}: {e}")
+            return None
+        if index.fingerprint != fingerprint or index.numbers is None:
+            return None
+        return index
+
+    def __save_index(
+        self,
+        source: str,
+        index: GribIndex,
+    ) -> None:
+        """Persist an index atomically, so concurrent readers never see half of it."""
+        index_path = self.__index_path(source)
+        if index_path is None:
+            return
+        try:
+            index_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = index_path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_text(index.model_dump_json())
+            os.replace(tmp_path, index_path)
+        except OSError as e:
+            logger.warning(f"Could not persist GRIB index {index_path}: {e}")
+
+    def __scan(
+        self,
+        source: str,
+    ) -> GribIndex:
+        """Stream every message's header keys and offset, skipping data sections."""
+        if is_remote(source):
+            # rejected by the plugin before it gets here, see LOCAL_ONLY_FORMATS
+            raise ValueError(f"Remote GRIB files are not supported: {source}")
+        fingerprint = repr(file_fingerprint(source))
+        index = self.__load_index(source, fingerprint)
+        if index is not None:
+            return index
+
+        offsets, headers, numbers = [], [], []
+        with self.handle_pool.checkout(
+            key=(self.format, source),
+            opener=lambda: open(source, mode="rb"),
+        ) as grib_file:
+            grib_file.seek(0)
+            while True:
+                gid = eccodes.codes_grib_new_from_file(grib_file, headers_only=True)
+                if gid is None:
+                    break
+                try:
+                    offsets.append(int(eccodes.codes_get(gid, "offset")))
+                    numbers.append({})
+                    headers.append(read_message_keys(gid, self.namespaces, numbers[-1]))
+                finally:
+                    eccodes.codes_release(gid)
+
+        index = GribIndex(
+            fingerprint=fingerprint,
+            offsets=offsets,
+            headers=headers,
+            numbers=numbers,
+        )
+        self.__save_index(source, index)
+        return index
+
+    def __read_message(
+        self,
+        source: str,
+        offset: int,
+        hide_attrs: AttrFilter,
+    ) -> dict[str, str]:
+        """Seek straight to a message and read all of its header keys."""
+        with self.handle_pool.checkout(
+            key=(self.format, source),
+            opener=lambda: open(source, mode="rb"),
+        ) as grib_file:
+            grib_file.seek(offset)
+            gid = eccodes.codes_grib_new_from_file(grib_file, headers_only=True)
+            try:
+                keys = read_message_keys(gid, namespaces=None)
+            finally:
+                eccodes.codes_release(gid)
+        return {name: keys[name] for name in hide_attrs.visible(keys.keys())}
+
+    def get_index(
+        self,
+        dataset: xr.Dataset,
+        cache: cachey.Cache,
+    ) -> GribIndex:
+        """Return the (cached) message index of the dataset's file."""
+        source = dataset.encoding["source"]
+        return cached_read(
+            self,
+            dataset,
+            cache,
+            key="index",
+            read=lambda: self.__scan(source),
+        )
+
     def get_file_metadata(
         self,
         dataset: xr.Dataset,
         cache: cachey.Cache,
-        hide_attrs: list[str],
+        hide_attrs: Union[AttrFilter, list[str]],
     ) -> FileMetadata:
-        """Return the file metadata of the dataset."""
-        raise NotImplementedError
+        """Return a summary of the header keys of every message in the file."""
+        hide_attrs = AttrFilter.coerce(hide_attrs)
+        return cached_read(
+            self,
+            dataset,
+            cache,
+            key=f"metadata/{hide_attrs.digest}",
+            read=lambda: FileMetadata(
+                format=self.format,
+                attrs=summarize_headers(
+                    self.get_index(dataset, cache).headers,
+                    hide_attrs,
+                ),
+            ),
+        )
+
+    def get_typed_metadata(
+        self,
+        dataset: xr.Dataset,
+        cache: cachey.Cache,
+        hide_attrs: Union[AttrFilter, list[str]],
+    ) -> TypedFileMetadata:
+        """Return the header key summary with native JSON values."""
+        hide_attrs = AttrFilter.coerce(hide_attrs)
+        return cached_read(
+            self,
+            dataset,
+            cache,
+            key=f"metadata/typed/{hide_attrs.digest}",
+            read=lambda: TypedFileMetadata(
+                format=self.format,
+                attrs=summarize_headers(
+                    self.get_index(dataset, cache).typed_headers(),
+                    hide_attrs,
+                    typed=True,
+                ),
+            ),
+            model=TypedFileMetadata,
+        )
+
+    def get_message(
+        self,
+        dataset: xr.Dataset,
+        cache: cachey.Cache,
+        message_index: int,
+        hide_attrs: Union[AttrFilter, list[str]],
+    ) -> Optional[dict[str, str]]:
+        """Return all header keys of message N (0-based), or None if missing."""
+        hide_attrs = AttrFilter.coerce(hide_attrs)
+        offsets = self.get_index(dataset, cache).offsets
+        if not 0 <= message_index < len(offsets):
+            return None
+
+        source = dataset.encoding["source"]
+        return cached_read(
+            self,
+            dataset,
+            cache,
+            key=f"messages/{message_index}/{hide_attrs.digest}",
+            read=lambda: self.__read_message(
+                source,
+                offsets[message_index],
+                hide_attrs,
+            ),
+        )
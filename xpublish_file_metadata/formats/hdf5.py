@@ -1,17 +1,390 @@
+import logging
 import h5py
+import numpy as np
 import cachey
 import xarray as xr
-from ..shared import FileMetadata
+from xarray.backends.locks import HDF5_LOCK
+from typing import (
+    Any,
+    Callable,
+    Iterable,
+    Optional,
+    Union,
+)
+from ..handles import FileHandlePool
+from ..fingerprint import (
+    cached_read,
+    FingerprintValidator,
+    is_remote,
+)
+from ..remote import RemoteOpener
+from ..shared import (
+    AttrFilter,
+    FileMetadata,
+    FileFormats,
+    GroupMetadata,
+    TypedFileMetadata,
+    VariableMetadata,
+)
+from ..typed import to_json_value
+
+logger: logging.Logger = logging.getLogger("uvicorn")
+
+
+def attr_to_str(value: Any) -> str:
+    """Stringify an h5py attribute value, decoding bytes."""
+    if isinstance(value, np.ndarray) and value.size == 1:
+        # scalars are often stored as 1 element arrays, e.g. by netCDF4
+        value = value.reshape(-1)[0]
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    if isinstance(value, np.ndarray) and value.dtype.kind in "SO":
+        return str(
+            [
+                v.decode("utf-8", errors="replace") if isinstance(v, bytes) else v
+                for v in value.tolist()
+            ]
+        )
+    return str(value)
+
+
+def dimension_names(variable: h5py.Dataset) -> list[str]:
+    """Return the dimension names of a dataset.
+
+    Dimensions are named by their label, else by their first attached scale.
+    A 1D dimension scale (e.g. a netCDF4 coordinate) names its own dimension.
+    """
+    names = []
+    for dim in variable.dims:
+        name = dim.label
+        for scale in dim.values():
+            name = name or scale.name.rsplit("/", 1)[-1]
+            break
+        if not name and variable.ndim == 1 and h5py.h5ds.is_scale(variable.id):
+            name = variable.name.rsplit("/", 1)[-1]
+        names.append(name)
+    return names
 
 
 class Hdf5FileMetadata:
     """Get's file metadata for hdf5."""
 
+    format: FileFormats = "hdf5"
+
+    def __init__(
+        self,
+        handle_pool: Optional[FileHandlePool] = None,
+        validator: Optional[FingerprintValidator] = None,
+        include_objects: bool = False,
+        max_depth: int = 8,
+        max_nodes: int = 10_000,
+        rdcc_nbytes: int = 1024**2,
+        mdc_initial_size: Optional[int] = None,
+        libver: Union[str, tuple[str, str]] = "latest",
+        remote: Optional[RemoteOpener] = None,
+        reserved_attrs: Iterable[str] = (),
+        format: FileFormats = "hdf5",
+    ) -> None:
+        self.handle_pool: FileHandlePool = handle_pool or FileHandlePool()
+        self.validator: FingerprintValidator = validator or FingerprintValidator()
+        self.include_objects: bool = include_objects
+        self.max_depth: int = max_depth
+        self.max_nodes: int = max_nodes
+        self.rdcc_nbytes: int = rdcc_nbytes
+        self.mdc_initial_size: Optional[int] = mdc_initial_size
+        self.libver: Union[str, tuple[str, str]] = libver
+        self.remote: RemoteOpener = remote or RemoteOpener()
+        self.reserved_attrs: frozenset[str] = frozenset(reserved_attrs)
+        self.format: FileFormats = format
+
+    def __open(
+        self,
+        source: str,
+    ) -> h5py.File:
+        """Opens a file read-only, without file locking, with the cache settings.
+
+        Remote files are read through a block cached file-like object, so only
+        the HDF5 objects that are looked at are fetched.
+        """
+        h5_file = h5py.File(
+            self.remote.open(source) if is_remote(source) else source,
+            mode="r",
+            libver=self.libver,
+            locking=False,
+            rdcc_nbytes=self.rdcc_nbytes,
+        )
+        if self.mdc_initial_size is not None:
+            mdc_config = h5_file.id.get_mdc_config()
+            mdc_config.set_initial_size = True
+            mdc_config.initial_size = self.mdc_initial_size
+            mdc_config.max_size = max(mdc_config.max_size, self.mdc_initial_size)
+            mdc_config.min_size = min(mdc_config.min_size, self.mdc_initial_size)
+            h5_file.id.set_mdc_config(mdc_config)
+        return h5_file
+
+    def __node_attrs(
+        self,
+        node: Union[h5py.Group, h5py.Dataset],
+        hide_attrs: AttrFilter,
+        convert: Callable[[Any], Any] = attr_to_str,
+    ) -> dict[str, Any]:
+        """Reads the visible attributes of a group or dataset, converting values."""
+        attrs = {}
+        for name in hide_attrs.visible(node.attrs.keys()):
+            if name in self.reserved_attrs:
+                continue
+            try:
+                attrs[name] = convert(node.attrs[name])
+            except (OSError, TypeError) as e:
+                logger.warning(f"Could not read attribute {name} of {node.name}: {e}")
+        return attrs
+
+    def __read_attrs(
+        self,
+        dataset: xr.Dataset,
+        hide_attrs: AttrFilter,
+        convert: Callable[[Any], Any] = attr_to_str,
+    ) -> dict:
+        """Reads the root attributes, and object attributes in one walk.
+
+        The walk doesn't descend past ``max_depth``, so deeper objects are
+        never opened, and stops after ``max_nodes`` objects. Like visititems,
+        it only follows hard links and visits each object once.
+        """
+        source = dataset.encoding["source"]
+
+        with self.handle_pool.checkout(
+            key=(self.format, source),
+            opener=lambda: self.__open(source),
+            lock=HDF5_LOCK,
+        ) as h5_file:
+            attrs = self.__node_attrs(h5_file, hide_attrs, convert)
+            if not self.include_objects:
+                return attrs
+
+            seen = {h5_file.id}
+
+            def walk(
+                group: h5py.Group,
+                prefix: str,
+                depth: int,
+            ) -> bool:
+                """Read the attributes of a group's members, False once over budget."""
+                for name in group:
+                    if not isinstance(group.get(name, getlink=True), h5py.HardLink):
+                        continue
+                    node = group[name]
+                    if node.id in seen:
+                        continue
+                    seen.add(node.id)
+                    if len(seen) > self.max_nodes + 1:
+                        logger.warning(
+                            f"Stopped walking {source} after {self.max_nodes} objects.",
+                        )
+                        return False
+
+                    path = f"{prefix}{name}"
+                    node_attrs = self.__node_attrs(node, hide_attrs, convert)
+                    for attr_name, value in node_attrs.items():
+                        attrs[f"{path}@{attr_name}"] = value
+                    if isinstance(node, h5py.Group) and depth < self.max_depth:
+                        if not walk(node, f"{path}/", depth + 1):
+                            return False
+                return True
+
+            walk(h5_file, "", 1)
+        return attrs
+
+    def __read_attr(
+        self,
+        source: str,
+        attr_name: str,
+    ) -> Optional[str]:
+        """Reads a single root attribute, or None if it doesn't exist."""
+        with self.handle_pool.checkout(
+            key=(self.format, source),
+            opener=lambda: self.__open(source),
+            lock=HDF5_LOCK,
+        ) as h5_file:
+            if attr_name in self.reserved_attrs or attr_name not in h5_file.attrs:
+                return None
+            return attr_to_str(h5_file.attrs[attr_name])
+
+    def __read_variable(
+        self,
+        source: str,
+        path: str,
+        hide_attrs: AttrFilter,
+    ) -> Optional[VariableMetadata]:
+        """Reads the metadata of one dataset, or None if it doesn't exist."""
+        with self.handle_pool.checkout(
+            key=(self.format, source),
+            opener=lambda: self.__open(source),
+            lock=HDF5_LOCK,
+        ) as h5_file:
+            variable = h5_file.get(path)
+            if not isinstance(variable, h5py.Dataset):
+                return None
+
+            filters = {
+                "compression": variable.compression,
+                "compression_opts": variable.compression_opts,
+                "shuffle": variable.shuffle,
+                "fletcher32": variable.fletcher32,
+                "scaleoffset": variable.scaleoffset,
+            }
+            return VariableMetadata(
+                path=path,
+                dimensions=dimension_names(variable),
+                shape=list(variable.shape or []),
+                dtype=str(variable.dtype),
+                attrs=self.__node_attrs(variable, hide_attrs),
+                chunking=list(variable.chunks) if variable.chunks else None,
+                filters={
+                    name: str(value)
+                    for name, value in filters.items()
+                    if value not in (None, False)
+                },
+            )
+
+    def __read_group(
+        self,
+        source: str,
+        path: str,
+        hide_attrs: AttrFilter,
+    ) -> Optional[GroupMetadata]:
+        """Reads the metadata of one group, or None if it doesn't exist."""
+        with self.handle_pool.checkout(
+            key=(self.format, source),
+            opener=lambda: self.__open(source),
+            lock=HDF5_LOCK,
+        ) as h5_file:
+            group = h5_file.get(path)
+            if not isinstance(group, h5py.Group):
+                return None
+
+            variables, groups, dimensions = [], [], {}
+            for name in group.keys():
+                # get(getclass=True) avoids opening the child object
+                child_class = group.get(name, getclass=True)
+                if child_class is h5py.Group:
+                    groups.append(name)
+                elif child_class is h5py.Dataset:
+                    variables.append(name)
+                    child = group[name]
+                    if h5py.h5ds.is_scale(child.id) and child.ndim == 1:
+                        dimensions[name] = len(child)
+
+            return GroupMetadata(
+                path=path,
+                attrs=self.__node_attrs(group, hide_attrs),
+                dimensions=dimensions,
+                variables=variables,
+                groups=groups,
+            )
+
     def get_file_metadata(
         self,
         dataset: xr.Dataset,
         cache: cachey.Cache,
-        hide_attrs: list[str],
+        hide_attrs: Union[AttrFilter, list[str]],
     ) -> FileMetadata:
-        """Return the file metadata of the dataset."""
-        raise NotImplementedError
+        """Return the file metadata of the dataset.
+
+        Hidden attributes are filtered out once, before the metadata is cached.
+        """
+        hide_attrs = AttrFilter.coerce(hide_attrs)
+        return cached_read(
+            self,
+            dataset,
+            cache,
+            key=f"metadata/{hide_attrs.digest}",
+            read=lambda: FileMetadata(
+                format=self.format,
+                attrs=self.__read_attrs(dataset, hide_attrs),
+            ),
+        )
+
+    def get_typed_metadata(
+        self,
+        dataset: xr.Dataset,
+        cache: cachey.Cache,
+        hide_attrs: Union[AttrFilter, list[str]],
+    ) -> TypedFileMetadata:
+        """Return the file metadata of the dataset with native JSON values."""
+        hide_attrs = AttrFilter.coerce(hide_attrs)
+        return cached_read(
+            self,
+            dataset,
+            cache,
+            key=f"metadata/typed/{hide_attrs.digest}",
+            read=lambda: TypedFileMetadata(
+                format=self.format,
+                attrs=self.__read_attrs(dataset, hide_attrs, convert=to_json_value),
+            ),
+            model=TypedFileMetadata,
+        )
+
+    def get_attr(
+        self,
+        dataset: xr.Dataset,
+        cache: cachey.Cache,
+        attr_name: str,
+        hide_attrs: Union[AttrFilter, list[str]],
+    ) -> Optional[str]:
+        """Return a single file attribute of the dataset, or None if missing.
+
+        Only the requested attribute is read and cached. Object attributes
+        ("{object path}@{attribute name}") fall back to the full metadata.
+        """
+        hide_attrs = AttrFilter.coerce(hide_attrs)
+        if attr_name in hide_attrs:
+            return None
+        if "@" in attr_name:
+            return self.get_file_metadata(dataset, cache, hide_attrs).attrs.get(
+                attr_name
+            )
+        source = dataset.encoding["source"]
+        return cached_read(
+            self,
+            dataset,
+            cache,
+            key=f"attrs/{attr_name}",
+            read=lambda: self.__read_attr(source, attr_name),
+        )
+
+    def get_variable(
+        self,
+        dataset: xr.Dataset,
+        cache: cachey.Cache,
+        path: str,
+        hide_attrs: Union[AttrFilter, list[str]],
+    ) -> Optional[VariableMetadata]:
+        """Return the metadata of one dataset, or None if missing."""
+        hide_attrs = AttrFilter.coerce(hide_attrs)
+        source = dataset.encoding["source"]
+        return cached_read(
+            self,
+            dataset,
+            cache,
+            key=f"variables{path}/{hide_attrs.digest}",
+            read=lambda: self.__read_variable(source, path, hide_attrs),
+        )
+
+    def get_group(
+        self,
+        dataset: xr.Dataset,
+        cache: cachey.Cache,
+        path: str,
+        hide_attrs: Union[AttrFilter, list[str]],
+    ) -> Optional[GroupMetadata]:
+        """Return the metadata of one group, or None if missing."""
+        hide_attrs = AttrFilter.coerce(hide_attrs)
+        source = dataset.encoding["source"]
+        return cached_read(
+            self,
+            dataset,
+            cache,
+            key=f"groups{path}/{hide_attrs.digest}",
+            read=lambda: self.__read_group(source, path, hide_attrs),
+        )
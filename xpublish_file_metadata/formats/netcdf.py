@@ -1,10 +1,62 @@
+import mmap
 import netCDF4 as nc
-from xpublish.utils.api import DATASET_ID_ATTR_KEY
 import cachey
 import xarray as xr
+from fastapi import HTTPException
+from xarray.backends.locks import (
+    HDF5_LOCK,
+    NETCDFC_LOCK,
+    combine_locks,
+)
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Literal,
+    Optional,
+    Union,
+)
+from ..handles import FileHandlePool
+from ..fingerprint import (
+    cached_read,
+    FingerprintValidator,
+    is_remote,
+)
+from ..remote import RemoteOpener
+from ..netcdf_header import (
+    ClassicHeader,
+    parse_netcdf_classic_header,
+)
+from ..sniff import CDF_SIGNATURES
 from ..shared import (
+    AttrFilter,
     FileMetadata,
     FileFormats,
+    GroupMetadata,
+    TypedFileMetadata,
+    VariableMetadata,
+)
+from ..typed import to_json_value
+
+# imported when the first remote netCDF4 file is read, see __remote_netcdf4
+if TYPE_CHECKING:
+    from .hdf5 import Hdf5FileMetadata
+
+# netCDF-C and HDF5 aren't thread-safe, share xarray's locks for the libraries
+NETCDF_LOCK = combine_locks([HDF5_LOCK, NETCDFC_LOCK])
+
+# HDF5 attributes netCDF4 uses internally, which netCDF4.Dataset hides
+NETCDF4_RESERVED_ATTRS: tuple[str, ...] = (
+    "_NCProperties",
+    "_Netcdf4Coordinates",
+    "_Netcdf4Dimid",
+    "_nc3_strict",
+    "_IsNetcdf4",
+    "_SuperblockVersion",
+    "CLASS",
+    "NAME",
+    "DIMENSION_LIST",
+    "REFERENCE_LIST",
 )
 
 
@@ -13,73 +65,382 @@ class NetcdfFileMetadata:
 
     format: FileFormats = "netcdf"
 
-    def __get_nc_dataset(
+    def __init__(
         self,
-        dataset: xr.Dataset,
-        cache: cachey.Cache,
+        handle_pool: Optional[FileHandlePool] = None,
+        validator: Optional[FingerprintValidator] = None,
+        remote: Optional[RemoteOpener] = None,
+        engine: Literal["library", "python"] = "library",
+    ) -> None:
+        if engine not in ("library", "python"):
+            raise ValueError(f"engine must be 'library' or 'python', not {engine!r}")
+
+        self.handle_pool: FileHandlePool = handle_pool or FileHandlePool()
+        self.validator: FingerprintValidator = validator or FingerprintValidator()
+        self.remote: RemoteOpener = remote or RemoteOpener()
+        self.engine: Literal["library", "python"] = engine
+        self.__netcdf4: Optional["Hdf5FileMetadata"] = None
+        self.__remote_kinds: dict[str, bool] = {}
+
+    def __open(
+        self,
+        source: str,
     ) -> nc.Dataset:
-        """Return the netCDF4.Dataset object from an xarray.Dataset object."""
+        """Opens a file read-only.
 
-        # get the netcdf dataset from cache if cached
-        cache_key = (
-            dataset.attrs.get(
-                DATASET_ID_ATTR_KEY,
-                "",
+        Remote netCDF classic files are opened from their header bytes alone,
+        fetched with range requests.
+        """
+        if is_remote(source):
+            return self.remote.read_netcdf_classic_header(
+                source,
+                # netCDF-C would parse a URL given as the name of an in-memory file
+                parse=lambda header: nc.Dataset(
+                    source.rsplit("/", 1)[-1],
+                    mode="r",
+                    memory=header,
+                ),
             )
-            + f"/{self.format}/dataset"
-        )
-        nc_dataset = cache.get(cache_key)
-
-        # otherwise open the netcdf dataset and cache it
-        nc_dataset = nc.Dataset(dataset.encoding["source"])
-        cache.put(
-            key=cache_key,
-            value=nc_dataset,
-            cost=99999,
-        )
+        return nc.Dataset(source, mode="r")
 
-        return nc_dataset
+    def __read_header(
+        self,
+        source: str,
+    ) -> Optional[ClassicHeader]:
+        """Parse a netCDF classic header in Python, or None to use netCDF4.
 
-    def get_file_metadata(
+        Local files are memory-mapped, so only the pages holding the header
+        are read. HDF5 based files, and anything else the parser doesn't
+        support, are left to netCDF4.
+        """
+        if self.engine != "python":
+            return None
+        try:
+            if is_remote(source):
+                return self.remote.read_netcdf_classic_header(
+                    source,
+                    parse=parse_netcdf_classic_header,
+                )
+            with open(source, "rb") as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                    return parse_netcdf_classic_header(buffer)
+        except ValueError:
+            # HeaderParseError, or mmap refusing an empty file
+            return None
+
+    def __remote_netcdf4(
         self,
-        dataset: xr.Dataset,
-        cache: cachey.Cache,
-        hide_attrs: list[str],
-    ) -> FileMetadata:
-        """Return the file metadata of the dataset."""
-        cache_key = (
-            dataset.attrs.get(
-                DATASET_ID_ATTR_KEY,
-                "",
+        source: str,
+    ) -> Optional["Hdf5FileMetadata"]:
+        """Return the h5py based reader if the source is a remote netCDF4 file.
+
+        netCDF4.Dataset can only open HDF5 based files in memory as a whole,
+        so their HDF5 objects are read through h5py's file-like object support.
+        """
+        if not is_remote(source):
+            return None
+
+        is_netcdf4 = self.__remote_kinds.get(source)
+        if is_netcdf4 is None:
+            is_netcdf4 = self.remote.read_range(source, 0, 4) not in CDF_SIGNATURES
+            self.__remote_kinds[source] = is_netcdf4
+        if not is_netcdf4:
+            return None
+
+        if self.__netcdf4 is None:
+            try:
+                from .hdf5 import Hdf5FileMetadata
+            except ImportError:
+                raise HTTPException(
+                    status_code=501,
+                    detail="Install h5py to get file metadata of remote netCDF4 files.",
+                )
+            self.__netcdf4 = Hdf5FileMetadata(
+                handle_pool=self.handle_pool,
+                validator=self.validator,
+                remote=self.remote,
+                reserved_attrs=NETCDF4_RESERVED_ATTRS,
+                format=self.format,
             )
-            + f"{self.format}/metadata"
-        )
+        return self.__netcdf4
 
-        attrs_dict = cache.get(cache_key)
+    def __read_attrs(
+        self,
+        dataset: xr.Dataset,
+        hide_attrs: AttrFilter,
+        convert: Callable[[Any], Any] = str,
+    ) -> dict:
+        """Reads the global attributes using a pooled netCDF4.Dataset handle.
 
-        if not attrs_dict:
-            nc_dataset = self.__get_nc_dataset(dataset, cache)
+        Values are converted with ``convert``, e.g. to_json_value.
+        """
+        source = dataset.encoding["source"]
 
-            nc_attr_names = [
-                i for i in list(nc_dataset.ncattrs()) if i not in hide_attrs
-            ]
-            attrs_dict = dict(
+        header = self.__read_header(source)
+        if header is not None:
+            return {
+                name: convert(header.attrs[name])
+                for name in hide_attrs.visible(header.attrs)
+            }
+
+        with self.handle_pool.checkout(
+            key=(self.format, source),
+            opener=lambda: self.__open(source),
+            lock=NETCDF_LOCK,
+        ) as nc_dataset:
+            nc_attr_names = hide_attrs.visible(nc_dataset.ncattrs())
+            return dict(
                 zip(
                     nc_attr_names,
-                    [str(nc_dataset.getncattr(i)) for i in nc_attr_names],
+                    [convert(nc_dataset.getncattr(i)) for i in nc_attr_names],
                 ),
             )
-            cache.put(
-                key=cache_key,
-                value=attrs_dict,
-                cost=99999,
+
+    def __read_attr(
+        self,
+        source: str,
+        attr_name: str,
+    ) -> Optional[str]:
+        """Reads a single global attribute, or None if it doesn't exist."""
+        header = self.__read_header(source)
+        if header is not None:
+            value = header.attrs.get(attr_name)
+            return None if value is None else str(value)
+
+        with self.handle_pool.checkout(
+            key=(self.format, source),
+            opener=lambda: self.__open(source),
+            lock=NETCDF_LOCK,
+        ) as nc_dataset:
+            try:
+                return str(nc_dataset.getncattr(attr_name))
+            except AttributeError:
+                return None
+
+    @staticmethod
+    def __node_attrs(
+        node: Union[nc.Dataset, nc.Group, nc.Variable],
+        hide_attrs: AttrFilter,
+    ) -> dict[str, str]:
+        """Reads the visible attributes of a group or variable."""
+        return {
+            name: str(node.getncattr(name))
+            for name in hide_attrs.visible(node.ncattrs())
+        }
+
+    def __read_variable(
+        self,
+        source: str,
+        path: str,
+        hide_attrs: AttrFilter,
+    ) -> Optional[VariableMetadata]:
+        """Reads the metadata of one variable, or None if it doesn't exist."""
+        header = self.__read_header(source)
+        if header is not None:
+            variable = header.variables.get(path.strip("/"))
+            if variable is None:
+                return None
+            return VariableMetadata(
+                path=path,
+                dimensions=variable.dimensions,
+                shape=variable.shape,
+                dtype=str(variable.dtype),
+                attrs={
+                    name: str(variable.attrs[name])
+                    for name in hide_attrs.visible(variable.attrs)
+                },
+            )
+
+        with self.handle_pool.checkout(
+            key=(self.format, source),
+            opener=lambda: self.__open(source),
+            lock=NETCDF_LOCK,
+        ) as nc_dataset:
+            try:
+                variable = nc_dataset[path.strip("/")]
+            except (IndexError, KeyError):
+                return None
+            if not isinstance(variable, nc.Variable):
+                return None
+
+            chunking = variable.chunking()
+            filters = variable.filters() or {}
+            return VariableMetadata(
+                path=path,
+                dimensions=list(variable.dimensions),
+                shape=list(variable.shape),
+                dtype=str(variable.dtype),
+                attrs=self.__node_attrs(variable, hide_attrs),
+                chunking=None if chunking in (None, "contiguous") else list(chunking),
+                filters={name: str(value) for name, value in filters.items()},
             )
-        # remove hidden attrs that may sneak in via cache
-        else:
-            for attr_name in hide_attrs:
-                if attr_name in attrs_dict.keys():
-                    del attrs_dict[attr_name]
-        return FileMetadata(
-            format=self.format,
-            attrs=attrs_dict,
+
+    def __read_group(
+        self,
+        source: str,
+        path: str,
+        hide_attrs: AttrFilter,
+    ) -> Optional[GroupMetadata]:
+        """Reads the metadata of one group, or None if it doesn't exist."""
+        header = self.__read_header(source)
+        if header is not None:
+            # classic files only have the root group
+            if any(path.split("/")):
+                return None
+            return GroupMetadata(
+                path=path,
+                attrs={
+                    name: str(header.attrs[name])
+                    for name in hide_attrs.visible(header.attrs)
+                },
+                dimensions=header.dimensions,
+                variables=list(header.variables),
+                groups=[],
+            )
+
+        with self.handle_pool.checkout(
+            key=(self.format, source),
+            opener=lambda: self.__open(source),
+            lock=NETCDF_LOCK,
+        ) as nc_dataset:
+            group = nc_dataset
+            for name in filter(None, path.split("/")):
+                group = group.groups.get(name)
+                if group is None:
+                    return None
+
+            return GroupMetadata(
+                path=path,
+                attrs=self.__node_attrs(group, hide_attrs),
+                dimensions={name: len(dim) for name, dim in group.dimensions.items()},
+                variables=list(group.variables.keys()),
+                groups=list(group.groups.keys()),
+            )
+
+    def __get_metadata(
+        self,
+        dataset: xr.Dataset,
+        cache: cachey.Cache,
+        hide_attrs: Union[AttrFilter, list[str]],
+        typed: bool,
+    ) -> FileMetadata:
+        """Return the string or typed file metadata of the dataset."""
+        hide_attrs = AttrFilter.coerce(hide_attrs)
+        model = TypedFileMetadata if typed else FileMetadata
+        metadata = cached_read(
+            self,
+            dataset,
+            cache,
+            key=f"metadata/{'typed/' if typed else ''}{hide_attrs.digest}",
+            read=lambda: model(
+                format=self.format,
+                attrs=self.__read_attrs(
+                    dataset,
+                    hide_attrs,
+                    convert=to_json_value if typed else str,
+                ),
+            ),
+            model=model,
+        )
+        return metadata
+
+    def get_file_metadata(
+        self,
+        dataset: xr.Dataset,
+        cache: cachey.Cache,
+        hide_attrs: Union[AttrFilter, list[str]],
+    ) -> FileMetadata:
+        """Return the file metadata of the dataset.
+
+        Hidden attributes are filtered out once, before the metadata is cached.
+        """
+        netcdf4 = self.__remote_netcdf4(dataset.encoding["source"])
+        if netcdf4 is not None:
+            return netcdf4.get_file_metadata(dataset, cache, hide_attrs)
+        return self.__get_metadata(dataset, cache, hide_attrs, typed=False)
+
+    def get_typed_metadata(
+        self,
+        dataset: xr.Dataset,
+        cache: cachey.Cache,
+        hide_attrs: Union[AttrFilter, list[str]],
+    ) -> TypedFileMetadata:
+        """Return the file metadata of the dataset with native JSON values."""
+        netcdf4 = self.__remote_netcdf4(dataset.encoding["source"])
+        if netcdf4 is not None:
+            return netcdf4.get_typed_metadata(dataset, cache, hide_attrs)
+        return self.__get_metadata(dataset, cache, hide_attrs, typed=True)
+
+    def get_attr(
+        self,
+        dataset: xr.Dataset,
+        cache: cachey.Cache,
+        attr_name: str,
+        hide_attrs: Union[AttrFilter, list[str]],
+    ) -> Optional[str]:
+        """Return a single file attribute of the dataset, or None if missing.
+
+        Only the requested attribute is read and cached.
+        """
+        netcdf4 = self.__remote_netcdf4(dataset.encoding["source"])
+        if netcdf4 is not None:
+            return netcdf4.get_attr(dataset, cache, attr_name, hide_attrs)
+        if attr_name in AttrFilter.coerce(hide_attrs):
+            return None
+        source = dataset.encoding["source"]
+        return cached_read(
+            self,
+            dataset,
+            cache,
+            key=f"attrs/{attr_name}",
+            read=lambda: self.__read_attr(source, attr_name),
+        )
+
+    def get_variable(
+        self,
+        dataset: xr.Dataset,
+        cache: cachey.Cache,
+        path: str,
+        hide_attrs: Union[AttrFilter, list[str]],
+    ) -> Optional[VariableMetadata]:
+        """Return the metadata of one variable, or None if missing.
+
+        Only the requested variable is read and cached.
+        """
+        netcdf4 = self.__remote_netcdf4(dataset.encoding["source"])
+        if netcdf4 is not None:
+            return netcdf4.get_variable(dataset, cache, path, hide_attrs)
+        hide_attrs = AttrFilter.coerce(hide_attrs)
+        source = dataset.encoding["source"]
+        return cached_read(
+            self,
+            dataset,
+            cache,
+            key=f"variables{path}/{hide_attrs.digest}",
+            read=lambda: self.__read_variable(source, path, hide_attrs),
+        )
+
+    def get_group(
+        self,
+        dataset: xr.Dataset,
+        cache: cachey.Cache,
+        path: str,
+        hide_attrs: Union[AttrFilter, list[str]],
+    ) -> Optional[GroupMetadata]:
+        """Return the metadata of one group, or None if missing.
+
+        Only the requested group is read and cached, its children are listed
+        by name.
+        """
+        netcdf4 = self.__remote_netcdf4(dataset.encoding["source"])
+        if netcdf4 is not None:
+            return netcdf4.get_group(dataset, cache, path, hide_attrs)
+        hide_attrs = AttrFilter.coerce(hide_attrs)
+        source = dataset.encoding["source"]
+        return cached_read(
+            self,
+            dataset,
+            cache,
+            key=f"groups{path}/{hide_attrs.digest}",
+            read=lambda: self.__read_group(source, path, hide_attrs),
         )
@@ -0,0 +1,201 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import (
+    AbstractContextManager,
+    contextmanager,
+    nullcontext,
+)
+from typing import (
+    Any,
+    Callable,
+    Hashable,
+    Iterator,
+    Optional,
+)
+from .metrics import PluginMetrics
+
+logger: logging.Logger = logging.getLogger("uvicorn")
+
+
+class FileHandlePool:
+    """A bounded, thread-safe LRU pool of open file handles.
+
+    A handle is checked out for exclusive use by one thread and returned
+    to the pool once the ``with`` block exits. Idle handles beyond
+    ``max_size`` are evicted least-recently-used first and closed.
+
+    Handles of libraries that aren't thread-safe (netCDF-C, HDF5) are checked
+    out with a ``lock``, held while the handle is opened, used and closed.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 64,
+        metrics: Optional[PluginMetrics] = None,
+    ) -> None:
+        if max_size < 1:
+            raise ValueError(f"max_size must be >= 1, not {max_size}")
+
+        self.__max_size: int = max_size
+        self.__lock: threading.Lock = threading.Lock()
+        # idle (handle, lock) pairs by key
+        self.__idle: OrderedDict[Hashable, list[tuple[Any, Any]]] = OrderedDict()
+        self.__generations: dict[Hashable, int] = {}
+        self.__idle_count: int = 0
+        self.__checked_out: int = 0
+        self.__metrics: Optional[PluginMetrics] = metrics
+
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+
+    @property
+    def max_size(self) -> int:
+        """The maximum number of idle handles kept open."""
+        return self.__max_size
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """Counters describing the pool usage."""
+        with self.__lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "idle": self.__idle_count,
+                "checked_out": self.__checked_out,
+                "open": self.__idle_count + self.__checked_out,
+                "max_size": self.__max_size,
+            }
+
+    @staticmethod
+    def __close(
+        handle: Any,
+        lock: Optional[AbstractContextManager] = None,
+    ) -> None:
+        """Close a handle under its lock, logging rather than raising on failure."""
+        try:
+            with lock or nullcontext():
+                handle.close()
+        except Exception as e:
+            logger.warning(f"Failed to close file handle {handle!r}: {e}")
+
+    def __acquire(
+        self,
+        key: Hashable,
+    ) -> tuple[Any, int]:
+        """Pop an idle handle for the key (or None) and the key's generation."""
+        with self.__lock:
+            self.__checked_out += 1
+            generation = self.__generations.get(key, 0)
+            handles = self.__idle.get(key)
+            if not handles:
+                self.misses += 1
+                return None, generation
+
+            self.hits += 1
+            handle, _ = handles.pop()
+            self.__idle_count -= 1
+            if not handles:
+                del self.__idle[key]
+            return handle, generation
+
+    def __release(
+        self,
+        key: Hashable,
+        handle: Any,
+        generation: int,
+        lock: Optional[AbstractContextManager],
+    ) -> None:
+        """Return a handle to the pool, evicting the least recently used."""
+        to_close: list[tuple[Any, Any]] = []
+        with self.__lock:
+            self.__checked_out -= 1
+            if generation != self.__generations.get(key, 0):
+                # the key was invalidated while this handle was checked out
+                to_close.append((handle, lock))
+            else:
+                self.__idle.setdefault(key, []).append((handle, lock))
+                self.__idle.move_to_end(key)
+                self.__idle_count += 1
+
+            while self.__idle_count > self.__max_size:
+                lru_key, lru_handles = next(iter(self.__idle.items()))
+                to_close.append(lru_handles.pop(0))
+                self.__idle_count -= 1
+                self.evictions += 1
+                if not lru_handles:
+                    del self.__idle[lru_key]
+
+        for stale_handle, stale_lock in to_close:
+            self.__close(stale_handle, stale_lock)
+
+    @contextmanager
+    def checkout(
+        self,
+        key: Hashable,
+        opener: Callable[[], Any],
+        lock: Optional[AbstractContextManager] = None,
+    ) -> Iterator[Any]:
+        """Check out an open handle for the key, opening one on a miss.
+
+        The handle is returned to the pool on exit. If the ``with`` block
+        raises, the handle is closed instead since its state is unknown.
+        The ``lock``, if given, is held while opening and for the ``with``
+        block, and again whenever the pool closes the handle.
+        """
+        handle, generation = self.__acquire(key)
+        with lock or nullcontext():
+            if handle is None:
+                start = time.perf_counter()
+                try:
+                    handle = opener()
+                except BaseException:
+                    with self.__lock:
+                        self.__checked_out -= 1
+                    raise
+                if self.__metrics is not None:
+                    # keys are (format, source) tuples
+                    self.__metrics.open_seconds.observe(
+                        time.perf_counter() - start,
+                        key[0] if isinstance(key, tuple) else "",
+                    )
+
+            try:
+                yield handle
+            except BaseException:
+                with self.__lock:
+                    self.__checked_out -= 1
+                # the lock is already held
+                self.__close(handle)
+                raise
+        self.__release(key, handle, generation, lock)
+
+    def invalidate(
+        self,
+        key: Hashable,
+    ) -> None:
+        """Close all idle handles for the key.
+
+        Handles for the key that are currently checked out are closed when
+        they are returned instead of going back into the pool.
+        """
+        with self.__lock:
+            self.__generations[key] = self.__generations.get(key, 0) + 1
+            handles = self.__idle.pop(key, [])
+            self.__idle_count -= len(handles)
+
+        for handle, lock in handles:
+            self.__close(handle, lock)
+
+    def close(self) -> None:
+        """Close all idle handles in the pool."""
+        with self.__lock:
+            handles = [h for key_handles in self.__idle.values() for h in key_handles]
+            self.__idle.clear()
+            self.__idle_count = 0
+
+        for handle, lock in handles:
+            self.__close(handle, lock)
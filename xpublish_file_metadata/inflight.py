@@ -0,0 +1,78 @@
+import asyncio
+import threading
+from concurrent.futures import (
+    Future,
+    ThreadPoolExecutor,
+)
+from typing import (
+    Any,
+    Callable,
+    Hashable,
+)
+
+
+class CoalescingExecutor:
+    """Runs blocking calls on a dedicated, size-limited thread pool.
+
+    Concurrent calls sharing a key are coalesced into a single in-flight
+    future whose result (or exception) is shared by all waiters.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 8,
+    ) -> None:
+        if max_workers < 1:
+            raise ValueError(f"max_workers must be >= 1, not {max_workers}")
+
+        self.__executor: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="file-metadata-io",
+        )
+        self.__lock: threading.Lock = threading.Lock()
+        self.__inflight: dict[Hashable, Future] = {}
+
+        self.coalesced: int = 0
+
+    @property
+    def inflight(self) -> int:
+        """The number of distinct calls currently running or queued."""
+        with self.__lock:
+            return len(self.__inflight)
+
+    def submit(
+        self,
+        key: Hashable,
+        func: Callable[..., Any],
+        *args: Any,
+    ) -> Future:
+        """Return the in-flight future for the key, submitting func on a miss."""
+        with self.__lock:
+            future = self.__inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future
+
+            future = self.__executor.submit(func, *args)
+            self.__inflight[key] = future
+
+        def forget(done: Future) -> None:
+            with self.__lock:
+                if self.__inflight.get(key) is done:
+                    del self.__inflight[key]
+
+        future.add_done_callback(forget)
+        return future
+
+    async def run(
+        self,
+        key: Hashable,
+        func: Callable[..., Any],
+        *args: Any,
+    ) -> Any:
+        """Await the (possibly shared) result of func(*args) for the key.
+
+        A cancelled waiter does not cancel the call for the other waiters.
+        """
+        future = self.submit(key, func, *args)
+        return await asyncio.shield(asyncio.wrap_future(future))
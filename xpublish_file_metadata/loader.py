@@ -0,0 +1,159 @@
+import importlib.metadata
+import importlib.util
+import inspect
+import logging
+import threading
+import time
+from typing import (
+    get_args,
+    Any,
+    Optional,
+)
+from .shared import (
+    FileFormats,
+    FORMAT_DEPENDENCIES,
+    FORMAT_WARNINGS,
+)
+
+logger: logging.Logger = logging.getLogger("uvicorn")
+
+ENTRY_POINT_GROUP: str = "xpublish_file_metadata.formats"
+
+
+def discover_file_formats() -> dict[FileFormats, importlib.metadata.EntryPoint]:
+    """Return the entry points of the file format sub-plugins, without loading them."""
+    entry_points: dict[FileFormats, importlib.metadata.EntryPoint] = {}
+    for entrypoint in importlib.metadata.entry_points(group=ENTRY_POINT_GROUP):
+        if entrypoint.name not in get_args(FileFormats):
+            logger.warning(
+                f"Skipping {entrypoint.name} support: Not a supported file format.",
+            )
+            continue
+        entry_points.setdefault(entrypoint.name, entrypoint)
+    return entry_points
+
+
+def accepted_kwargs(
+    format_class: type,
+    kwargs: dict[str, Any],
+) -> dict[str, Any]:
+    """Return the keyword arguments the sub-plugin class's constructor accepts.
+
+    Lets sub-plugins written before the shared handle pool, validator and
+    remote opener existed keep their no-argument constructors.
+    """
+    parameters = inspect.signature(format_class).parameters.values()
+    if any(p.kind is inspect.Parameter.VAR_KEYWORD for p in parameters):
+        return dict(kwargs)
+    names = {
+        p.name
+        for p in parameters
+        if p.kind
+        in (inspect.Parameter.POSITIONAL_OR_KEYWORD, inspect.Parameter.KEYWORD_ONLY)
+    }
+    return {name: value for name, value in kwargs.items() if name in names}
+
+
+class FormatLoader:
+    """Imports file format sub-plugins the first time they are needed.
+
+    Entry points are discovered up front with importlib.metadata, which
+    imports nothing, so a server only pays for the libraries (GDAL, netCDF4,
+    h5py, ecCodes) of the formats it actually serves. Import times are logged.
+    """
+
+    def __init__(
+        self,
+        protocol: type,
+    ) -> None:
+        self.__protocol: type = protocol
+        self.__entry_points: dict[FileFormats, importlib.metadata.EntryPoint] = (
+            discover_file_formats()
+        )
+        self.__lock: threading.Lock = threading.Lock()
+        self.__loaded: dict[FileFormats, type] = {}
+        self.__failed: set[FileFormats] = set()
+        self.__import_times: dict[FileFormats, float] = {}
+
+    @property
+    def formats(self) -> list[FileFormats]:
+        """The discovered file formats, loaded or not."""
+        return list(self.__entry_points.keys())
+
+    @property
+    def loaded(self) -> dict[FileFormats, type]:
+        """The file format sub-plugins imported so far."""
+        return dict(self.__loaded)
+
+    @property
+    def import_times(self) -> dict[FileFormats, float]:
+        """Seconds spent importing each loaded file format sub-plugin."""
+        return dict(self.__import_times)
+
+    def available(self) -> list[FileFormats]:
+        """Return the formats that can be loaded, without importing them.
+
+        A format is available once loaded, or if its dependencies can be
+        found and it hasn't failed to load before.
+        """
+        return [
+            format
+            for format in self.formats
+            if format in self.__loaded
+            or (
+                format not in self.__failed
+                and all(
+                    importlib.util.find_spec(module) is not None
+                    for module in FORMAT_DEPENDENCIES.get(format, ())
+                )
+            )
+        ]
+
+    def load(
+        self,
+        format: FileFormats,
+    ) -> Optional[type]:
+        """Return a format's sub-plugin, importing it on first use.
+
+        Returns None if the format wasn't discovered or can't be imported,
+        in which case the failure is logged once.
+        """
+        format_class = self.__loaded.get(format)
+        if format_class is not None or format in self.__failed:
+            return format_class
+
+        with self.__lock:
+            if format in self.__loaded or format in self.__failed:
+                return self.__loaded.get(format)
+            entrypoint = self.__entry_points.get(format)
+            if entrypoint is None:
+                return None
+
+            start = time.perf_counter()
+            try:
+                format_class = entrypoint.load()
+            except ImportError:
+                self.__failed.add(format)
+                logger.warning(
+                    f"ImportError: {FORMAT_WARNINGS[format]}",
+                )
+                return None
+            elapsed = time.perf_counter() - start
+
+            if not isinstance(format_class, self.__protocol):
+                self.__failed.add(format)
+                logger.warning(
+                    f"Skipping {format} support: Plugin does not match protocol.",
+                )
+                return None
+
+            self.__import_times[format] = elapsed
+            self.__loaded[format] = format_class
+            logger.info(f"Loaded {format} file metadata support in {elapsed:.3f}s")
+            return format_class
+
+    def load_all(self) -> dict[FileFormats, type]:
+        """Import every discovered format sub-plugin."""
+        for format in self.formats:
+            self.load(format)
+        return self.loaded
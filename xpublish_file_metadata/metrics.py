@@ -0,0 +1,280 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import (
+    Callable,
+    Iterable,
+    Iterator,
+)
+
+CONTENT_TYPE: str = "text/plain; version=0.0.4; charset=utf-8"
+
+# seconds, from an in-memory header parse to a slow remote open
+LATENCY_BUCKETS: tuple[float, ...] = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+COUNT_BUCKETS: tuple[float, ...] = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+def escape_label(value: str) -> str:
+    """Escape a label value for the Prometheus text format."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(
+    names: tuple[str, ...],
+    values: tuple[str, ...],
+) -> str:
+    """Format label pairs as ``{name="value",...}``, or "" without labels."""
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{escape_label(str(value))}"' for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+def format_value(value: float) -> str:
+    """Format a sample value, writing whole numbers without a decimal point."""
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    """A named metric with a fixed set of label names."""
+
+    kind: str = "untyped"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+    ) -> None:
+        self.name: str = name
+        self.help: str = help
+        self.labels: tuple[str, ...] = labels
+        self._lock: threading.Lock = threading.Lock()
+
+    def samples(self) -> Iterator[str]:
+        """Yield the sample lines of the metric."""
+        return iter(())
+
+    def render(self) -> str:
+        """Return the metric in the Prometheus text format."""
+        return (
+            f"# HELP {self.name} {self.help}\n"
+            f"# TYPE {self.name} {self.kind}\n"
+            + "".join(f"{line}\n" for line in self.samples())
+        )
+
+
+class Counter(Metric):
+    """A monotonically increasing count per label values."""
+
+    kind: str = "counter"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+    ) -> None:
+        super().__init__(name, help, labels)
+        self.__values: dict[tuple[str, ...], float] = {}
+
+    def inc(
+        self,
+        *label_values: str,
+        amount: float = 1,
+    ) -> None:
+        """Increment the count of the label values."""
+        with self._lock:
+            self.__values[label_values] = self.__values.get(label_values, 0) + amount
+
+    def value(self, *label_values: str) -> float:
+        """Return the current count of the label values."""
+        return self.__values.get(label_values, 0)
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = list(self.__values.items())
+        for label_values, value in values:
+            yield (
+                f"{self.name}{format_labels(self.labels, label_values)} "
+                f"{format_value(value)}"
+            )
+
+
+class Histogram(Metric):
+    """Observations counted into cumulative buckets per label values."""
+
+    kind: str = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: Iterable[float] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labels)
+        self.buckets: tuple[float, ...] = tuple(sorted(buckets))
+        # per label values: [count per bucket..., +Inf count, sum]
+        self.__values: dict[tuple[str, ...], list[float]] = {}
+
+    def observe(
+        self,
+        value: float,
+        *label_values: str,
+    ) -> None:
+        """Record an observation for the label values."""
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self.__values.get(label_values)
+            if counts is None:
+                counts = self.__values[label_values] = [0] * (len(self.buckets) + 2)
+            counts[i] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, *label_values: str) -> Iterator[None]:
+        """Observe the seconds spent in the ``with`` block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def count(self, *label_values: str) -> int:
+        """Return the number of observations of the label values."""
+        counts = self.__values.get(label_values)
+        return 0 if counts is None else int(sum(counts[:-1]))
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = [(k, list(v)) for k, v in self.__values.items()]
+        label_names = self.labels + ("le",)
+        for label_values, counts in values:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else format_value(bound)
+                labels = format_labels(label_names, (*label_values, le))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = format_labels(self.labels, label_values)
+            yield f"{self.name}_sum{labels} {format_value(counts[-1])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Gauge(Metric):
+    """A value read from a callback when the metrics are collected.
+
+    Nothing is recorded per request, the callback returns the current
+    value per label values (or a single value without labels).
+    """
+
+    kind: str = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        collect: Callable[[], dict[tuple[str, ...], float]],
+        labels: tuple[str, ...] = (),
+    ) -> None:
+        super().__init__(name, help, labels)
+        self.collect: Callable[[], dict[tuple[str, ...], float]] = collect
+
+    def samples(self) -> Iterator[str]:
+        for label_values, value in self.collect().items():
+            yield (
+                f"{self.name}{format_labels(self.labels, label_values)} "
+                f"{format_value(value)}"
+            )
+
+
+class CollectedCounter(Gauge):
+    """A counter kept elsewhere (e.g. a pool's hit count), read when collected."""
+
+    kind: str = "counter"
+
+
+class PluginMetrics:
+    """The metrics collected by the file metadata plugin.
+
+    Recording an observation is a dict update under a lock, so the
+    metrics are cheap enough to leave enabled. Gauges are only computed
+    when the metrics are rendered.
+    """
+
+    def __init__(self) -> None:
+        self.cache_lookups: Counter = Counter(
+            "file_metadata_cache_lookups_total",
+            "File metadata cache lookups by result (hit, miss or stale).",
+            labels=("format", "result"),
+        )
+        self.read_errors: Counter = Counter(
+            "file_metadata_read_errors_total",
+            "Failed file metadata reads.",
+            labels=("format",),
+        )
+        self.open_seconds: Histogram = Histogram(
+            "file_metadata_open_seconds",
+            "Time spent opening files.",
+            labels=("format",),
+        )
+        self.extract_seconds: Histogram = Histogram(
+            "file_metadata_extract_seconds",
+            "Time spent reading metadata on a cache miss, including the open.",
+            labels=("format",),
+        )
+        self.serialize_seconds: Histogram = Histogram(
+            "file_metadata_serialize_seconds",
+            "Time spent encoding response bodies.",
+            labels=("kind",),
+        )
+        self.attr_count: Histogram = Histogram(
+            "file_metadata_attributes",
+            "Number of attributes in the file metadata read.",
+            labels=("format",),
+            buckets=COUNT_BUCKETS,
+        )
+        self.__metrics: list[Metric] = [
+            self.cache_lookups,
+            self.read_errors,
+            self.open_seconds,
+            self.extract_seconds,
+            self.serialize_seconds,
+            self.attr_count,
+        ]
+
+    def add(
+        self,
+        metric: Metric,
+    ) -> Metric:
+        """Register a metric, e.g. a gauge computed at collection time."""
+        self.__metrics.append(metric)
+        return metric
+
+    def render(
+        self,
+        extra: Iterable[Metric] = (),
+    ) -> str:
+        """Return all metrics in the Prometheus text format."""
+        return "".join(metric.render() for metric in (*self.__metrics, *extra))
@@ -0,0 +1,102 @@
+import xarray as xr
+from typing import (
+    Any,
+    Callable,
+    Optional,
+)
+from xpublish.utils.api import DATASET_ID_ATTR_KEY
+from .shared import (
+    FileMetadata,
+    MultiFileMetadata,
+)
+
+SOURCES_ENCODING_KEY: str = "sources"
+
+
+def find_sources(dataset: xr.Dataset) -> list[str]:
+    """Return the distinct files a dataset was built from, in order.
+
+    A ``dataset.encoding["sources"]`` list, as set by open_mfdataset(),
+    takes precedence, otherwise the ``source`` encodings of the dataset and
+    its variables are collected. The latter only finds every file of
+    datasets combined from single file datasets, e.g. by xarray.merge.
+    """
+    sources = dataset.encoding.get(SOURCES_ENCODING_KEY)
+    if sources:
+        return list(dict.fromkeys(str(source) for source in sources))
+
+    found: dict[str, None] = {}
+    for obj in (dataset, *dataset.variables.values()):
+        source = obj.encoding.get("source")
+        if source:
+            found[str(source)] = None
+    return list(found)
+
+
+def open_mfdataset(
+    paths: Any,
+    preprocess: Optional[Callable[[xr.Dataset], xr.Dataset]] = None,
+    **kwargs: Any,
+) -> xr.Dataset:
+    """Open a multi-file dataset with xarray.open_mfdataset, recording its files.
+
+    xarray only keeps the first file's ``source`` encoding, on the combined
+    dataset and on every variable, so the source of each opened file is
+    recorded in ``encoding["sources"]`` for find_sources(), in the order the
+    files were opened. Other arguments are passed on to xarray.
+    """
+    sources: list[str] = []
+
+    def record_source(dataset: xr.Dataset) -> xr.Dataset:
+        sources.append(dataset.encoding["source"])
+        return dataset if preprocess is None else preprocess(dataset)
+
+    combined = xr.open_mfdataset(paths, preprocess=record_source, **kwargs)
+    combined.encoding[SOURCES_ENCODING_KEY] = sources
+    return combined
+
+
+def source_dataset(source: str) -> xr.Dataset:
+    """Return an empty stand-in dataset pointing at one constituent file.
+
+    Its dataset id is derived from the source, so each file's metadata is
+    cached on its own and shared by every dataset that includes it.
+    """
+    stand_in = xr.Dataset(
+        attrs={DATASET_ID_ATTR_KEY: source},
+    )
+    stand_in.encoding["source"] = source
+    return stand_in
+
+
+def merge_file_metadata(
+    metadata: dict[str, FileMetadata],
+) -> MultiFileMetadata:
+    """Merge per-file metadata into common and per-file attributes.
+
+    Attributes with the same value in every file are returned once, the
+    rest under the file they were read from.
+    """
+    common: dict[str, str] = {}
+    if metadata:
+        first, *rest = metadata.values()
+        common = {
+            name: value
+            for name, value in first.attrs.items()
+            if all(other.attrs.get(name, None) == value for other in rest)
+        }
+
+    return MultiFileMetadata(
+        attrs=common,
+        files={
+            source: FileMetadata(
+                format=file_metadata.format,
+                attrs={
+                    name: value
+                    for name, value in file_metadata.attrs.items()
+                    if name not in common
+                },
+            )
+            for source, file_metadata in metadata.items()
+        },
+    )
@@ -0,0 +1,195 @@
+import struct
+import numpy as np
+from typing import (
+    Any,
+    NamedTuple,
+)
+from .sniff import (
+    CDF_SIGNATURES,
+    HeaderParseError,
+    TruncatedHeaderError,
+)
+
+NC_DIMENSION: int = 0x0A
+NC_VARIABLE: int = 0x0B
+NC_ATTRIBUTE: int = 0x0C
+
+# big endian dtypes of the netCDF classic (CDF1/2) and CDF5 external types
+NC_TYPES: dict[int, np.dtype] = {
+    1: np.dtype(">i1"),  # NC_BYTE
+    2: np.dtype("S1"),  # NC_CHAR
+    3: np.dtype(">i2"),  # NC_SHORT
+    4: np.dtype(">i4"),  # NC_INT
+    5: np.dtype(">f4"),  # NC_FLOAT
+    6: np.dtype(">f8"),  # NC_DOUBLE
+    7: np.dtype(">u1"),  # NC_UBYTE
+    8: np.dtype(">u2"),  # NC_USHORT
+    9: np.dtype(">u4"),  # NC_UINT
+    10: np.dtype(">i8"),  # NC_INT64
+    11: np.dtype(">u8"),  # NC_UINT64
+}
+
+
+class ClassicVariable(NamedTuple):
+    """A variable of a netCDF classic header."""
+
+    dimensions: list[str]
+    shape: list[int]
+    dtype: np.dtype
+    attrs: dict[str, Any]
+
+
+class ClassicHeader(NamedTuple):
+    """The parsed header of a netCDF classic (CDF1, CDF2 or CDF5) file."""
+
+    version: int
+    dimensions: dict[str, int]
+    attrs: dict[str, Any]
+    variables: dict[str, ClassicVariable]
+
+
+class _Reader:
+    """Reads big endian header fields from a buffer, tracking the position."""
+
+    def __init__(
+        self,
+        buffer: Any,
+        version: int,
+    ) -> None:
+        self.buffer: Any = buffer
+        self.position: int = 4
+        # CDF5 counts are 64 bit, offsets are 64 bit from CDF2 on
+        self.count_format: str = ">Q" if version == 5 else ">I"
+        self.offset_format: str = ">I" if version == 1 else ">Q"
+
+    def read(
+        self,
+        size: int,
+    ) -> bytes:
+        end = self.position + size
+        if end > len(self.buffer):
+            raise TruncatedHeaderError("netCDF header extends past the buffer.")
+        data = bytes(self.buffer[self.position : end])
+        self.position = end
+        return data
+
+    def unpack(
+        self,
+        fmt: str,
+    ) -> int:
+        return struct.unpack(fmt, self.read(struct.calcsize(fmt)))[0]
+
+    def count(self) -> int:
+        return self.unpack(self.count_format)
+
+    def name(self) -> str:
+        size = self.count()
+        name = self.read(size).decode("utf-8")
+        self.read(-size % 4)
+        return name
+
+    def values(self) -> Any:
+        nc_type = self.unpack(">I")
+        dtype = NC_TYPES.get(nc_type)
+        if dtype is None:
+            raise HeaderParseError(f"Unknown netCDF type: {nc_type}")
+        size = self.count()
+        nbytes = size * dtype.itemsize
+        data = self.read(nbytes)
+        self.read(-nbytes % 4)
+        return attr_value(data, dtype, size)
+
+    def list_header(
+        self,
+        tag: int,
+    ) -> int:
+        """Return the length of a dimension, attribute or variable list."""
+        found = self.unpack(">I")
+        size = self.count()
+        if found == 0 and size == 0:
+            return 0
+        if found != tag:
+            raise HeaderParseError(f"Expected netCDF tag {tag}, found {found}")
+        return size
+
+    def attrs(self) -> dict[str, Any]:
+        attrs = {}
+        for _ in range(self.list_header(NC_ATTRIBUTE)):
+            name = self.name()
+            attrs[name] = self.values()
+        return attrs
+
+
+def attr_value(
+    data: bytes,
+    dtype: np.dtype,
+    size: int,
+) -> Any:
+    """Convert an attribute's raw values exactly as netCDF4.Dataset.getncattr does."""
+    if dtype.kind == "S":
+        return data.decode("utf-8", errors="replace").replace("\x00", "")
+    values = np.frombuffer(data, dtype=dtype, count=size).astype(
+        dtype.newbyteorder("=")
+    )
+    return values[0] if size == 1 else values
+
+
+def parse_netcdf_classic_header(buffer: Any) -> ClassicHeader:
+    """Parse the header of a netCDF classic file from a bytes-like buffer.
+
+    Only the header is read, so a memory-mapped file or the first bytes of
+    a remote file are enough. Raises TruncatedHeaderError if the header
+    extends past the buffer.
+    """
+    if len(buffer) < 4:
+        raise TruncatedHeaderError("netCDF header extends past the buffer.")
+    magic = bytes(buffer[:4])
+    if magic not in CDF_SIGNATURES:
+        raise HeaderParseError("Not a netCDF classic file.")
+    version = magic[3]
+
+    reader = _Reader(buffer, version)
+    numrecs = reader.count()
+    if numrecs in (0xFFFFFFFF, 0xFFFFFFFFFFFFFFFF):
+        # streaming files don't know their record count
+        raise HeaderParseError("Streaming netCDF files are not supported.")
+
+    dimensions: dict[str, int] = {}
+    for _ in range(reader.list_header(NC_DIMENSION)):
+        name = reader.name()
+        length = reader.count()
+        if length == 0:
+            # the unlimited dimension is as long as the record count
+            length = numrecs
+        dimensions[name] = length
+    dimension_names = list(dimensions)
+
+    attrs = reader.attrs()
+
+    variables: dict[str, ClassicVariable] = {}
+    for _ in range(reader.list_header(NC_VARIABLE)):
+        name = reader.name()
+        dimids = [reader.count() for _ in range(reader.count())]
+        try:
+            var_dimensions = [dimension_names[i] for i in dimids]
+        except IndexError:
+            raise HeaderParseError(f"Invalid dimension id in variable {name}")
+        var_attrs = reader.attrs()
+        nc_type = reader.unpack(">I")
+        if nc_type not in NC_TYPES:
+            raise HeaderParseError(f"Unknown netCDF type: {nc_type}")
+        reader.count()  # vsize
+        reader.unpack(reader.offset_format)  # begin
+        variables[name] = ClassicVariable(
+            dimensions=var_dimensions,
+            shape=[dimensions[dim] for dim in var_dimensions],
+            dtype=NC_TYPES[nc_type].newbyteorder("="),
+            attrs=var_attrs,
+        )
+
+    return ClassicHeader(
+        version=version,
+        dimensions=dimensions,
+        attrs=attrs,
+        variables=variables,
+    )
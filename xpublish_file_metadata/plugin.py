@@ -1,32 +1,89 @@
+import asyncio
+import hashlib
+import itertools
 import logging
-import pkg_resources
+import threading
 import cachey
 import xarray as xr
-from pydantic import BaseModel
 from pathlib import Path
 from fastapi import (
     APIRouter,
     Depends,
     HTTPException,
+    Query,
+    Request,
+    Response,
 )
+from fastapi.responses import StreamingResponse
 from xpublish import (
     Plugin,
     Dependencies,
     hookimpl,
 )
+from xpublish.utils.api import DATASET_ID_ATTR_KEY
 from typing import (
-    get_args,
     runtime_checkable,
     Sequence,
     Annotated,
+    Any,
+    Callable,
+    NamedTuple,
+    Optional,
     Protocol,
     Union,
 )
+from .handles import FileHandlePool
+from .fingerprint import (
+    FingerprintValidator,
+    is_remote,
+)
+from .inflight import CoalescingExecutor
+from .loader import (
+    accepted_kwargs,
+    FormatLoader,
+)
+from .metrics import (
+    CONTENT_TYPE,
+    CollectedCounter,
+    Gauge,
+    PluginMetrics,
+)
+from .multifile import (
+    find_sources,
+    merge_file_metadata,
+    source_dataset,
+)
+from .prefetch import MetadataPrefetcher
+from .remote import RemoteOpener
+from .store import MetadataStore
+from .responses import (
+    encode,
+    encode_json,
+    estimate_body_bytes,
+    iter_body,
+    negotiate_encoding,
+    EncodedResponseCache,
+    Encodings,
+    MEDIA_TYPES,
+    RESPONSE_CONTENT,
+    ResponseKinds,
+)
 from .shared import (
+    AttrFilter,
+    BatchRow,
     FileFormats,
     FileMetadata,
-    EXTENSIONS_TO_FORMAT_KEY,
+    GroupMetadata,
+    MultiFileMetadata,
+    PrefetchStatus,
+    TypedFileMetadata,
+    VariableMetadata,
     FORMAT_WARNINGS,
+    LOCAL_ONLY_FORMATS,
+)
+from .sniff import (
+    detect_file_format,
+    UnsupportedFormatError,
 )
 
 logger: logging.Logger = logging.getLogger("uvicorn")
@@ -34,43 +91,110 @@ logger: logging.Logger = logging.getLogger("uvicorn")
 
 @runtime_checkable
 class FormatProtocol(Protocol):
-    """Protocol for file metadata."""
+    """Protocol for file metadata.
+
+    Sub-plugins are constructed with whichever of these keyword arguments
+    their ``__init__`` accepts, plus the format's ``format_options``:
+
+    * ``handle_pool`` - the FileHandlePool shared by all sub-plugins.
+    * ``validator`` - a FingerprintValidator to read through the cache with.
+    * ``remote`` - the RemoteOpener for fsspec URLs.
+    """
 
     def get_file_metadata(
         self,
         dataset: xr.Dataset,
         cache: cachey.Cache,
-        hide_attrs: list[str],
+        hide_attrs: AttrFilter,
     ) -> FileMetadata:
         """Return the file metadata of the dataset."""
         ...
 
 
+@runtime_checkable
+class AttrFormatProtocol(FormatProtocol, Protocol):
+    """Protocol for file metadata sub-plugins that can read a single attribute."""
+
+    def get_attr(
+        self,
+        dataset: xr.Dataset,
+        cache: cachey.Cache,
+        attr_name: str,
+        hide_attrs: AttrFilter,
+    ) -> Optional[str]:
+        """Return a single file attribute of the dataset, or None if missing."""
+        ...
+
+
+@runtime_checkable
+class TypedFormatProtocol(FormatProtocol, Protocol):
+    """Protocol for file metadata sub-plugins that can read native JSON values."""
+
+    def get_typed_metadata(
+        self,
+        dataset: xr.Dataset,
+        cache: cachey.Cache,
+        hide_attrs: AttrFilter,
+    ) -> TypedFileMetadata:
+        """Return the file metadata of the dataset with native JSON values."""
+        ...
+
+
+@runtime_checkable
+class TreeFormatProtocol(FormatProtocol, Protocol):
+    """Protocol for sub-plugins of hierarchical formats (groups and variables)."""
+
+    def get_variable(
+        self,
+        dataset: xr.Dataset,
+        cache: cachey.Cache,
+        path: str,
+        hide_attrs: AttrFilter,
+    ) -> Optional[VariableMetadata]:
+        """Return the metadata of one variable, or None if missing."""
+        ...
+
+    def get_group(
+        self,
+        dataset: xr.Dataset,
+        cache: cachey.Cache,
+        path: str,
+        hide_attrs: AttrFilter,
+    ) -> Optional[GroupMetadata]:
+        """Return the metadata of one group, or None if missing."""
+        ...
+
+
+@runtime_checkable
+class MessageFormatProtocol(FormatProtocol, Protocol):
+    """Protocol for sub-plugins of message based formats (GRIB)."""
+
+    def get_message(
+        self,
+        dataset: xr.Dataset,
+        cache: cachey.Cache,
+        message_index: int,
+        hide_attrs: AttrFilter,
+    ) -> Optional[dict[str, str]]:
+        """Return the header keys of one message, or None if missing."""
+        ...
+
+
 def load_file_formats() -> dict[FileFormats, FormatProtocol]:
-    """Load in file format sub-plugins."""
-    loaded_formats: dict[FileFormats, FormatProtocol] = {}
+    """Load in all file format sub-plugins.
 
-    for entrypoint in pkg_resources.iter_entry_points("xpublish_file_metadata.formats"):
-        try:
-            metadata_grabber = entrypoint.load()
-            if not entrypoint.name in get_args(FileFormats):
-                logger.warning(
-                    f"Skipping {entrypoint.name} support: Not a supported file format.",
-                )
-                continue
-            if not isinstance(metadata_grabber, FormatProtocol):
-                logger.warning(
-                    f"Skipping {entrypoint.name} support: Plugin does not match protocol.",
-                )
-                continue
+    FileMetadataPlugin loads formats lazily instead, see FormatLoader.
+    """
+    return FormatLoader(protocol=FormatProtocol).load_all()
 
-            loaded_formats[entrypoint.name] = metadata_grabber
 
-        except ImportError:
-            logger.warning(
-                f"ImportError: {FORMAT_WARNINGS[entrypoint.name]}",
-            )
-    return loaded_formats
+class DatasetDispatch(NamedTuple):
+    """The resolved file format handling of a single dataset."""
+
+    source: str
+    format_key: FileFormats
+    grabber: Optional[FormatProtocol]
+    hide_attrs: AttrFilter
 
 
 class FileMetadataPlugin(Plugin):
@@ -78,35 +202,917 @@ class FileMetadataPlugin(Plugin):
 
     name: str = "file-metadata"
 
+    app_router_prefix: str = "/file-metadata"
+    app_router_tags: Sequence[str] = ["file-metadata"]
+
     dataset_router_prefix: str = "/file-metadata"
     dataset_router_tags: Sequence[str] = ["file-metadata"]
 
     def __init__(
         self,
         hide_attrs: Union[list[str], dict[FileFormats, list[str]]] = None,
+        max_open_handles: int = 64,
+        prefetch: bool = False,
+        prefetch_workers: int = 4,
+        max_io_workers: int = 8,
+        max_batch_datasets: int = 100,
+        revalidate_interval: float = 5.0,
+        cache_max_age: int = 0,
+        cache_encoded_responses: bool = True,
+        encoded_response_cache_bytes: int = 32 * 1024**2,
+        format_options: Optional[dict[FileFormats, dict[str, Any]]] = None,
+        metadata_store: Optional[Union[str, Path]] = None,
+        metadata_store_max_bytes: int = 256 * 1024**2,
+        storage_options: Optional[dict[str, Any]] = None,
+        remote_block_size: int = 64 * 1024,
+        metrics: bool = False,
+        metadata_cache_bytes: Optional[int] = 64 * 1024**2,
+        stream_threshold_bytes: int = 1024**2,
     ) -> None:
         super().__init__()
 
-        self.__formats: dict[FileFormats, FormatProtocol] = load_file_formats()
+        self.__metrics: Optional[PluginMetrics] = PluginMetrics() if metrics else None
+
+        self.__formats: FormatLoader = FormatLoader(protocol=FormatProtocol)
+        self.__handle_pool: FileHandlePool = FileHandlePool(
+            max_size=max_open_handles,
+            metrics=self.metrics,
+        )
 
         self.__hide_attrs: dict[FileFormats, list[str]] = {}
         if not hide_attrs:
             hide_attrs = {}
-        for format in self.loaded_formats.keys():
+        for format in self.__formats.formats:
             if isinstance(hide_attrs, list):
                 self.__hide_attrs[format] = list(hide_attrs)
             elif isinstance(hide_attrs, dict):
                 self.__hide_attrs[format] = hide_attrs.get(format, [])
+        self.__attr_filters: dict[FileFormats, AttrFilter] = {
+            format: AttrFilter(format_hide_attrs)
+            for format, format_hide_attrs in self.__hide_attrs.items()
+        }
+
+        self.__metadata_store: Optional[MetadataStore] = (
+            MetadataStore(
+                path=metadata_store,
+                max_bytes=metadata_store_max_bytes,
+            )
+            if metadata_store
+            else None
+        )
+        self.__revalidate_interval: float = revalidate_interval
+        self.__metadata_cache: Optional[cachey.Cache] = (
+            cachey.Cache(available_bytes=metadata_cache_bytes)
+            if metadata_cache_bytes
+            else None
+        )
+        self.__remote: RemoteOpener = RemoteOpener(
+            storage_options=storage_options,
+            block_size=remote_block_size,
+        )
+        self.__format_options: dict[FileFormats, dict[str, Any]] = dict(
+            format_options or {}
+        )
+        self.__grabbers: dict[FileFormats, FormatProtocol] = {}
+        self.__grabbers_lock: threading.Lock = threading.Lock()
+        self.__dispatch: dict[str, DatasetDispatch] = {}
+        self.__encoded_responses: Optional[EncodedResponseCache] = (
+            EncodedResponseCache(
+                max_bytes=encoded_response_cache_bytes,
+                max_age=revalidate_interval,
+                metrics=self.metrics,
+            )
+            if cache_encoded_responses
+            else None
+        )
+        self.__stream_threshold_bytes: int = stream_threshold_bytes
+        self.__max_batch_datasets: int = max_batch_datasets
+        self.__cache_control: str = (
+            f"public, max-age={cache_max_age}" if cache_max_age > 0 else "no-cache"
+        )
+        self.__io_executor: CoalescingExecutor = CoalescingExecutor(
+            max_workers=max_io_workers,
+        )
+        self.__prefetcher: MetadataPrefetcher = MetadataPrefetcher(
+            max_workers=prefetch_workers,
+            enabled=prefetch,
+        )
+        if self.metrics is not None:
+            self.__add_collected_metrics(self.metrics)
+
+    def __add_collected_metrics(
+        self,
+        metrics: PluginMetrics,
+    ) -> None:
+        """Register the metrics read from the pools and caches when collected."""
+        pool = self.handle_pool
+        metrics.add(
+            Gauge(
+                "file_metadata_open_handles",
+                "Open file handles by state (idle or checked_out).",
+                lambda: {
+                    ("idle",): pool.stats["idle"],
+                    ("checked_out",): pool.stats["checked_out"],
+                },
+                labels=("state",),
+            )
+        )
+        metrics.add(
+            CollectedCounter(
+                "file_metadata_handle_pool_lookups_total",
+                "File handle checkouts by result (hit or miss).",
+                lambda: {("hit",): pool.hits, ("miss",): pool.misses},
+                labels=("result",),
+            )
+        )
+        metrics.add(
+            CollectedCounter(
+                "file_metadata_handle_pool_evictions_total",
+                "Idle file handles closed to stay within max_open_handles.",
+                lambda: {(): pool.evictions},
+            )
+        )
+        if self.encoded_responses is not None:
+            responses = self.encoded_responses
+            metrics.add(
+                CollectedCounter(
+                    "file_metadata_encoded_response_lookups_total",
+                    "Encoded response body cache lookups by result (hit or miss).",
+                    lambda: {("hit",): responses.hits, ("miss",): responses.misses},
+                    labels=("result",),
+                )
+            )
+            metrics.add(
+                Gauge(
+                    "file_metadata_encoded_response_bytes",
+                    "Total size of the cached encoded response bodies.",
+                    lambda: {(): responses.nbytes},
+                )
+            )
+        if self.metadata_store is not None:
+            store = self.metadata_store
+            metrics.add(
+                CollectedCounter(
+                    "file_metadata_store_lookups_total",
+                    "Persistent metadata store lookups by result (hit or miss).",
+                    lambda: {("hit",): store.hits, ("miss",): store.misses},
+                    labels=("result",),
+                )
+            )
+        metrics.add(
+            Gauge(
+                "file_metadata_format_import_seconds",
+                "Time spent importing each loaded file format sub-plugin.",
+                lambda: {
+                    (format,): seconds
+                    for format, seconds in self.__formats.import_times.items()
+                },
+                labels=("format",),
+            )
+        )
+
+    def metadata_cache(
+        self,
+        cache: cachey.Cache,
+    ) -> cachey.Cache:
+        """Return the cache file metadata is kept in.
+
+        That's the plugin's own cache, budgeted by metadata_cache_bytes, so
+        metadata and xpublish's data chunks can't evict each other, or the
+        dataset cache passed in if metadata_cache_bytes is None.
+        """
+        if self.__metadata_cache is not None:
+            return self.__metadata_cache
+        return cache
+
+    @property
+    def metrics(self) -> Optional[PluginMetrics]:
+        """The collected metrics, or None if disabled."""
+        return self.__metrics
+
+    def render_metrics(
+        self,
+        cache: cachey.Cache,
+    ) -> str:
+        """Return the collected metrics in the Prometheus text format."""
+        cache = self.metadata_cache(cache)
+        cache_bytes = Gauge(
+            "file_metadata_cache_bytes",
+            "Used and available bytes of the cache file metadata is kept in.",
+            lambda: {
+                ("used",): cache.total_bytes,
+                ("limit",): cache.available_bytes,
+            },
+            labels=("kind",),
+        )
+        return self.metrics.render(extra=[cache_bytes])
 
     @property
     def hide_attrs(self) -> dict[FileFormats, str]:
         """A List of attributes to hide from the API for each file format"""
         return self.__hide_attrs
 
+    @property
+    def attr_filters(self) -> dict[FileFormats, AttrFilter]:
+        """The compiled hide_attrs of each file format."""
+        return self.__attr_filters
+
     @property
     def loaded_formats(self) -> dict[FileFormats, FormatProtocol]:
-        """Dictionary of loaded file formats."""
-        return self.__formats
+        """Dictionary of the file formats imported so far.
+
+        Formats are imported the first time a dataset of that format is
+        requested, see supported_formats() for every format that can be.
+        """
+        return self.__formats.loaded
+
+    def supported_formats(self) -> list[FileFormats]:
+        """The file formats that have metadata support, without importing them."""
+        return self.__formats.available()
+
+    @property
+    def handle_pool(self) -> FileHandlePool:
+        """Pool of open file handles shared by all file format sub-plugins."""
+        return self.__handle_pool
+
+    @property
+    def remote(self) -> RemoteOpener:
+        """Opens remote (fsspec) sources for all file format sub-plugins."""
+        return self.__remote
+
+    @property
+    def metadata_store(self) -> Optional[MetadataStore]:
+        """The persistent file metadata store shared across processes, if any."""
+        return self.__metadata_store
+
+    @property
+    def grabbers(self) -> dict[FileFormats, FormatProtocol]:
+        """Dictionary of the file format sub-plugin instances built so far."""
+        return dict(self.__grabbers)
+
+    def grabber(
+        self,
+        format_key: FileFormats,
+    ) -> Optional[FormatProtocol]:
+        """Return a format's sub-plugin instance, importing and building it on first use.
+
+        Returns None if the format's dependencies aren't installed.
+        """
+        grabber = self.__grabbers.get(format_key)
+        if grabber is not None:
+            return grabber
+
+        format_class = self.__formats.load(format_key)
+        if format_class is None:
+            return None
+        with self.__grabbers_lock:
+            if format_key not in self.__grabbers:
+                shared = accepted_kwargs(
+                    format_class,
+                    {
+                        "handle_pool": self.handle_pool,
+                        "validator": FingerprintValidator(
+                            revalidate_interval=self.__revalidate_interval,
+                            store=self.metadata_store,
+                            metrics=self.metrics,
+                            format=format_key,
+                        ),
+                        "remote": self.remote,
+                    },
+                )
+                self.__grabbers[format_key] = format_class(
+                    **shared,
+                    **self.__format_options.get(format_key, {}),
+                )
+            return self.__grabbers[format_key]
+
+    def __cached_dispatch(
+        self,
+        dataset: xr.Dataset,
+    ) -> Optional[DatasetDispatch]:
+        """Return the dataset's dispatch if already resolved for its source."""
+        dispatch = self.__dispatch.get(dataset.attrs.get(DATASET_ID_ATTR_KEY, ""))
+        if dispatch is not None and dispatch.source == dataset.encoding.get("source"):
+            return dispatch
+        return None
+
+    def resolve(
+        self,
+        dataset: xr.Dataset,
+    ) -> DatasetDispatch:
+        """Return the cached file format handling of a dataset.
+
+        Entries are keyed by dataset id and re-resolved whenever the source
+        file of the dataset registered under that id changes.
+        """
+        dispatch = self.__cached_dispatch(dataset)
+        if dispatch is not None:
+            return dispatch
+
+        dataset_id: str = dataset.attrs.get(DATASET_ID_ATTR_KEY, "")
+        source: Optional[str] = dataset.encoding.get("source")
+        if not source:
+            raise HTTPException(
+                status_code=415,
+                detail="Dataset is not backed by a file.",
+            )
+        try:
+            format_key = detect_file_format(str(source), self.remote)
+        except UnsupportedFormatError as e:
+            logger.warning(str(e))
+            raise HTTPException(
+                status_code=415,
+                detail="File format not supported.",
+            )
+        if format_key in LOCAL_ONLY_FORMATS and is_remote(str(source)):
+            raise HTTPException(
+                status_code=501,
+                detail=f"Remote {format_key} files are not supported.",
+            )
+
+        dispatch = DatasetDispatch(
+            source=source,
+            format_key=format_key,
+            grabber=self.grabber(format_key),
+            hide_attrs=self.attr_filters.get(format_key, AttrFilter()),
+        )
+        self.__dispatch[dataset_id] = dispatch
+        return dispatch
+
+    @property
+    def prefetcher(self) -> MetadataPrefetcher:
+        """Startup prefetch of the file metadata of all datasets."""
+        return self.__prefetcher
+
+    @property
+    def io_executor(self) -> CoalescingExecutor:
+        """Executor running blocking file reads off the event loop."""
+        return self.__io_executor
+
+    @staticmethod
+    def __request_key(
+        dataset: xr.Dataset,
+        kind: str,
+    ) -> tuple[str, str, str]:
+        """Key identifying identical concurrent requests for a dataset."""
+        return (
+            kind,
+            dataset.attrs.get(DATASET_ID_ATTR_KEY, ""),
+            str(dataset.encoding.get("source")),
+        )
+
+    async def resolve_async(
+        self,
+        dataset: xr.Dataset,
+    ) -> DatasetDispatch:
+        """Like resolve(), but without blocking the event loop."""
+        dispatch = self.__cached_dispatch(dataset)
+        if dispatch is not None:
+            return dispatch
+        return await self.io_executor.run(
+            self.__request_key(dataset, "format"),
+            self.resolve,
+            dataset,
+        )
+
+    async def get_metadata_async(
+        self,
+        dataset: xr.Dataset,
+        cache: cachey.Cache,
+        typed: bool = False,
+    ) -> FileMetadata:
+        """Like get_metadata(), but without blocking the event loop.
+
+        Concurrent calls for the same dataset share a single read.
+        """
+        return await self.io_executor.run(
+            self.__request_key(dataset, "metadata/typed" if typed else "metadata"),
+            self.get_metadata,
+            dataset,
+            cache,
+            typed,
+        )
+
+    def get_metadata(
+        self,
+        dataset: xr.Dataset,
+        cache: cachey.Cache,
+        typed: bool = False,
+    ) -> FileMetadata:
+        """Return the (cached) file metadata of a dataset.
+
+        If typed, attribute values are native JSON values (TypedFileMetadata).
+        Sub-plugins without typed support return their string values.
+        """
+        dispatch = self.resolve(dataset)
+        if dispatch.grabber is None:
+            raise HTTPException(
+                status_code=501,
+                detail=FORMAT_WARNINGS[dispatch.format_key],
+            )
+        if not typed:
+            return dispatch.grabber.get_file_metadata(
+                dataset=dataset,
+                cache=self.metadata_cache(cache),
+                hide_attrs=dispatch.hide_attrs,
+            )
+        if isinstance(dispatch.grabber, TypedFormatProtocol):
+            return dispatch.grabber.get_typed_metadata(
+                dataset=dataset,
+                cache=self.metadata_cache(cache),
+                hide_attrs=dispatch.hide_attrs,
+            )
+        metadata = self.get_metadata(dataset, cache)
+        return TypedFileMetadata(format=metadata.format, attrs=metadata.attrs)
+
+    async def get_files_async(
+        self,
+        dataset: xr.Dataset,
+        cache: cachey.Cache,
+    ) -> MultiFileMetadata:
+        """Return the merged file metadata of every file a dataset was built from.
+
+        Files are read in parallel on the IO pool and cached one by one, so
+        adding a file to a dataset only reads the new file.
+        """
+        sources = find_sources(dataset)
+        if not sources:
+            # raises the same error as the single file routes
+            await self.resolve_async(dataset)
+
+        metadata = await asyncio.gather(
+            *(
+                self.get_metadata_async(source_dataset(source), cache)
+                for source in sources
+            )
+        )
+        return merge_file_metadata(dict(zip(sources, metadata)))
+
+    def get_attr(
+        self,
+        dataset: xr.Dataset,
+        cache: cachey.Cache,
+        attr_name: str,
+    ) -> str:
+        """Return a single (cached) file attribute of a dataset.
+
+        Uses the sub-plugin's single attribute lookup when it has one,
+        otherwise reads the full file metadata.
+        """
+        dispatch = self.resolve(dataset)
+        if isinstance(dispatch.grabber, AttrFormatProtocol):
+            value = dispatch.grabber.get_attr(
+                dataset=dataset,
+                cache=self.metadata_cache(cache),
+                attr_name=attr_name,
+                hide_attrs=dispatch.hide_attrs,
+            )
+        else:
+            value = self.get_metadata(dataset, cache).attrs.get(attr_name)
+
+        if value is None:
+            raise self.attr_not_found(attr_name)
+        return value
+
+    def attr_not_found(
+        self,
+        attr_name: str,
+    ) -> HTTPException:
+        """Return the 404 error of a missing attribute."""
+        return HTTPException(
+            status_code=404,
+            detail=(
+                f"Attribute not found: {attr_name}! "
+                f"Use {self.dataset_router_prefix}/attr-names "
+                f"to list available attributes."
+            ),
+        )
+
+    async def get_attr_async(
+        self,
+        dataset: xr.Dataset,
+        cache: cachey.Cache,
+        attr_name: str,
+    ) -> str:
+        """Like get_attr(), but without blocking the event loop."""
+        return await self.io_executor.run(
+            self.__request_key(dataset, f"attrs/{attr_name}"),
+            self.get_attr,
+            dataset,
+            cache,
+            attr_name,
+        )
+
+    def __feature_grabber(
+        self,
+        dispatch: DatasetDispatch,
+        protocol: type,
+        feature: str,
+    ) -> FormatProtocol:
+        """Return the dataset's sub-plugin if it implements the protocol."""
+        if dispatch.grabber is None:
+            raise HTTPException(
+                status_code=501,
+                detail=FORMAT_WARNINGS[dispatch.format_key],
+            )
+        if not isinstance(dispatch.grabber, protocol):
+            raise HTTPException(
+                status_code=501,
+                detail=f"{feature} are not supported for {dispatch.format_key} files.",
+            )
+        return dispatch.grabber
+
+    def __tree_grabber(
+        self,
+        dispatch: DatasetDispatch,
+    ) -> TreeFormatProtocol:
+        """Return the dataset's sub-plugin if it supports groups and variables."""
+        return self.__feature_grabber(
+            dispatch,
+            TreeFormatProtocol,
+            "Groups and variables",
+        )
+
+    def get_variable(
+        self,
+        dataset: xr.Dataset,
+        cache: cachey.Cache,
+        path: str,
+    ) -> VariableMetadata:
+        """Return the (cached) metadata of one variable of a dataset's file."""
+        path = "/" + path.strip("/")
+        dispatch = self.resolve(dataset)
+        variable = self.__tree_grabber(dispatch).get_variable(
+            dataset=dataset,
+            cache=self.metadata_cache(cache),
+            path=path,
+            hide_attrs=dispatch.hide_attrs,
+        )
+        if variable is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Variable not found: {path}",
+            )
+        return variable
+
+    def get_group(
+        self,
+        dataset: xr.Dataset,
+        cache: cachey.Cache,
+        path: str,
+    ) -> GroupMetadata:
+        """Return the (cached) metadata of one group of a dataset's file."""
+        path = "/" + path.strip("/")
+        dispatch = self.resolve(dataset)
+        group = self.__tree_grabber(dispatch).get_group(
+            dataset=dataset,
+            cache=self.metadata_cache(cache),
+            path=path,
+            hide_attrs=dispatch.hide_attrs,
+        )
+        if group is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Group not found: {path}",
+            )
+        return group
+
+    def get_message(
+        self,
+        dataset: xr.Dataset,
+        cache: cachey.Cache,
+        message_index: int,
+    ) -> dict[str, str]:
+        """Return the (cached) header keys of one message of a dataset's file."""
+        dispatch = self.resolve(dataset)
+        grabber: MessageFormatProtocol = self.__feature_grabber(
+            dispatch,
+            MessageFormatProtocol,
+            "Messages",
+        )
+        message = grabber.get_message(
+            dataset=dataset,
+            cache=self.metadata_cache(cache),
+            message_index=message_index,
+            hide_attrs=dispatch.hide_attrs,
+        )
+        if message is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Message not found: {message_index}",
+            )
+        return message
+
+    @property
+    def cache_control(self) -> str:
+        """The Cache-Control header sent with metadata responses."""
+        return self.__cache_control
+
+    @property
+    def encoded_responses(self) -> Optional[EncodedResponseCache]:
+        """Cache of encoded response bodies, or None if disabled."""
+        return self.__encoded_responses
+
+    @staticmethod
+    def __etag_matches(
+        request: Request,
+        etag: str,
+    ) -> bool:
+        """Return True if the request's If-None-Match matches the ETag."""
+        if_none_match = request.headers.get("if-none-match")
+        if not if_none_match:
+            return False
+        client_etags = {
+            tag.strip().removeprefix("W/") for tag in if_none_match.split(",")
+        }
+        return etag in client_etags or "*" in client_etags
+
+    @staticmethod
+    def __etag(
+        dispatch: DatasetDispatch,
+        metadata: FileMetadata,
+    ) -> str:
+        """The ETag of a metadata response: hashes the attributes and hide-list."""
+        return f'"{metadata.digest}-{dispatch.hide_attrs.digest}"'
+
+    @staticmethod
+    def __attr_etag(
+        dispatch: DatasetDispatch,
+        attr_name: str,
+        value: str,
+    ) -> str:
+        """The ETag of a single attribute response."""
+        digest = hashlib.blake2b(
+            attr_name.encode() + b"\0" + value.encode(),
+            digest_size=16,
+        ).hexdigest()
+        return f'"{digest}-{dispatch.hide_attrs.digest}"'
+
+    @staticmethod
+    def __representation_etag(
+        etag: str,
+        encoding: Encodings,
+    ) -> str:
+        """Tag an ETag with the response encoding, leaving JSON's unchanged."""
+        if encoding == "json":
+            return etag
+        return f'{etag[:-1]}-{encoding}"'
+
+    def negotiated_headers(
+        self,
+        etag: str,
+        encoding: Encodings,
+    ) -> dict[str, str]:
+        """Return the caching headers of a content negotiated response."""
+        return {
+            "ETag": self.__representation_etag(etag, encoding),
+            "Cache-Control": self.cache_control,
+            "Vary": "Accept",
+        }
+
+    @property
+    def stream_threshold_bytes(self) -> int:
+        """Metadata responses estimated to be larger than this are streamed."""
+        return self.__stream_threshold_bytes
+
+    async def encoded_response(
+        self,
+        request: Request,
+        dataset: xr.Dataset,
+        cache: cachey.Cache,
+        kind: ResponseKinds,
+        max_value_bytes: Optional[int] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        typed: bool = False,
+    ) -> Response:
+        """Return a metadata response encoded straight to bytes.
+
+        The body is JSON, MessagePack or CBOR, as negotiated from the Accept
+        header. Bodies are served from the encoded response cache when
+        enabled, per encoding, with typed and string values cached apart.
+        Bodies larger than stream_threshold_bytes, and truncated ones, are
+        streamed one attribute at a time instead of being encoded whole.
+        Attribute names can be paged with offset and limit.
+        """
+        dispatch = await self.resolve_async(dataset)
+        encoded = None
+        if self.encoded_responses is not None:
+            key = (
+                dataset.attrs.get(DATASET_ID_ATTR_KEY, ""),
+                dispatch.source,
+                dispatch.format_key,
+                dispatch.hide_attrs.digest,
+                typed,
+            )
+            encoded = self.encoded_responses.get(key)
+            if encoded is None:
+                metadata = await self.get_metadata_async(dataset, cache, typed)
+                encoded = self.encoded_responses.put(
+                    key,
+                    metadata,
+                    etag=self.__etag(dispatch, metadata),
+                )
+            metadata, etag = encoded.metadata, encoded.etag
+        else:
+            metadata = await self.get_metadata_async(dataset, cache, typed)
+            etag = self.__etag(dispatch, metadata)
+
+        encoding = negotiate_encoding(request.headers.get("accept"))
+        media_type = MEDIA_TYPES[encoding]
+        headers = self.negotiated_headers(etag, encoding)
+        if self.__etag_matches(request, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+
+        if kind == "attr-names" and (offset or limit is not None):
+            stop = None if limit is None else offset + limit
+            headers["X-Total-Count"] = str(len(metadata.attrs))
+            return Response(
+                content=encode(
+                    list(itertools.islice(metadata.attrs, offset, stop)),
+                    encoding,
+                ),
+                media_type=media_type,
+                headers=headers,
+            )
+
+        if max_value_bytes is None:
+            if encoded is not None and (
+                (kind, encoding) in encoded.bodies
+                or kind == "attr-names"
+                or encoded.size <= self.stream_threshold_bytes
+            ):
+                return Response(
+                    content=encoded.body(kind, encoding),
+                    media_type=media_type,
+                    headers=headers,
+                )
+            if encoded is None and (
+                kind == "attr-names"
+                or estimate_body_bytes(metadata) <= self.stream_threshold_bytes
+            ):
+                return Response(
+                    content=encode(RESPONSE_CONTENT[kind](metadata), encoding),
+                    media_type=media_type,
+                    headers=headers,
+                )
+        return StreamingResponse(
+            iter_body(kind, metadata, encoding, max_value_bytes),
+            media_type=media_type,
+            headers=headers,
+        )
+
+    def invalidate(
+        self,
+        dataset_id: Optional[str] = None,
+    ) -> None:
+        """Drop the cached file format handling of one or all datasets.
+
+        Call this after adding or removing datasets from the server.
+        """
+        if dataset_id is None:
+            self.__dispatch.clear()
+        else:
+            self.__dispatch.pop(dataset_id, None)
+
+    def batch_row(
+        self,
+        dataset_id: str,
+        attr_names: Optional[tuple[str, ...]],
+        get_dataset: Callable[[str], xr.Dataset],
+        cache: cachey.Cache,
+    ) -> BatchRow:
+        """Return the format and attributes of one dataset of a batch request.
+
+        Only the named attributes are read if given, and missing ones are
+        left out. Errors are reported in the row instead of being raised.
+        """
+        format_key = None
+        try:
+            dataset = get_dataset(dataset_id)
+            format_key = self.resolve(dataset).format_key
+            if attr_names is None:
+                attrs = dict(self.get_metadata(dataset, cache).attrs)
+            else:
+                attrs = {}
+                for attr_name in attr_names:
+                    try:
+                        attrs[attr_name] = self.get_attr(dataset, cache, attr_name)
+                    except HTTPException as e:
+                        if e.status_code != 404:
+                            raise
+        except HTTPException as e:
+            return BatchRow(dataset=dataset_id, format=format_key, error=e.detail)
+        except Exception as e:
+            logger.warning(f"Batch file metadata of {dataset_id} failed: {e}")
+            return BatchRow(dataset=dataset_id, format=format_key, error=str(e))
+        return BatchRow(dataset=dataset_id, format=format_key, attrs=attrs)
+
+    def close(self) -> None:
+        """Close pooled file handles and the metadata store connections."""
+        self.handle_pool.close()
+        if self.metadata_store is not None:
+            self.metadata_store.close()
+
+    @hookimpl
+    def app_router(
+        self,
+        deps: Dependencies,
+    ) -> APIRouter:
+        def prefetch_one(dataset_id: str) -> None:
+            self.get_metadata(deps.dataset(dataset_id), deps.cache())
+
+        def start_prefetch() -> None:
+            self.prefetcher.start(
+                fetch=prefetch_one,
+                dataset_ids=deps.dataset_ids,
+            )
+
+        router = APIRouter(
+            prefix=self.app_router_prefix,
+            tags=self.app_router_tags,
+            on_startup=[start_prefetch],
+        )
+
+        @router.get("/ready")
+        def ready(response: Response) -> PrefetchStatus:
+            """Report the progress of the startup file metadata prefetch.
+
+            Returns 503 until all datasets have been prefetched.
+            """
+            status = self.prefetcher.status
+            if not status.ready:
+                response.status_code = 503
+            return status
+
+        if self.metrics is not None:
+
+            @router.get("/metrics")
+            def metrics(
+                cache: Annotated[cachey.Cache, Depends(deps.cache)],
+            ) -> Response:
+                """Expose the plugin's metrics in the Prometheus text format."""
+                return Response(
+                    content=self.render_metrics(cache),
+                    media_type=CONTENT_TYPE,
+                )
+
+        @router.get("/batch")
+        async def batch(
+            dataset_ids: Annotated[list[str], Depends(deps.dataset_ids)],
+            cache: Annotated[cachey.Cache, Depends(deps.cache)],
+            datasets: Optional[str] = None,
+            attrs: Optional[str] = None,
+        ) -> StreamingResponse:
+            """Stream the format and attributes of many datasets as NDJSON.
+
+            Takes comma separated dataset ids (default: all datasets) and
+            attribute names (default: all attributes). Datasets are read in
+            parallel on the IO pool and each line is sent as soon as it's ready,
+            so lines arrive in completion order.
+            """
+            if datasets:
+                dataset_ids = [i.strip() for i in datasets.split(",") if i.strip()]
+            dataset_ids = list(dict.fromkeys(dataset_ids))
+            if len(dataset_ids) > self.__max_batch_datasets:
+                raise HTTPException(
+                    status_code=400,
+                    detail=(
+                        f"Batch requests are limited to {self.__max_batch_datasets} "
+                        f"datasets, not {len(dataset_ids)}. Select fewer datasets "
+                        "with the datasets parameter."
+                    ),
+                )
+            attr_names = (
+                tuple(i.strip() for i in attrs.split(",") if i.strip())
+                if attrs
+                else None
+            )
+
+            async def rows():
+                tasks = [
+                    asyncio.ensure_future(
+                        self.io_executor.run(
+                            ("batch", dataset_id, attr_names),
+                            self.batch_row,
+                            dataset_id,
+                            attr_names,
+                            deps.dataset,
+                            cache,
+                        )
+                    )
+                    for dataset_id in dataset_ids
+                ]
+                try:
+                    for task in asyncio.as_completed(tasks):
+                        yield (await task).model_dump_json() + "\n"
+                finally:
+                    for task in tasks:
+                        task.cancel()
+
+            return StreamingResponse(rows(), media_type="application/x-ndjson")
+
+        return router
 
     @hookimpl
     def dataset_router(
@@ -116,6 +1122,7 @@ class FileMetadataPlugin(Plugin):
         router = APIRouter(
             prefix=self.dataset_router_prefix,
             tags=self.dataset_router_tags,
+            on_shutdown=[self.close],
         )
 
         @router.get("/supported")
@@ -123,11 +1130,12 @@ class FileMetadataPlugin(Plugin):
             """Shows which file formats have metadata support.
 
             NOTE: This depends on which optional dependencies are installed!
+            Formats are listed without being imported.
             """
-            return list(self.loaded_formats.keys())
+            return self.supported_formats()
 
         @router.get("/format")
-        def file_format(
+        async def file_format(
             dataset: Annotated[xr.Dataset, Depends(deps.dataset)],
         ) -> str:
             """Return the file format of the dataset.
@@ -135,68 +1143,191 @@ class FileMetadataPlugin(Plugin):
             NOTE: This is not the precise format, but rather the format key
             in relationship to the xpublish-file-metadata plugin.
             """
-            extension = Path(dataset.encoding["source"]).suffix
-            try:
-                return EXTENSIONS_TO_FORMAT_KEY[extension]
-            except KeyError:
-                raise KeyError(
-                    f"File format not supported: {extension}",
-                )
+            return (await self.resolve_async(dataset)).format_key
 
         @router.get("/")
-        def metadata(
+        async def metadata(
+            request: Request,
             dataset: Annotated[xr.Dataset, Depends(deps.dataset)],
             cache: Annotated[cachey.Cache, Depends(deps.cache)],
+            max_value_bytes: Annotated[Optional[int], Query(ge=0)] = None,
+            typed: bool = False,
         ) -> FileMetadata:
-            """Gets and caches the metadata of the dataset."""
-            format_key = file_format(dataset)
-            grabber: FormatProtocol = self.loaded_formats[format_key]()
-            return grabber.get_file_metadata(
-                dataset=dataset,
-                cache=cache,
-                hide_attrs=self.hide_attrs[format_key],
+            """Gets and caches the metadata of the dataset.
+
+            String values are cut to max_value_bytes of UTF-8 if given. With
+            typed, values are native JSON numbers, lists and objects.
+            """
+            return await self.encoded_response(
+                request,
+                dataset,
+                cache,
+                "metadata",
+                max_value_bytes=max_value_bytes,
+                typed=typed,
             )
 
         @router.get("/attrs")
-        def attrs(
+        async def attrs(
+            request: Request,
             dataset: Annotated[xr.Dataset, Depends(deps.dataset)],
             cache: Annotated[cachey.Cache, Depends(deps.cache)],
-        ) -> dict[str, str]:
-            """Return the file attributes of the dataset."""
-            return metadata(dataset, cache).attrs
+            max_value_bytes: Annotated[Optional[int], Query(ge=0)] = None,
+            typed: bool = False,
+        ) -> dict[str, Any]:
+            """Return the file attributes of the dataset.
+
+            String values are cut to max_value_bytes of UTF-8 if given. With
+            typed, values are native JSON numbers, lists and objects.
+            """
+            return await self.encoded_response(
+                request,
+                dataset,
+                cache,
+                "attrs",
+                max_value_bytes=max_value_bytes,
+                typed=typed,
+            )
 
         @router.get("/attr-names")
-        def attr_names(
+        async def attr_names(
+            request: Request,
             dataset: Annotated[xr.Dataset, Depends(deps.dataset)],
             cache: Annotated[cachey.Cache, Depends(deps.cache)],
+            offset: Annotated[int, Query(ge=0)] = 0,
+            limit: Annotated[Optional[int], Query(ge=0)] = None,
         ) -> list[str]:
-            """Return the file attribute names of the dataset."""
-            return list(
-                metadata(
-                    dataset,
-                    cache,
-                ).attrs.keys(),
+            """Return the file attribute names of the dataset.
+
+            Pass offset and limit to page through the names, the total
+            count is sent in the X-Total-Count header.
+            """
+            return await self.encoded_response(
+                request,
+                dataset,
+                cache,
+                "attr-names",
+                offset=offset,
+                limit=limit,
             )
 
+        @router.get("/files")
+        async def files(
+            dataset: Annotated[xr.Dataset, Depends(deps.dataset)],
+            cache: Annotated[cachey.Cache, Depends(deps.cache)],
+        ) -> MultiFileMetadata:
+            """Return the merged file metadata of a multi-file dataset.
+
+            Attributes shared by every file are returned once, the rest per file.
+            """
+            return await self.get_files_async(dataset, cache)
+
         @router.get("/attrs/{attr_name}")
-        def single_attr(
+        async def single_attr(
             attr_name: str,
+            request: Request,
             dataset: Annotated[xr.Dataset, Depends(deps.dataset)],
             cache: Annotated[cachey.Cache, Depends(deps.cache)],
-        ) -> str:
-            """Return the file attribute of the dataset."""
+            typed: bool = False,
+        ) -> Any:
+            """Return the file attribute of the dataset.
 
-            attrs = metadata(dataset, cache).attrs
-            try:
-                return attrs[attr_name]
-            except KeyError:
-                raise HTTPException(
-                    status_code=404,
-                    detail=(
-                        f"Attribute not found: {attr_name}! "
-                        f"Use {self.dataset_router_prefix}/attr-names "
-                        f"to list available attributes."
-                    ),
-                )
+            With typed, the value is a native JSON value, taken from the
+            typed metadata of the whole file.
+            """
+            if typed:
+                metadata = await self.get_metadata_async(dataset, cache, typed=True)
+                if attr_name not in metadata.attrs:
+                    raise self.attr_not_found(attr_name)
+                value = metadata.attrs[attr_name]
+                etag_value = encode_json(value).decode("utf-8")
+            else:
+                value = await self.get_attr_async(dataset, cache, attr_name)
+                etag_value = value
+
+            etag = self.__attr_etag(
+                await self.resolve_async(dataset),
+                attr_name,
+                etag_value,
+            )
+            encoding = negotiate_encoding(request.headers.get("accept"))
+            headers = self.negotiated_headers(etag, encoding)
+            if self.__etag_matches(request, headers["ETag"]):
+                return Response(status_code=304, headers=headers)
+            return Response(
+                content=encode(value, encoding),
+                media_type=MEDIA_TYPES[encoding],
+                headers=headers,
+            )
+
+        @router.get("/variables")
+        async def variables(
+            dataset: Annotated[xr.Dataset, Depends(deps.dataset)],
+            cache: Annotated[cachey.Cache, Depends(deps.cache)],
+        ) -> list[str]:
+            """Return the names of the root group's variables (netcdf/hdf5 only)."""
+            return (await groups(dataset, cache)).variables
+
+        @router.get("/variables/{variable_path:path}")
+        async def variable(
+            variable_path: str,
+            dataset: Annotated[xr.Dataset, Depends(deps.dataset)],
+            cache: Annotated[cachey.Cache, Depends(deps.cache)],
+        ) -> VariableMetadata:
+            """Return the metadata of a single variable (netcdf/hdf5 only).
+
+            Nested variables are addressed by their path, e.g. group/variable.
+            """
+            return await self.io_executor.run(
+                self.__request_key(dataset, f"variables/{variable_path}"),
+                self.get_variable,
+                dataset,
+                cache,
+                variable_path,
+            )
+
+        @router.get("/groups")
+        async def groups(
+            dataset: Annotated[xr.Dataset, Depends(deps.dataset)],
+            cache: Annotated[cachey.Cache, Depends(deps.cache)],
+        ) -> GroupMetadata:
+            """Return the metadata of the root group (netcdf/hdf5 only)."""
+            return await group(dataset=dataset, cache=cache, group_path="/")
+
+        @router.get("/groups/{group_path:path}")
+        async def group(
+            group_path: str,
+            dataset: Annotated[xr.Dataset, Depends(deps.dataset)],
+            cache: Annotated[cachey.Cache, Depends(deps.cache)],
+        ) -> GroupMetadata:
+            """Return the metadata of a single group (netcdf/hdf5 only).
+
+            Nested groups are addressed by their path, e.g. group/subgroup.
+            """
+            return await self.io_executor.run(
+                self.__request_key(dataset, f"groups/{group_path}"),
+                self.get_group,
+                dataset,
+                cache,
+                group_path,
+            )
+
+        @router.get("/messages/{message_index}")
+        async def message(
+            message_index: int,
+            dataset: Annotated[xr.Dataset, Depends(deps.dataset)],
+            cache: Annotated[cachey.Cache, Depends(deps.cache)],
+        ) -> dict[str, str]:
+            """Return all header keys of a single message (grib only).
+
+            Messages are numbered from 0 in file order.
+            """
+            return await self.io_executor.run(
+                self.__request_key(dataset, f"messages/{message_index}"),
+                self.get_message,
+                dataset,
+                cache,
+                message_index,
+            )
 
         return router
@@ -0,0 +1,100 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+from .shared import PrefetchStatus
+
+logger: logging.Logger = logging.getLogger("uvicorn")
+
+
+class MetadataPrefetcher:
+    """Reads and caches the file metadata of many datasets on a thread pool.
+
+    Progress is tracked per dataset id so it can be served from a readiness
+    endpoint while the prefetch runs in the background.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        enabled: bool = True,
+    ) -> None:
+        if max_workers < 1:
+            raise ValueError(f"max_workers must be >= 1, not {max_workers}")
+
+        self.__fetch: Callable[[str], None] = lambda dataset_id: None
+        self.__max_workers: int = max_workers
+        self.__enabled: bool = enabled
+        self.__lock: threading.Lock = threading.Lock()
+        self.__started: bool = False
+        self.__total: int = 0
+        self.__completed: int = 0
+        self.__failed: dict[str, str] = {}
+        self.__start_time: float = 0.0
+
+    @property
+    def status(self) -> PrefetchStatus:
+        """The current progress of the prefetch."""
+        with self.__lock:
+            return PrefetchStatus(
+                enabled=self.__enabled,
+                ready=(
+                    not self.__enabled
+                    or (self.__started and self.__completed == self.__total)
+                ),
+                total=self.__total,
+                completed=self.__completed,
+                failed=dict(self.__failed),
+            )
+
+    def __run_one(
+        self,
+        dataset_id: str,
+    ) -> None:
+        """Prefetch a single dataset, recording any failure."""
+        try:
+            self.__fetch(dataset_id)
+        except Exception as e:
+            logger.warning(f"Prefetching file metadata of {dataset_id} failed: {e}")
+            with self.__lock:
+                self.__failed[dataset_id] = f"{type(e).__name__}: {e}"
+        finally:
+            with self.__lock:
+                self.__completed += 1
+                done = self.__completed == self.__total
+            if done:
+                logger.info(
+                    f"Prefetched file metadata of {self.__total} datasets "
+                    f"({len(self.__failed)} failed) in "
+                    f"{time.perf_counter() - self.__start_time:.2f}s.",
+                )
+
+    def start(
+        self,
+        fetch: Callable[[str], None],
+        dataset_ids: Callable[[], list[str]],
+    ) -> None:
+        """Start prefetching in the background. Repeated calls are no-ops.
+
+        ``fetch`` reads and caches the metadata of one dataset id.
+        """
+        if not self.__enabled:
+            return
+        ids = list(dict.fromkeys(dataset_ids()))
+        with self.__lock:
+            if self.__started:
+                return
+            self.__started = True
+            self.__total = len(ids)
+            self.__fetch = fetch
+        logger.info(f"Prefetching file metadata of {len(ids)} datasets.")
+
+        self.__start_time = time.perf_counter()
+        executor = ThreadPoolExecutor(
+            max_workers=self.__max_workers,
+            thread_name_prefix="file-metadata-prefetch",
+        )
+        for dataset_id in ids:
+            executor.submit(self.__run_one, dataset_id)
+        executor.shutdown(wait=False)
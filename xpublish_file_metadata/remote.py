@@ -0,0 +1,96 @@
+import logging
+from typing import (
+    Any,
+    BinaryIO,
+    Optional,
+)
+
+logger: logging.Logger = logging.getLogger("uvicorn")
+
+DEFAULT_BLOCK_SIZE: int = 64 * 1024
+DEFAULT_MAX_HEADER_SIZE: int = 16 * 1024**2
+
+
+class RemoteOpener:
+    """Opens remote (fsspec) sources for reading only the bytes that are needed.
+
+    Files are opened with a block cache, so header reads become a few range
+    requests, and fsspec's cached filesystem instances share connections
+    across files and requests.
+    """
+
+    def __init__(
+        self,
+        storage_options: Optional[dict[str, Any]] = None,
+        block_size: int = DEFAULT_BLOCK_SIZE,
+        cache_type: str = "blockcache",
+        max_header_size: int = DEFAULT_MAX_HEADER_SIZE,
+    ) -> None:
+        if block_size < 1:
+            raise ValueError(f"block_size must be >= 1, not {block_size}")
+
+        self.storage_options: dict[str, Any] = dict(storage_options or {})
+        self.block_size: int = block_size
+        self.cache_type: str = cache_type
+        self.max_header_size: int = max_header_size
+
+    def filesystem(
+        self,
+        source: str,
+    ) -> tuple[Any, str]:
+        """Return the fsspec filesystem and path of a source."""
+        try:
+            import fsspec
+        except ImportError:
+            raise ImportError("Install fsspec to get file metadata of remote files.")
+
+        return fsspec.core.url_to_fs(source, **self.storage_options)
+
+    def open(
+        self,
+        source: str,
+        *args: Any,
+    ) -> BinaryIO:
+        """Open a source as a seekable, block cached binary file.
+
+        Extra positional arguments (e.g. the mode passed by rasterio's
+        opener) are ignored, files are always opened read-only.
+        """
+        fs, path = self.filesystem(source)
+        return fs.open(
+            path,
+            mode="rb",
+            block_size=self.block_size,
+            cache_type=self.cache_type,
+        )
+
+    def read_range(
+        self,
+        source: str,
+        start: int,
+        end: int,
+    ) -> bytes:
+        """Return the bytes in [start, end) of a source with a single range request."""
+        fs, path = self.filesystem(source)
+        return fs.cat_file(path, start=start, end=end)
+
+    def read_netcdf_classic_header(
+        self,
+        source: str,
+        parse: Any,
+    ) -> Any:
+        """Return parse(header) of a netCDF classic file, growing the read as needed.
+
+        The header size isn't known up front, so blocks are fetched (doubling
+        in size) until ``parse`` succeeds, the file ends or max_header_size
+        is reached.
+        """
+        size = self.block_size
+        while True:
+            header = self.read_range(source, 0, size)
+            try:
+                return parse(header)
+            except (OSError, EOFError):
+                if len(header) < size or size >= self.max_header_size:
+                    raise
+            size = min(size * 2, self.max_header_size)
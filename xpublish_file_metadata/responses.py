@@ -0,0 +1,417 @@
+import functools
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import (
+    Any,
+    Callable,
+    Hashable,
+    Iterator,
+    Literal,
+    Optional,
+)
+from .metrics import PluginMetrics
+from .shared import FileMetadata
+
+# the binary response encodings are optional
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+ResponseKinds = Literal[
+    "metadata",
+    "attrs",
+    "attr-names",
+]
+
+Encodings = Literal[
+    "json",
+    "msgpack",
+    "cbor",
+]
+
+MEDIA_TYPES: dict[Encodings, str] = {
+    "json": "application/json",
+    "msgpack": "application/msgpack",
+    "cbor": "application/cbor",
+}
+
+# media types clients send for each encoding, including unregistered aliases
+ACCEPTED_MEDIA_TYPES: dict[str, Encodings] = {
+    "application/json": "json",
+    "application/msgpack": "msgpack",
+    "application/x-msgpack": "msgpack",
+    "application/vnd.msgpack": "msgpack",
+    "application/cbor": "cbor",
+}
+
+RESPONSE_CONTENT: dict[ResponseKinds, Callable[[FileMetadata], Any]] = {
+    "metadata": lambda metadata: metadata.model_dump(),
+    "attrs": lambda metadata: dict(metadata.attrs),
+    "attr-names": lambda metadata: list(metadata.attrs.keys()),
+}
+
+
+def encode_json(content: Any) -> bytes:
+    """Encode content exactly as starlette's JSONResponse does."""
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def available_encodings() -> list[Encodings]:
+    """Return the response encodings whose libraries are installed."""
+    return [
+        encoding
+        for encoding, library in [("json", json), ("msgpack", msgpack), ("cbor", cbor2)]
+        if library is not None
+    ]
+
+
+def negotiate_encoding(accept: Optional[str]) -> Encodings:
+    """Pick the response encoding for an Accept header.
+
+    The installed encoding with the highest quality wins, preferring JSON
+    on ties, wildcards and anything unsupported.
+    """
+    if not accept:
+        return "json"
+    available = available_encodings()
+    best: Encodings = "json"
+    best_quality = 0.0
+    for media_range in accept.split(","):
+        media_type, *params = [part.strip() for part in media_range.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        encoding = ACCEPTED_MEDIA_TYPES.get(media_type.lower())
+        if encoding is None or encoding not in available:
+            continue
+        if quality > best_quality or (quality == best_quality and encoding == "json"):
+            best, best_quality = encoding, quality
+    return best
+
+
+def encode(
+    content: Any,
+    encoding: Encodings = "json",
+) -> bytes:
+    """Encode content as JSON, MessagePack or CBOR."""
+    if encoding == "msgpack":
+        return msgpack.packb(content, use_bin_type=True)
+    if encoding == "cbor":
+        return cbor2.dumps(content)
+    return encode_json(content)
+
+
+def container_head(
+    encoding: Encodings,
+    mapping: bool,
+    size: int,
+) -> bytes:
+    """Return the header of a MessagePack or CBOR map or array of size items."""
+    if encoding == "msgpack":
+        packer = msgpack.Packer()
+        return (
+            packer.pack_map_header(size) if mapping else packer.pack_array_header(size)
+        )
+    # CBOR: major type 5 (map) or 4 (array), with the size as its argument
+    major = (5 if mapping else 4) << 5
+    if size < 24:
+        return bytes([major | size])
+    for info, length in ((24, 1), (25, 2), (26, 4), (27, 8)):
+        if size < 1 << (8 * length):
+            return bytes([major | info]) + size.to_bytes(length, "big")
+    raise ValueError(f"Too many items for CBOR: {size}")
+
+
+def truncate_value(
+    value: str,
+    max_bytes: int,
+) -> str:
+    """Cut a value to at most max_bytes of UTF-8, without splitting a character."""
+    if len(value) * 4 <= max_bytes:
+        return value
+    # a character is at least one byte, so only the head needs encoding
+    return value[:max_bytes].encode("utf-8")[:max_bytes].decode("utf-8", "ignore")
+
+
+def estimate_body_bytes(metadata: FileMetadata) -> int:
+    """Estimate the encoded size of the attributes from their lengths.
+
+    Typed values other than strings are measured by encoding them.
+    """
+    return sum(
+        len(name)
+        + (len(value) if isinstance(value, str) else len(encode_json(value)))
+        + 6
+        for name, value in metadata.attrs.items()
+    )
+
+
+def iter_json(
+    kind: ResponseKinds,
+    metadata: FileMetadata,
+    max_value_bytes: Optional[int] = None,
+    chunk_bytes: int = 64 * 1024,
+) -> Iterator[bytes]:
+    """Yield the JSON body of a response kind, encoding one attribute at a time.
+
+    Encoded attributes are joined into chunks of about chunk_bytes, so the
+    whole body is never held in memory. Without truncation, the chunks join
+    up to exactly the body that encode_json() returns.
+    """
+    if kind == "attr-names":
+        head, tail = b"[", b"]"
+    elif kind == "attrs":
+        head, tail = b"{", b"}"
+    else:
+        head = b'{"format":' + encode_json(metadata.format) + b',"attrs":{'
+        tail = b"}}"
+
+    parts: list[bytes] = [head]
+    size = len(head)
+    separator = b""
+    for name, value in metadata.attrs.items():
+        if kind == "attr-names":
+            part = separator + encode_json(name)
+        else:
+            if max_value_bytes is not None and isinstance(value, str):
+                value = truncate_value(value, max_value_bytes)
+            part = separator + encode_json(name) + b":" + encode_json(value)
+        separator = b","
+        parts.append(part)
+        size += len(part)
+        if size >= chunk_bytes:
+            yield b"".join(parts)
+            parts, size = [], 0
+    parts.append(tail)
+    yield b"".join(parts)
+
+
+def iter_binary(
+    kind: ResponseKinds,
+    metadata: FileMetadata,
+    encoding: Encodings,
+    max_value_bytes: Optional[int] = None,
+    chunk_bytes: int = 64 * 1024,
+) -> Iterator[bytes]:
+    """Yield the MessagePack or CBOR body of a response kind, one attribute at a time.
+
+    Maps and arrays are written with their size up front, so without
+    truncation the chunks join up to exactly the body encode() returns.
+    """
+    size = len(metadata.attrs)
+    if kind == "attr-names":
+        head = container_head(encoding, mapping=False, size=size)
+    elif kind == "attrs":
+        head = container_head(encoding, mapping=True, size=size)
+    else:
+        head = (
+            container_head(encoding, mapping=True, size=2)
+            + encode("format", encoding)
+            + encode(metadata.format, encoding)
+            + encode("attrs", encoding)
+            + container_head(encoding, mapping=True, size=size)
+        )
+
+    parts: list[bytes] = [head]
+    size = len(head)
+    for name, value in metadata.attrs.items():
+        part = encode(name, encoding)
+        if kind != "attr-names":
+            if max_value_bytes is not None and isinstance(value, str):
+                value = truncate_value(value, max_value_bytes)
+            part += encode(value, encoding)
+        parts.append(part)
+        size += len(part)
+        if size >= chunk_bytes:
+            yield b"".join(parts)
+            parts, size = [], 0
+    if parts:
+        yield b"".join(parts)
+
+
+def iter_body(
+    kind: ResponseKinds,
+    metadata: FileMetadata,
+    encoding: Encodings = "json",
+    max_value_bytes: Optional[int] = None,
+    chunk_bytes: int = 64 * 1024,
+) -> Iterator[bytes]:
+    """Yield the body of a response kind in the encoding, see iter_json()."""
+    if encoding == "json":
+        return iter_json(kind, metadata, max_value_bytes, chunk_bytes)
+    return iter_binary(kind, metadata, encoding, max_value_bytes, chunk_bytes)
+
+
+class EncodedMetadata:
+    """The encoded response bodies of one dataset's file metadata, per encoding."""
+
+    __slots__ = (
+        "metadata",
+        "etag",
+        "bodies",
+        "checked_at",
+        "metrics",
+        "size",
+        "on_encode",
+    )
+
+    def __init__(
+        self,
+        metadata: FileMetadata,
+        etag: str,
+        metrics: Optional[PluginMetrics] = None,
+        on_encode: Optional[Callable[[int], None]] = None,
+    ) -> None:
+        self.metadata: FileMetadata = metadata
+        self.etag: str = etag
+        self.bodies: dict[tuple[ResponseKinds, Encodings], bytes] = {}
+        self.checked_at: float = time.monotonic()
+        self.metrics: Optional[PluginMetrics] = metrics
+        self.size: int = estimate_body_bytes(metadata)
+        self.on_encode: Optional[Callable[[int], None]] = on_encode
+
+    @property
+    def nbytes(self) -> int:
+        """The total size of the bodies encoded so far."""
+        return sum(len(body) for body in self.bodies.values())
+
+    def body(
+        self,
+        kind: ResponseKinds,
+        encoding: Encodings = "json",
+    ) -> bytes:
+        """Return the body of a response kind, encoding it on first use.
+
+        ``on_encode`` is called with the size of every newly encoded body.
+        """
+        body = self.bodies.get((kind, encoding))
+        if body is None:
+            start = time.perf_counter()
+            body = encode(RESPONSE_CONTENT[kind](self.metadata), encoding)
+            if self.metrics is not None:
+                self.metrics.serialize_seconds.observe(
+                    time.perf_counter() - start,
+                    kind,
+                )
+            self.bodies[(kind, encoding)] = body
+            if self.on_encode is not None:
+                self.on_encode(len(body))
+        return body
+
+
+class EncodedResponseCache:
+    """A bounded LRU cache of encoded metadata response bodies.
+
+    Entries are served without touching the file metadata cache for up to
+    ``max_age`` seconds, after which they must be re-checked against it
+    with put(). A negative ``max_age`` never expires entries.
+
+    The least recently used entries are evicted once there are more than
+    ``max_entries``, or their bodies add up to more than ``max_bytes``. The
+    metadata itself isn't counted, as it's shared with the metadata cache.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_bytes: int = 32 * 1024**2,
+        max_age: float = 5.0,
+        metrics: Optional[PluginMetrics] = None,
+    ) -> None:
+        self.max_entries: int = max_entries
+        self.max_bytes: int = max_bytes
+        self.max_age: float = max_age
+        self.metrics: Optional[PluginMetrics] = metrics
+        self.__lock: threading.Lock = threading.Lock()
+        self.__entries: OrderedDict[Hashable, EncodedMetadata] = OrderedDict()
+        self.__nbytes: int = 0
+
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def get(
+        self,
+        key: Hashable,
+    ) -> Optional[EncodedMetadata]:
+        """Return a fresh entry for the key, or None."""
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None or (
+                self.max_age >= 0 and time.monotonic() - entry.checked_at > self.max_age
+            ):
+                self.misses += 1
+                return None
+            self.__entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(
+        self,
+        key: Hashable,
+        metadata: FileMetadata,
+        etag: str,
+    ) -> EncodedMetadata:
+        """Store the metadata for the key, keeping bodies it was already encoded to."""
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None and entry.metadata is metadata and entry.etag == etag:
+                entry.checked_at = time.monotonic()
+            else:
+                if entry is not None:
+                    self.__nbytes -= entry.nbytes
+                entry = EncodedMetadata(metadata, etag, self.metrics)
+                entry.on_encode = functools.partial(self.__charge, key, entry)
+                self.__entries[key] = entry
+            self.__entries.move_to_end(key)
+            self.__shrink()
+            return entry
+
+    @property
+    def nbytes(self) -> int:
+        """The total size of the cached bodies."""
+        return self.__nbytes
+
+    def __charge(
+        self,
+        key: Hashable,
+        entry: EncodedMetadata,
+        nbytes: int,
+    ) -> None:
+        """Count a newly encoded body of an entry, if it's still cached."""
+        with self.__lock:
+            if self.__entries.get(key) is not entry:
+                return
+            self.__nbytes += nbytes
+            self.__shrink()
+
+    def __shrink(self) -> None:
+        """Evict the least recently used entries to stay within the bounds."""
+        while self.__entries and (
+            len(self.__entries) > self.max_entries or self.__nbytes > self.max_bytes
+        ):
+            _, entry = self.__entries.popitem(last=False)
+            self.__nbytes -= entry.nbytes
+
+    def clear(self) -> None:
+        """Drop all entries."""
+        with self.__lock:
+            self.__entries.clear()
+            self.__nbytes = 0
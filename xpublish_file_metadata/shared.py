@@ -1,5 +1,23 @@
-from typing import Literal
-from pydantic import BaseModel
+import fnmatch
+import hashlib
+import json
+import re
+from types import MappingProxyType
+from typing import (
+    Any,
+    Iterable,
+    Iterator,
+    Literal,
+    Mapping,
+    Optional,
+    Union,
+)
+from pydantic import (
+    BaseModel,
+    PrivateAttr,
+    field_serializer,
+    field_validator,
+)
 
 
 FileFormats: Literal = Literal[
@@ -11,28 +29,222 @@ FileFormats: Literal = Literal[
 
 
 class FileMetadata(BaseModel):
-    """File metadata model."""
+    """File metadata model.
+
+    The attributes are frozen into a read-only mapping so a cached instance
+    can be shared between concurrent requests.
+    """
 
     format: FileFormats
+    attrs: Mapping[str, str]
+
+    _digest: Optional[str] = PrivateAttr(default=None)
+
+    @field_validator("attrs", mode="after")
+    @classmethod
+    def freeze_attrs(cls, attrs: Mapping[str, str]) -> Mapping[str, str]:
+        """Wrap the attributes in a read-only mapping."""
+        return MappingProxyType(dict(attrs))
+
+    @field_serializer("attrs")
+    def serialize_attrs(self, attrs: Mapping[str, str]) -> dict[str, str]:
+        """Serialize the read-only attributes as a plain dict."""
+        return dict(attrs)
+
+    @property
+    def digest(self) -> str:
+        """A stable hash of the format and attributes, computed once."""
+        if self._digest is None:
+            hasher = hashlib.blake2b(self.format.encode(), digest_size=16)
+            for name, value in self.attrs.items():
+                hasher.update(b"\0" + name.encode() + b"\0" + value.encode())
+            self._digest = hasher.hexdigest()
+        return self._digest
+
+
+class TypedFileMetadata(FileMetadata):
+    """File metadata with native JSON attribute values (see typed.to_json_value)."""
+
+    attrs: Mapping[str, Any]
+
+    @field_serializer("attrs")
+    def serialize_attrs(self, attrs: Mapping[str, Any]) -> dict[str, Any]:
+        """Serialize the read-only attributes as a plain dict."""
+        return dict(attrs)
+
+    @property
+    def digest(self) -> str:
+        """A stable hash of the format and JSON encoded attributes, computed once."""
+        if self._digest is None:
+            hasher = hashlib.blake2b(b"typed\0" + self.format.encode(), digest_size=16)
+            for name, value in self.attrs.items():
+                encoded = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+                hasher.update(b"\0" + name.encode() + b"\0" + encoded.encode())
+            self._digest = hasher.hexdigest()
+        return self._digest
+
+
+class VariableMetadata(BaseModel):
+    """Metadata of a single variable in a hierarchical file."""
+
+    path: str
+    dimensions: list[str]
+    shape: list[int]
+    dtype: str
     attrs: dict[str, str]
+    chunking: Optional[list[int]] = None
+    filters: dict[str, str] = {}
+
+
+class GroupMetadata(BaseModel):
+    """Metadata of a single group in a hierarchical file.
+
+    Only the names of the child variables and groups are listed, their
+    metadata is read on request.
+    """
+
+    path: str
+    attrs: dict[str, str]
+    dimensions: dict[str, int]
+    variables: list[str]
+    groups: list[str]
+
+
+class AttrFilter:
+    """A compiled list of attribute names to hide.
+
+    Entries are matched exactly, except for entries containing glob
+    wildcards (e.g. ``history*``) and entries prefixed with ``re:``, which
+    are matched as a regular expression (e.g. ``re:.*_secret$``).
+    """
+
+    def __init__(
+        self,
+        hide_attrs: Iterable[str] = (),
+    ) -> None:
+        self.hide_attrs: tuple[str, ...] = tuple(hide_attrs)
+
+        names: set[str] = set()
+        patterns: list[str] = []
+        for entry in self.hide_attrs:
+            if entry.startswith("re:"):
+                patterns.append(entry.removeprefix("re:"))
+            elif any(char in entry for char in "*?["):
+                patterns.append(fnmatch.translate(entry))
+            else:
+                names.add(entry)
+
+        self.names: frozenset[str] = frozenset(names)
+        self.pattern: Optional[re.Pattern] = (
+            re.compile("|".join(f"(?:{p})" for p in patterns)) if patterns else None
+        )
+        self.digest: str = hashlib.blake2b(
+            "\0".join(self.hide_attrs).encode(),
+            digest_size=8,
+        ).hexdigest()
+
+    @classmethod
+    def coerce(
+        cls,
+        hide_attrs: Union["AttrFilter", Iterable[str]],
+    ) -> "AttrFilter":
+        """Return hide_attrs as an AttrFilter, compiling it if needed."""
+        if isinstance(hide_attrs, cls):
+            return hide_attrs
+        return cls(hide_attrs)
+
+    def __contains__(
+        self,
+        attr_name: str,
+    ) -> bool:
+        """Return True if the attribute should be hidden."""
+        return attr_name in self.names or (
+            self.pattern is not None and self.pattern.fullmatch(attr_name) is not None
+        )
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.hide_attrs)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, AttrFilter):
+            return self.hide_attrs == other.hide_attrs
+        return list(self.hide_attrs) == other
+
+    def __hash__(self) -> int:
+        return hash(self.hide_attrs)
+
+    def __repr__(self) -> str:
+        return f"AttrFilter({list(self.hide_attrs)!r})"
+
+    def visible(
+        self,
+        attr_names: Iterable[str],
+    ) -> list[str]:
+        """Return the attribute names that are not hidden, in order."""
+        return [name for name in attr_names if name not in self]
 
 
 EXTENSIONS_TO_FORMAT_KEY: dict[str, FileFormats] = {
     ".nc": "netcdf",
     ".nc4": "netcdf",
     ".nc3": "netcdf",
+    ".cdf": "netcdf",
     ".hdf": "hdf5",
+    ".h5": "hdf5",
+    ".hdf5": "hdf5",
+    ".he5": "hdf5",
     ".tiff": "geotiff",
     ".tif": "geotiff",
     ".grib": "grib",
+    ".grb": "grib",
+    ".grib2": "grib",
+    ".grb2": "grib",
+}
+
+# top level modules each format needs, checked without importing them
+FORMAT_DEPENDENCIES: dict[FileFormats, tuple[str, ...]] = {
+    "netcdf": ("netCDF4",),
+    "hdf5": ("h5py",),
+    # the python engine reads GeoTIFF headers without rasterio
+    "geotiff": (),
+    "grib": ("eccodes",),
 }
 
+# ecCodes reads GRIB messages through C FILE pointers only
+LOCAL_ONLY_FORMATS: tuple[FileFormats, ...] = ("grib",)
+
 FORMAT_WARNINGS: dict[FileFormats, str] = {
     "netcdf": "Install netCDF4 to get file metadata for netcdf files.",
     "hdf5": "Install h5py to get file metadata for hdf5 files.",
     "geotiff": "Install rasterio to get file metadata for geotiff files.",
     "grib": (
-        "Install cfgrib to get file metadata for grib files. Note that this "
+        "Install eccodes to get file metadata for grib files. Note that this "
         "requires installing ecCodes binary from conda. (Windows version untested)"
     ),
 }
+
+
+class MultiFileMetadata(BaseModel):
+    """The merged file metadata of a dataset built from many files."""
+
+    attrs: dict[str, str]
+    files: dict[str, FileMetadata]
+
+
+class PrefetchStatus(BaseModel):
+    """Progress of the startup file metadata prefetch."""
+
+    enabled: bool
+    ready: bool
+    total: int
+    completed: int
+    failed: dict[str, str]
+
+
+class BatchRow(BaseModel):
+    """One dataset's line of a batch metadata response."""
+
+    dataset: str
+    format: Optional[FileFormats] = None
+    attrs: dict[str, str] = {}
+    error: Optional[str] = None
@@ -0,0 +1,152 @@
+import functools
+import logging
+from pathlib import Path
+from urllib.parse import urlsplit
+from typing import Optional
+from .fingerprint import is_remote
+from .remote import RemoteOpener
+from .shared import (
+    FileFormats,
+    EXTENSIONS_TO_FORMAT_KEY,
+)
+
+logger: logging.Logger = logging.getLogger("uvicorn")
+
+# enough to cover HDF5 superblocks behind a user block and the root object header
+HEADER_SIZE: int = 4096
+
+CDF_SIGNATURES: tuple[bytes, ...] = (b"CDF\x01", b"CDF\x02", b"CDF\x05")
+HDF5_SIGNATURE: bytes = b"\x89HDF\r\n\x1a\n"
+HDF5_SIGNATURE_OFFSETS: tuple[int, ...] = (0, 512, 1024, 2048)
+NETCDF4_MARKERS: tuple[bytes, ...] = (b"_NCProperties", b"_Netcdf4Dimid")
+TIFF_SIGNATURES: tuple[bytes, ...] = (
+    b"II*\x00",  # classic TIFF, little endian
+    b"MM\x00*",  # classic TIFF, big endian
+    b"II+\x00",  # BigTIFF, little endian
+    b"MM\x00+",  # BigTIFF, big endian
+)
+GRIB_SIGNATURE: bytes = b"GRIB"
+GRIB_EDITIONS: tuple[int, ...] = (1, 2)
+
+
+class UnsupportedFormatError(ValueError):
+    """Raised when the file format of a source can't be determined."""
+
+
+class HeaderParseError(ValueError):
+    """Raised when a pure-Python header parser can't handle a file."""
+
+
+class TruncatedHeaderError(HeaderParseError, EOFError):
+    """Raised when a header extends past the bytes that were read."""
+
+
+def extension_format(source: str) -> Optional[FileFormats]:
+    """Return the format key implied by a path or URL's extension, if any."""
+    extension = Path(urlsplit(source).path).suffix.lower()
+    return EXTENSIONS_TO_FORMAT_KEY.get(extension)
+
+
+def read_header(
+    source: str,
+    remote: Optional[RemoteOpener] = None,
+) -> Optional[bytes]:
+    """Return the first HEADER_SIZE bytes of a file, or None.
+
+    Remote sources are read with a single range request if an opener is given.
+    """
+    if is_remote(source):
+        if remote is None:
+            return None
+        try:
+            return remote.read_range(source, 0, HEADER_SIZE)
+        except Exception as e:
+            logger.warning(f"Could not read file header of {source}: {e}")
+            return None
+
+    path = Path(source)
+    if not path.is_file():
+        return None
+    try:
+        with open(path, mode="rb") as f:
+            return f.read(HEADER_SIZE)
+    except OSError as e:
+        logger.warning(f"Could not read file header of {source}: {e}")
+        return None
+
+
+def sniff_format(
+    header: bytes,
+    extension_hint: Optional[FileFormats] = None,
+) -> Optional[FileFormats]:
+    """Return the format key matching a file header's magic bytes, if any.
+
+    HDF5 files are reported as netcdf when the header carries netCDF4
+    markers or the extension says so, otherwise as hdf5.
+    """
+    if header[:4] in CDF_SIGNATURES:
+        return "netcdf"
+
+    if header[:4] in TIFF_SIGNATURES:
+        return "geotiff"
+
+    for offset in HDF5_SIGNATURE_OFFSETS:
+        if header[offset : offset + len(HDF5_SIGNATURE)] == HDF5_SIGNATURE:
+            if extension_hint == "netcdf" or any(
+                marker in header for marker in NETCDF4_MARKERS
+            ):
+                return "netcdf"
+            return "hdf5"
+
+    # GRIB messages may be preceded by a WMO bulletin header
+    grib_start = header.find(GRIB_SIGNATURE)
+    if grib_start != -1 and grib_start + 7 < len(header):
+        if header[grib_start + 7] in GRIB_EDITIONS:
+            return "grib"
+
+    return None
+
+
+@functools.lru_cache(maxsize=1024)
+def sniffed_format(
+    source: str,
+    remote: Optional[RemoteOpener] = None,
+) -> FileFormats:
+    """Return the format key of a source from its magic bytes.
+
+    Raises UnsupportedFormatError if the header can't be read or matched.
+    Errors aren't cached, so only successful sniffs are memoized.
+    """
+    header = read_header(source, remote)
+    if header:
+        format_key = sniff_format(header, extension_format(source))
+        if format_key is not None:
+            return format_key
+
+    raise UnsupportedFormatError(
+        f"File format not recognized from its header: {source}",
+    )
+
+
+def detect_file_format(
+    source: str,
+    remote: Optional[RemoteOpener] = None,
+) -> FileFormats:
+    """Return the format key of a source from its magic bytes or extension.
+
+    The file header is read once per source it's recognized for. Sources
+    only known by their extension (e.g. missing or unreadable files) are
+    sniffed again next time, so a file that appears later is detected.
+    """
+    try:
+        return sniffed_format(source, remote)
+    except UnsupportedFormatError:
+        pass
+
+    extension_hint = extension_format(source)
+    if extension_hint is not None:
+        return extension_hint
+
+    raise UnsupportedFormatError(
+        f"File format not supported: {source}",
+    )
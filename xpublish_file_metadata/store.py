@@ -0,0 +1,207 @@
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import (
+    Hashable,
+    Optional,
+    Union,
+)
+from .shared import FileMetadata
+
+logger: logging.Logger = logging.getLogger("uvicorn")
+
+SCHEMA: str = """
+CREATE TABLE IF NOT EXISTS file_metadata (
+    source TEXT NOT NULL,
+    key TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL,
+    PRIMARY KEY (source, key)
+);
+CREATE INDEX IF NOT EXISTS file_metadata_accessed ON file_metadata (accessed);
+"""
+
+# how long, in ms, a read waits on another writer to record its access time
+ACCESS_BUSY_TIMEOUT_MS: int = 50
+
+
+class MetadataStore:
+    """A persistent SQLite store of file metadata shared across processes.
+
+    Entries are keyed by source and cache key, and only returned while the
+    file's fingerprint still matches. The database runs in WAL mode so many
+    worker processes can read it while one writes. Once the stored values
+    exceed ``max_bytes``, the least recently read entries are evicted.
+
+    Reads record their access time at most once per ``access_interval``
+    seconds per entry, and only if the write lock is free, so hits don't
+    queue up behind writers.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        max_bytes: int = 256 * 1024**2,
+        timeout: float = 5.0,
+        access_interval: float = 60.0,
+    ) -> None:
+        if max_bytes < 1:
+            raise ValueError(f"max_bytes must be >= 1, not {max_bytes}")
+
+        self.__path: Path = Path(path)
+        self.__max_bytes: int = max_bytes
+        self.__timeout: float = timeout
+        self.__access_interval: float = access_interval
+        self.__local: threading.local = threading.local()
+        self.__lock: threading.Lock = threading.Lock()
+        self.__connections: list[sqlite3.Connection] = []
+
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+
+        self.__path.parent.mkdir(parents=True, exist_ok=True)
+        with self.__connect() as connection:
+            connection.executescript(SCHEMA)
+
+    @property
+    def path(self) -> Path:
+        """The path of the SQLite database."""
+        return self.__path
+
+    @property
+    def max_bytes(self) -> int:
+        """The size cap of the stored values, in bytes."""
+        return self.__max_bytes
+
+    def __connect(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        connection: Optional[sqlite3.Connection] = getattr(
+            self.__local, "connection", None
+        )
+        if connection is not None:
+            return connection
+
+        connection = sqlite3.connect(
+            self.__path,
+            timeout=self.__timeout,
+            check_same_thread=False,
+        )
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        self.__local.connection = connection
+        with self.__lock:
+            self.__connections.append(connection)
+        return connection
+
+    def get(
+        self,
+        source: str,
+        key: str,
+        fingerprint: Hashable,
+        model: type[FileMetadata] = FileMetadata,
+    ) -> Optional[FileMetadata]:
+        """Return the stored metadata as a model, if its fingerprint still matches."""
+        try:
+            connection = self.__connect()
+            row = connection.execute(
+                "SELECT value, accessed FROM file_metadata "
+                "WHERE source = ? AND key = ? AND fingerprint = ?",
+                (source, key, repr(fingerprint)),
+            ).fetchone()
+            if row is not None and time.time() - row[1] >= self.__access_interval:
+                self.__touch(connection, source, key)
+        except sqlite3.Error as e:
+            logger.warning(f"Could not read from metadata store {self.__path}: {e}")
+            return None
+
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return model.model_validate_json(row[0])
+
+    def __touch(
+        self,
+        connection: sqlite3.Connection,
+        source: str,
+        key: str,
+    ) -> None:
+        """Record an entry's access time, unless another writer holds the lock.
+
+        Access times only order evictions, so a skipped update is harmless.
+        """
+        connection.execute(f"PRAGMA busy_timeout = {ACCESS_BUSY_TIMEOUT_MS}")
+        try:
+            with connection:
+                connection.execute(
+                    "UPDATE file_metadata SET accessed = ? "
+                    "WHERE source = ? AND key = ?",
+                    (time.time(), source, key),
+                )
+        except sqlite3.OperationalError as e:
+            logger.debug(f"Skipped recording the access of {source} {key}: {e}")
+        finally:
+            connection.execute(f"PRAGMA busy_timeout = {int(self.__timeout * 1000)}")
+
+    def put(
+        self,
+        source: str,
+        key: str,
+        fingerprint: Hashable,
+        metadata: FileMetadata,
+    ) -> None:
+        """Store metadata read from a file with the given fingerprint."""
+        value = metadata.model_dump_json().encode("utf-8")
+        try:
+            connection = self.__connect()
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO file_metadata "
+                    "(source, key, fingerprint, value, size, accessed) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (source, key, repr(fingerprint), value, len(value), time.time()),
+                )
+                self.__evict(connection)
+        except sqlite3.Error as e:
+            logger.warning(f"Could not write to metadata store {self.__path}: {e}")
+
+    def __evict(
+        self,
+        connection: sqlite3.Connection,
+    ) -> None:
+        """Delete the least recently read entries until under the size cap."""
+        (total,) = connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM file_metadata"
+        ).fetchone()
+        if total <= self.__max_bytes:
+            return
+
+        evict = []
+        for rowid, size in connection.execute(
+            "SELECT rowid, size FROM file_metadata ORDER BY accessed"
+        ):
+            evict.append((rowid,))
+            total -= size
+            if total <= self.__max_bytes:
+                break
+        connection.executemany("DELETE FROM file_metadata WHERE rowid = ?", evict)
+        self.evictions += len(evict)
+
+    def __len__(self) -> int:
+        (count,) = (
+            self.__connect().execute("SELECT COUNT(*) FROM file_metadata").fetchone()
+        )
+        return count
+
+    def close(self) -> None:
+        """Close every connection. The store reconnects if it's used again."""
+        with self.__lock:
+            connections, self.__connections = self.__connections, []
+        for connection in connections:
+            connection.close()
+        self.__local = threading.local()
@@ -0,0 +1,385 @@
+import struct
+import xml.etree.ElementTree as ElementTree
+from typing import (
+    Any,
+    Callable,
+    Optional,
+)
+from .sniff import (
+    HeaderParseError,
+    TruncatedHeaderError,
+)
+
+# TIFF field type: (struct format, size in bytes)
+TIFF_TYPES: dict[int, tuple[str, int]] = {
+    1: ("B", 1),  # BYTE
+    2: ("s", 1),  # ASCII
+    3: ("H", 2),  # SHORT
+    4: ("I", 4),  # LONG
+    5: ("II", 8),  # RATIONAL
+    6: ("b", 1),  # SBYTE
+    7: ("B", 1),  # UNDEFINED
+    8: ("h", 2),  # SSHORT
+    9: ("i", 4),  # SLONG
+    10: ("ii", 8),  # SRATIONAL
+    11: ("f", 4),  # FLOAT
+    12: ("d", 8),  # DOUBLE
+    16: ("Q", 8),  # LONG8
+    17: ("q", 8),  # SLONG8
+    18: ("Q", 8),  # IFD8
+}
+
+IMAGE_WIDTH: int = 256
+IMAGE_LENGTH: int = 257
+BITS_PER_SAMPLE: int = 258
+COMPRESSION: int = 259
+PHOTOMETRIC: int = 262
+SAMPLES_PER_PIXEL: int = 277
+ROWS_PER_STRIP: int = 278
+PLANAR_CONFIGURATION: int = 284
+TILE_WIDTH: int = 322
+TILE_LENGTH: int = 323
+EXTRA_SAMPLES: int = 338
+SAMPLE_FORMAT: int = 339
+MODEL_PIXEL_SCALE: int = 33550
+MODEL_TIEPOINT: int = 33922
+MODEL_TRANSFORMATION: int = 34264
+GEO_KEY_DIRECTORY: int = 34735
+GDAL_METADATA: int = 42112
+GDAL_NODATA: int = 42113
+
+# tags that don't surface in rasterio's profile or tags, anything else
+# (e.g. TIFFTAG_* metadata, color maps, masks) is left to GDAL
+KNOWN_TAGS: frozenset[int] = frozenset(
+    {
+        IMAGE_WIDTH,
+        IMAGE_LENGTH,
+        BITS_PER_SAMPLE,
+        COMPRESSION,
+        PHOTOMETRIC,
+        273,  # StripOffsets
+        SAMPLES_PER_PIXEL,
+        ROWS_PER_STRIP,
+        279,  # StripByteCounts
+        PLANAR_CONFIGURATION,
+        317,  # Predictor
+        EXTRA_SAMPLES,
+        TILE_WIDTH,
+        TILE_LENGTH,
+        324,  # TileOffsets
+        325,  # TileByteCounts
+        SAMPLE_FORMAT,
+        MODEL_PIXEL_SCALE,
+        MODEL_TIEPOINT,
+        MODEL_TRANSFORMATION,
+        GEO_KEY_DIRECTORY,
+        34736,  # GeoDoubleParams
+        34737,  # GeoAsciiParams
+        GDAL_METADATA,
+        GDAL_NODATA,
+    }
+)
+
+COMPRESSIONS: dict[int, str] = {
+    5: "lzw",
+    8: "deflate",
+    32946: "deflate",
+    32773: "packbits",
+    50000: "zstd",
+}
+
+# (SampleFormat, BitsPerSample): dtype
+DTYPES: dict[tuple[int, int], str] = {
+    (1, 8): "uint8",
+    (1, 16): "uint16",
+    (1, 32): "uint32",
+    (1, 64): "uint64",
+    (2, 8): "int8",
+    (2, 16): "int16",
+    (2, 32): "int32",
+    (2, 64): "int64",
+    (3, 32): "float32",
+    (3, 64): "float64",
+}
+
+GT_MODEL_TYPE: int = 1024
+GT_RASTER_TYPE: int = 1025
+GEOGRAPHIC_TYPE: int = 2048
+PROJECTED_CS_TYPE: int = 3072
+USER_DEFINED: int = 32767
+# citations, units and ellipsoid parameters GDAL writes next to an EPSG code
+KNOWN_GEO_KEYS: frozenset[int] = frozenset(
+    {
+        GT_MODEL_TYPE,
+        GT_RASTER_TYPE,
+        1026,  # GTCitation
+        GEOGRAPHIC_TYPE,
+        2049,  # GeogCitation
+        2054,  # GeogAngularUnits
+        2057,  # GeogSemiMajorAxis
+        2058,  # GeogSemiMinorAxis
+        2059,  # GeogInvFlattening
+        PROJECTED_CS_TYPE,
+        3073,  # PCSCitation
+        3076,  # ProjLinearUnits
+    }
+)
+RASTER_PIXEL_IS_POINT: int = 2
+
+
+def read_tiff_tags(read: Callable[[int, int], bytes]) -> dict[int, Any]:
+    """Read the tags of the first IFD of a TIFF or BigTIFF file.
+
+    ``read(offset, size)`` returns bytes of the file, e.g. a slice of a
+    memory map or a range request. Values are tuples, or str for ASCII.
+    """
+
+    def read_exactly(
+        offset: int,
+        size: int,
+    ) -> bytes:
+        data = read(offset, size)
+        if len(data) < size:
+            raise TruncatedHeaderError("TIFF header extends past the file.")
+        return data
+
+    header = read_exactly(0, 16)
+    byteorder = {b"II": "<", b"MM": ">"}.get(header[:2])
+    if byteorder is None:
+        raise HeaderParseError("Not a TIFF file.")
+    version = struct.unpack(byteorder + "H", header[2:4])[0]
+    if version == 42:
+        count_format, offset_format, entry_size = "H", "I", 12
+        ifd_offset = struct.unpack(byteorder + "I", header[4:8])[0]
+    elif version == 43:
+        count_format, offset_format, entry_size = "Q", "Q", 20
+        ifd_offset = struct.unpack(byteorder + "Q", header[8:16])[0]
+    else:
+        raise HeaderParseError(f"Unknown TIFF version: {version}")
+    inline_size = struct.calcsize(offset_format)
+
+    count_size = struct.calcsize(count_format)
+    n_entries = struct.unpack(
+        byteorder + count_format,
+        read_exactly(ifd_offset, count_size),
+    )[0]
+    entries = read_exactly(ifd_offset + count_size, n_entries * entry_size)
+
+    tags: dict[int, Any] = {}
+    for i in range(n_entries):
+        entry = entries[i * entry_size : (i + 1) * entry_size]
+        tag, field_type, count = struct.unpack(
+            byteorder + "HH" + offset_format,
+            entry[: 4 + inline_size],
+        )
+        if field_type not in TIFF_TYPES:
+            raise HeaderParseError(f"Unknown TIFF field type: {field_type}")
+        value_format, value_size = TIFF_TYPES[field_type]
+        size = count * value_size
+        if size <= inline_size:
+            data = entry[4 + inline_size : 4 + inline_size + size]
+        else:
+            offset = struct.unpack(
+                byteorder + offset_format,
+                entry[4 + inline_size :],
+            )[0]
+            data = read_exactly(offset, size)
+
+        if field_type == 2:
+            tags[tag] = data.rstrip(b"\x00").decode("utf-8", errors="replace")
+        else:
+            tags[tag] = struct.unpack(
+                byteorder + value_format * count,
+                data,
+            )
+    return tags
+
+
+def read_geo_keys(tags: dict[int, Any]) -> dict[int, int]:
+    """Return the short valued GeoKeys of a GeoTIFF's key directory."""
+    directory = tags.get(GEO_KEY_DIRECTORY)
+    if not directory:
+        return {}
+    geo_keys = {}
+    for i in range(4, 4 + 4 * directory[3], 4):
+        key_id, location, _, value = directory[i : i + 4]
+        # keys stored in the double or ascii params are only citations / units
+        geo_keys[key_id] = value if location == 0 else None
+    unknown = set(geo_keys) - KNOWN_GEO_KEYS
+    if unknown:
+        raise HeaderParseError(f"Unsupported GeoKeys: {sorted(unknown)}")
+    return geo_keys
+
+
+def read_crs(geo_keys: dict[int, int]) -> Optional[str]:
+    """Return the CRS as rasterio formats an EPSG coded CRS, None if missing."""
+    if not geo_keys:
+        return None
+    model_type = geo_keys.get(GT_MODEL_TYPE)
+    code = geo_keys.get(
+        PROJECTED_CS_TYPE if model_type == 1 else GEOGRAPHIC_TYPE,
+    )
+    if model_type not in (1, 2) or code in (None, USER_DEFINED):
+        raise HeaderParseError("Only EPSG coded CRSs are supported.")
+    return f"EPSG:{code}"
+
+
+def read_transform(
+    tags: dict[int, Any],
+    geo_keys: dict[int, int],
+) -> tuple[float, ...]:
+    """Return the affine transform (a, b, c, d, e, f) GDAL reads."""
+    if MODEL_TRANSFORMATION in tags:
+        m = tags[MODEL_TRANSFORMATION]
+        transform = (m[0], m[1], m[3], m[4], m[5], m[7])
+    elif MODEL_PIXEL_SCALE in tags and MODEL_TIEPOINT in tags:
+        scale_x, scale_y = tags[MODEL_PIXEL_SCALE][:2]
+        i, j, _, x, y, _ = tags[MODEL_TIEPOINT][:6]
+        transform = (scale_x, 0.0, x - i * scale_x, 0.0, -scale_y, y + j * scale_y)
+        if geo_keys.get(GT_RASTER_TYPE) == RASTER_PIXEL_IS_POINT:
+            # GDAL moves the origin from the pixel center to its corner
+            a, b, c, d, e, f = transform
+            transform = (a, b, c - 0.5 * a, d, e, f - 0.5 * e)
+    else:
+        return (1.0, 0.0, 0.0, 0.0, 1.0, 0.0)
+
+    if transform[1] != 0 or transform[3] != 0:
+        raise HeaderParseError("Rotated transforms are not supported.")
+    return tuple(float(i) for i in transform)
+
+
+def format_transform(transform: tuple[float, ...]) -> str:
+    """Format a transform as str(affine.Affine) does."""
+    return ("|% .2f,% .2f,% .2f|\n" "|% .2f,% .2f,% .2f|\n" "|% .2f,% .2f,% .2f|") % (
+        *transform,
+        0.0,
+        0.0,
+        1.0,
+    )
+
+
+def read_gdal_metadata(tags: dict[int, Any]) -> tuple[dict[str, str], dict[str, str]]:
+    """Return the dataset and first band tags stored in the GDAL_METADATA tag."""
+    dataset_tags: dict[str, str] = {}
+    band_tags: dict[str, str] = {}
+    if GDAL_METADATA not in tags:
+        return dataset_tags, band_tags
+
+    try:
+        root = ElementTree.fromstring(tags[GDAL_METADATA])
+    except ElementTree.ParseError as e:
+        raise HeaderParseError(f"Invalid GDAL_METADATA: {e}")
+
+    for item in root.iter("Item"):
+        if item.get("domain"):
+            raise HeaderParseError("GDAL metadata domains are not supported.")
+        if item.get("role"):
+            # band properties like scale, offset or description
+            continue
+        sample = item.get("sample")
+        if sample is None:
+            dataset_tags[item.get("name")] = item.text or ""
+        elif sample == "0":
+            band_tags[item.get("name")] = item.text or ""
+    return dataset_tags, band_tags
+
+
+def geotiff_values(read: Callable[[int, int], bytes]) -> dict[str, Any]:
+    """Return the attributes GeoTiffFileMetadata reads with rasterio, from the
+    TIFF header alone, as native values.
+
+    The transform is an (a, b, c, d, e, f) tuple and the bounding box a
+    dict. Raises HeaderParseError for anything that rasterio might report
+    differently, so callers can fall back to it.
+    """
+    tags = read_tiff_tags(read)
+    unknown = set(tags) - KNOWN_TAGS
+    if unknown:
+        raise HeaderParseError(f"Unsupported TIFF tags: {sorted(unknown)}")
+    if any(tags.get(EXTRA_SAMPLES, ())):
+        raise HeaderParseError("Alpha bands are not supported.")
+    if tags.get(PHOTOMETRIC, (1,))[0] != 1:
+        raise HeaderParseError("Only grayscale (MinIsBlack) TIFFs are supported.")
+
+    width = tags[IMAGE_WIDTH][0]
+    height = tags[IMAGE_LENGTH][0]
+    count = tags.get(SAMPLES_PER_PIXEL, (1,))[0]
+
+    bits = set(tags.get(BITS_PER_SAMPLE, (1,)))
+    sample_formats = set(tags.get(SAMPLE_FORMAT, (1,)))
+    if len(bits) != 1 or len(sample_formats) != 1:
+        raise HeaderParseError("Mixed band types are not supported.")
+    dtype = DTYPES.get((sample_formats.pop(), bits.pop()))
+    if dtype is None:
+        raise HeaderParseError("Unsupported TIFF sample type.")
+
+    compression = tags.get(COMPRESSION, (1,))[0]
+    if compression != 1 and compression not in COMPRESSIONS:
+        raise HeaderParseError(f"Unsupported TIFF compression: {compression}")
+
+    tiled = TILE_WIDTH in tags
+    if tiled:
+        block_x, block_y = tags[TILE_WIDTH][0], tags[TILE_LENGTH][0]
+    else:
+        block_x = width
+        block_y = min(tags.get(ROWS_PER_STRIP, (height,))[0], height)
+
+    nodata = None
+    if GDAL_NODATA in tags:
+        nodata = float(tags[GDAL_NODATA])
+
+    geo_keys = read_geo_keys(tags)
+    transform = read_transform(tags, geo_keys)
+    dataset_tags, band_tags = read_gdal_metadata(tags)
+    if GT_RASTER_TYPE in geo_keys:
+        dataset_tags["AREA_OR_POINT"] = (
+            "Point" if geo_keys[GT_RASTER_TYPE] == RASTER_PIXEL_IS_POINT else "Area"
+        )
+
+    attrs = {
+        "driver": "GTiff",
+        "dtype": dtype,
+        "nodata": nodata,
+        "width": width,
+        "height": height,
+        "count": count,
+        "crs": read_crs(geo_keys),
+        "transform": transform,
+        "blockxsize": block_x,
+        "blockysize": block_y,
+        "tiled": tiled,
+    }
+    if compression != 1:
+        attrs["compress"] = COMPRESSIONS[compression]
+    if count > 1:
+        planar = tags.get(PLANAR_CONFIGURATION, (1,))[0]
+        attrs["interleave"] = "pixel" if planar == 1 else "band"
+    else:
+        attrs["interleave"] = "band"
+
+    # GeoTiffFileMetadata pairs GDAL's tag namespaces with tags(0), tags(1)
+    attrs["IMAGE_STRUCTURE"] = dataset_tags
+    attrs["DERIVED_SUBDATASETS"] = band_tags
+
+    a, _, c, _, e, f = transform
+    attrs["bounding_box"] = {
+        "left": c,
+        "bottom": f + e * height,
+        "right": c + a * width,
+        "top": f,
+    }
+    return attrs
+
+
+def geotiff_attrs(read: Callable[[int, int], bytes]) -> dict[str, str]:
+    """Return geotiff_values() stringified as str() does rasterio's values."""
+    attrs = {}
+    for name, value in geotiff_values(read).items():
+        if name == "transform":
+            attrs[name] = format_transform(value)
+        elif name == "bounding_box":
+            fields = ", ".join(f"{k}={v!r}" for k, v in value.items())
+            attrs[name] = f"BoundingBox({fields})"
+        else:
+            attrs[name] = str(value)
+    return attrs
@@ -0,0 +1,94 @@
+import base64
+import math
+import numpy as np
+from typing import (
+    Any,
+    Mapping,
+)
+
+# numeric arrays with at least this many elements are sent as base64
+BASE64_MIN_SIZE: int = 1024
+
+NON_FINITE: dict[str, str] = {
+    "nan": "NaN",
+    "inf": "Infinity",
+    "-inf": "-Infinity",
+}
+
+
+def non_finite(value: float) -> str:
+    """Return the JSON string standing in for a NaN or infinite float."""
+    return NON_FINITE[repr(float(value))]
+
+
+def encode_array(array: np.ndarray) -> dict[str, Any]:
+    """Encode a numeric array as the base64 of its little-endian bytes.
+
+    The dtype is given as a numpy type string (e.g. ``<f8``), so the values
+    can be restored with ``np.frombuffer(data, dtype).reshape(shape)``.
+    """
+    array = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder("<"))
+    return {
+        "dtype": array.dtype.str,
+        "shape": list(array.shape),
+        "base64": base64.b64encode(array.tobytes()).decode("ascii"),
+    }
+
+
+def array_to_list(array: np.ndarray) -> list:
+    """Convert a numeric array to (nested) lists of JSON numbers in one pass.
+
+    NaN and infinite floats are replaced by their JSON strings.
+    """
+    if array.dtype.kind == "f":
+        finite = np.isfinite(array)
+        if not finite.all():
+            values = array.astype(object)
+            values[~finite] = [non_finite(v) for v in array[~finite]]
+            return values.tolist()
+    return array.tolist()
+
+
+def to_json_value(value: Any) -> Any:
+    """Convert an attribute value to a native JSON value.
+
+    This is the typed representation shared by every file format:
+
+    * strings, booleans and finite numbers map to themselves, bytes are
+      decoded as UTF-8, and NaN / infinite floats become "NaN",
+      "Infinity" or "-Infinity".
+    * single element arrays map to their element, as they do when the
+      values are stringified.
+    * numeric arrays map to lists, or to ``{"dtype", "shape", "base64"}``
+      once they have BASE64_MIN_SIZE elements or more. Other arrays,
+      lists and tuples map to lists.
+    * mappings and named tuples (e.g. a bounding box) map to objects.
+    * anything else (e.g. a CRS) maps to its string.
+    """
+    if value is None or isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        return str(value)
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    if isinstance(value, np.ndarray):
+        if value.size == 1:
+            return to_json_value(value.reshape(-1)[0])
+        if value.dtype.kind in "biuf":
+            if value.size >= BASE64_MIN_SIZE:
+                return encode_array(value)
+            return array_to_list(value)
+        return [to_json_value(v) for v in value.tolist()]
+    if isinstance(value, np.generic):
+        return to_json_value(value.item())
+    if isinstance(value, int):
+        return int(value)
+    if isinstance(value, float):
+        return float(value) if math.isfinite(value) else non_finite(value)
+    if isinstance(value, Mapping):
+        return {str(k): to_json_value(v) for k, v in value.items()}
+    if hasattr(value, "_asdict"):
+        return to_json_value(value._asdict())
+    if isinstance(value, (list, tuple)):
+        return [to_json_value(v) for v in value]
+    return str(value)